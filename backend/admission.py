@@ -0,0 +1,216 @@
+"""
+Admission control and load shedding
+Each request is classified (writes, nested reads, public catalog reads) and must get
+a slot from its class's concurrency limiter, waiting in a bounded FIFO queue if
+needed. Callers are also rate limited by a per-client token bucket. Requests that
+cannot be admitted fail fast with 503 or 429 plus Retry-After instead of piling up
+in the threadpool and database pool.
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+import metrics
+from database import client_key
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Per-client token bucket: sustained requests per second and burst size
+USER_RATE_PER_SECOND = float(os.getenv("ADMISSION_USER_RATE", "20"))
+USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "40"))
+# Retry-After sent with 503s
+OVERLOAD_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+MAX_TRACKED_CLIENTS = 100000
+
+# Route class -> (max concurrent, max queued, max seconds in queue)
+ROUTE_CLASS_DEFAULTS = {
+    "write": (16, 32, 2.0),
+    "nested": (16, 64, 2.0),
+    "catalog": (64, 256, 1.0),
+}
+
+NESTED_READ_PREFIXES = ("/users", "/meal-plans", "/weekly-assignments", "/auth")
+CATALOG_READ_PREFIXES = ("/ingredients", "/recipes")
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Route class for a request, or None for cheap unlimited routes (/, /metrics, docs)"""
+    if method not in ("GET", "HEAD"):
+        return "write"
+    if path.startswith(CATALOG_READ_PREFIXES):
+        return "catalog"
+    if path.startswith(NESTED_READ_PREFIXES):
+        return "nested"
+    return None
+
+
+def _env_limit(route_class: str, name: str, default):
+    return type(default)(os.getenv(f"ADMISSION_{route_class.upper()}_{name}", default))
+
+
+class ConcurrencyLimiter:
+    """Counting limiter with a bounded FIFO wait queue; not bound to any event loop"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns None on success or the rejection reason"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # Slot was handed over just as we timed out; keep it
+                return None
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            # Client went away; give back a slot that was already handed to us
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self):
+        # Hand the slot directly to the oldest live waiter, otherwise free it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+
+class TokenBuckets:
+    """Per-client token buckets refilled continuously at `rate` tokens/second"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Consume a token; returns 0 on success or the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= MAX_TRACKED_CLIENTS:
+                    self._buckets.clear()
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+
+
+limiters: Dict[str, ConcurrencyLimiter] = {}
+
+
+def configure(workers: int = 1):
+    """
+    Split the concurrency limits and queues across `workers` prefork workers (called in
+    each worker by serve.py). Per-client token buckets stay per worker: keep-alive
+    connections pin a client to one worker, so a split bucket would throttle it.
+    """
+    for route_class, (limit, queue_size, queue_timeout) in ROUTE_CLASS_DEFAULTS.items():
+        limiters[route_class] = ConcurrencyLimiter(
+            route_class,
+            max(1, math.ceil(_env_limit(route_class, "CONCURRENCY", limit) / workers)),
+            max(1, math.ceil(_env_limit(route_class, "QUEUE", queue_size) / workers)),
+            _env_limit(route_class, "QUEUE_TIMEOUT", queue_timeout),
+        )
+
+
+configure()
+user_buckets = TokenBuckets(USER_RATE_PER_SECOND, USER_BURST)
+
+REJECTIONS_TOTAL = metrics.Counter(
+    "admission_rejections_total", "Requests shed by admission control", ("route_class", "reason")
+)
+
+
+def admission_metrics() -> List[str]:
+    lines = ["# HELP admission_in_flight Requests currently admitted", "# TYPE admission_in_flight gauge"]
+    lines += [f'admission_in_flight{{route_class="{name}"}} {limiter.in_flight}' for name, limiter in limiters.items()]
+    lines += ["# HELP admission_queue_depth Requests waiting for a slot", "# TYPE admission_queue_depth gauge"]
+    lines += [f'admission_queue_depth{{route_class="{name}"}} {limiter.queue_depth}' for name, limiter in limiters.items()]
+    lines += REJECTIONS_TOTAL.render()
+    return lines
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the per-client token bucket and per-class concurrency limits"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = user_buckets.take(client_key(Request(scope)))
+        if wait:
+            REJECTIONS_TOTAL.inc((route_class, "rate_limited"))
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        limiter = limiters[route_class]
+        reason = await limiter.acquire()
+        if reason is not None:
+            REJECTIONS_TOTAL.inc((route_class, reason))
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(OVERLOAD_RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
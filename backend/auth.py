@@ -1,13 +1,15 @@
 import os
+import logging
 from typing import Optional
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import create_client, Client
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
 import models
-from database import get_db
+from logs import SampledLogger
+from database import SessionLocal, get_db, is_replica_session, mark_client_write
 
 # Load environment variables
 load_dotenv()
@@ -24,10 +26,17 @@ if not all([SUPABASE_URL, SUPABASE_ANON_KEY, SUPABASE_SERVICE_ROLE_KEY]):
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
+# Comma-separated emails allowed to use admin endpoints
+ADMIN_USER_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_USER_EMAILS", "").split(",") if email.strip()}
+
+# Failures arrive in storms (expired tokens, scanners); log a sample per exception type
+auth_failures = SampledLogger(logging.getLogger("nutri_regimen.auth"))
+
 # Security scheme
 security = HTTPBearer()
 
 def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> models.User:
@@ -56,24 +65,31 @@ def get_current_user(
         ).first()
         
         if not db_user:
-            # Create new user in our database
-            db_user = models.User(
-                supabase_user_id=supabase_user.id,
-                email=supabase_user.email,
-                full_name=supabase_user.user_metadata.get("full_name"),
-                avatar_url=supabase_user.user_metadata.get("avatar_url")
-            )
-            db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
+            # Create new user in our database (always on the primary, even for reads served by a replica)
+            write_db = SessionLocal() if is_replica_session(db) else db
+            try:
+                db_user = models.User(
+                    supabase_user_id=supabase_user.id,
+                    email=supabase_user.email,
+                    full_name=supabase_user.user_metadata.get("full_name"),
+                    avatar_url=supabase_user.user_metadata.get("avatar_url")
+                )
+                write_db.add(db_user)
+                write_db.commit()
+                write_db.refresh(db_user)
+            finally:
+                if write_db is not db:
+                    write_db.close()
+            mark_client_write(request)
             
         return db_user
         
     except Exception as e:
-        print(f"Authentication error: {e}")
+        auth_failures.warning("Authentication error: %s: %s", type(e).__name__, e, key=type(e).__name__)
         raise credentials_exception
 
 def get_current_user_optional(
+    request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ) -> Optional[models.User]:
@@ -84,10 +100,18 @@ def get_current_user_optional(
         return None
     
     try:
-        return get_current_user(credentials, db)
+        return get_current_user(request, credentials, db)
     except HTTPException:
         return None
 
+def get_admin_user(current_user: models.User = Depends(get_current_user)) -> models.User:
+    """
+    Require the current user to be listed in ADMIN_USER_EMAILS.
+    """
+    if not current_user.email or current_user.email.lower() not in ADMIN_USER_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 def create_user_from_supabase(supabase_user_id: str, email: str, db: Session) -> models.User:
     """
     Create a new user in our database from Supabase user data.
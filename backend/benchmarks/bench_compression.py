@@ -0,0 +1,112 @@
+"""
+Payload size and CPU cost of response compression per endpoint
+Seeds a temporary SQLite database, renders the JSON bodies the main list endpoints
+return, and measures each available encoding (see compression.py) for compressed
+size, compression time and decompression time.
+
+Usage:
+    python benchmarks/bench_compression.py
+    python benchmarks/bench_compression.py --size 1000 --repeat 20
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+import compression
+from generate_data import generate
+from bench_crud import RESULTS_DIR, SEED, git_commit, time_call
+
+DECOMPRESSORS = {"gzip": gzip.decompress}
+if compression.brotli is not None:
+    DECOMPRESSORS["br"] = compression.brotli.decompress
+if compression.zstandard is not None:
+    DECOMPRESSORS["zstd"] = compression.zstandard.ZstdDecompressor().decompress
+
+
+def render(rows, schema) -> bytes:
+    """Serialize like a FastAPI endpoint with response_model=List[schema]"""
+    return JSONResponse(jsonable_encoder([schema.model_validate(row) for row in rows])).body
+
+
+def endpoint_bodies(Session):
+    with Session() as db:
+        user = db.query(models.User).join(models.WeeklyAssignment).order_by(models.User.id).first()
+        recipe_ids = [r.id for r in db.query(models.Recipe.id).limit(100)]
+        return {
+            "GET /users/me/weekly-assignments/": render(crud.get_user_weekly_assignments(db, user.id), schemas.WeeklyAssignment),
+            "GET /users/me/meal-plans/": render(crud.get_user_meal_plans(db, user.id), schemas.MealPlan),
+            "GET /recipes/": render(crud.get_recipes(db), schemas.Recipe),
+            "GET /recipes/batch (100 ids)": render(crud.get_recipes_by_ids(db, recipe_ids), schemas.Recipe),
+            "GET /ingredients/": render(crud.get_ingredients(db), schemas.Ingredient),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression per endpoint")
+    parser.add_argument("--size", type=int, default=100, help="Number of users to generate")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per case")
+    parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/results/compression-<commit>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        generate(engine, users=args.size, public_recipes=max(10, args.size // 10), seed=SEED)
+        bodies = endpoint_bodies(sessionmaker(bind=engine))
+        engine.dispose()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "size": args.size,
+        "encodings": list(compression.CODECS),
+        "results": {},
+    }
+    print(f"🚀 Encodings available: {', '.join(compression.CODECS)}")
+    for endpoint, body in bodies.items():
+        print(f"{endpoint}: {len(body):,} bytes")
+        results = {}
+        for encoding, compress in compression.CODECS.items():
+            compressed = compress(body)
+            results[encoding] = {
+                "uncompressed_bytes": len(body),
+                "compressed_bytes": len(compressed),
+                "ratio": round(len(body) / len(compressed), 2),
+                "compress": time_call(lambda: compress(body), args.repeat),
+                "decompress": time_call(lambda: DECOMPRESSORS[encoding](compressed), args.repeat),
+            }
+            print(f"   {encoding:<5} {len(compressed):>10,} bytes  x{results[encoding]['ratio']:<6}"
+                  f" compress {results[encoding]['compress']['median_ms']:>8.3f}ms"
+                  f"  decompress {results[encoding]['decompress']['median_ms']:>8.3f}ms")
+        report["results"][endpoint] = results
+
+    output = args.output or os.path.join(RESULTS_DIR, f"compression-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
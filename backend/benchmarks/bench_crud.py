@@ -0,0 +1,231 @@
+"""
+Micro-benchmark suite for the CRUD layer and response serialization of Nutri-Regimen
+Times every function in crud.py plus the pydantic conversion of the nested
+MealPlan / WeeklyAssignment schemas at several data sizes, and writes the results
+as JSON so runs from different commits can be compared.
+
+Usage:
+    python benchmarks/bench_crud.py                          # SQLite temp files, default sizes
+    python benchmarks/bench_crud.py --sizes 10 100 1000 --repeat 20
+    python benchmarks/bench_crud.py --database-url postgresql://localhost/nutri_bench
+    python benchmarks/bench_crud.py --compare benchmarks/results/<previous>.json
+
+WARNING: with --database-url every size drops and recreates all tables in that database.
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+# crud/models import database.py, which refuses to load without DATABASE_URL.
+# The benchmark binds its own engines, so any placeholder URL is fine here.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+from generate_data import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = [10, 100, 1000]
+SEED = 42
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+
+
+def time_call(fn, repeat: int):
+    """Run fn `repeat` times (after one warm-up call) and summarize wall-clock timings in milliseconds"""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "repeat": repeat,
+    }
+
+
+def build_cases(Session):
+    """Return {name: callable}; every callable opens its own session so nothing is served from the identity map"""
+    with Session() as db:
+        # Generated users are long-tailed; benchmark one that has plans and assignments
+        user = db.query(models.User).join(models.WeeklyAssignment).order_by(models.User.id).first()
+        recipe = db.query(models.Recipe).order_by(models.Recipe.id).first()
+        ingredient = db.query(models.Ingredient).order_by(models.Ingredient.id).first()
+        meal_plan = db.query(models.MealPlan).filter(models.MealPlan.user_id == user.id).first()
+        assignment = db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.user_id == user.id).first()
+        user_id, recipe_id, ingredient_id = user.id, recipe.id, ingredient.id
+        meal_plan_id, assignment_id, week_start = meal_plan.id, assignment.id, assignment.week_start_date
+        recipe_ids = [r.id for r in db.query(models.Recipe.id).limit(21)]
+
+    recipe_payload = schemas.RecipeCreate(
+        name="Bench Recipe",
+        description="Created by the benchmark",
+        ingredients=[schemas.RecipeIngredientCreate(ingredient_id=ingredient_id, quantity=100, unit="g")],
+    )
+    meal_plan_payload = schemas.MealPlanCreate(
+        name="Bench Plan",
+        meal_plan_items=[
+            schemas.MealPlanItemCreate(recipe_id=recipe_ids[i % len(recipe_ids)], day_of_week=DAYS[i // 3], meal_type=MEAL_TYPES[i % 3])
+            for i in range(21)
+        ],
+    )
+    # Far-future weeks keep create_weekly_assignment from colliding with seeded weeks
+    future_week = [date(2100, 1, 4)]
+
+    def with_db(fn):
+        def run():
+            with Session() as db:
+                return fn(db)
+        return run
+
+    def next_future_week():
+        future_week[0] += timedelta(weeks=1)
+        return future_week[0]
+
+    def serialize_meal_plans(db):
+        plans = crud.get_user_meal_plans(db, user_id=user_id)
+        return [schemas.MealPlan.model_validate(p).model_dump_json() for p in plans]
+
+    def serialize_weekly_assignments(db):
+        assignments = crud.get_user_weekly_assignments(db, user_id=user_id)
+        return [schemas.WeeklyAssignment.model_validate(a).model_dump_json() for a in assignments]
+
+    # Pre-loaded graphs isolate pure pydantic cost from lazy loading
+    with Session() as db:
+        loaded_plans = crud.get_user_meal_plans(db, user_id=user_id)
+        for plan in loaded_plans:
+            schemas.MealPlan.model_validate(plan)
+        loaded_assignments = crud.get_user_weekly_assignments(db, user_id=user_id)
+        db.expunge_all()
+
+    return {
+        "crud.get_users": with_db(lambda db: crud.get_users(db)),
+        "crud.get_user": with_db(lambda db: crud.get_user(db, user_id)),
+        "crud.get_ingredients": with_db(lambda db: crud.get_ingredients(db)),
+        "crud.get_ingredient": with_db(lambda db: crud.get_ingredient(db, ingredient_id)),
+        "crud.get_recipes": with_db(lambda db: crud.get_recipes(db)),
+        "crud.get_recipe": with_db(lambda db: crud.get_recipe(db, recipe_id)),
+        "crud.get_meal_plans": with_db(lambda db: crud.get_meal_plans(db)),
+        "crud.get_meal_plan": with_db(lambda db: crud.get_meal_plan(db, meal_plan_id)),
+        "crud.get_user_meal_plans": with_db(lambda db: crud.get_user_meal_plans(db, user_id)),
+        "crud.get_weekly_assignment_by_week": with_db(lambda db: crud.get_weekly_assignment_by_week(db, week_start, user_id)),
+        "crud.get_user_weekly_assignments": with_db(lambda db: crud.get_user_weekly_assignments(db, user_id)),
+        "crud.create_recipe": with_db(lambda db: crud.create_recipe(db, recipe_payload, user_id)),
+        "crud.create_meal_plan": with_db(lambda db: crud.create_meal_plan(db, meal_plan_payload, user_id)),
+        "crud.update_meal_plan": with_db(lambda db: crud.update_meal_plan(db, meal_plan_id, meal_plan_payload)),
+        "crud.create_weekly_assignment": with_db(lambda db: crud.create_weekly_assignment(db, schemas.WeeklyAssignmentCreate(
+            week_start_date=next_future_week(), meal_plan_id=meal_plan_id, user_id=user_id))),
+        "crud.update_weekly_assignment": with_db(lambda db: crud.update_weekly_assignment(db, assignment_id, schemas.WeeklyAssignmentCreate(
+            week_start_date=week_start, meal_plan_id=meal_plan_id, user_id=user_id))),
+        "schemas.MealPlan.model_validate": lambda: [schemas.MealPlan.model_validate(p) for p in loaded_plans],
+        "schemas.WeeklyAssignment.model_validate": lambda: [schemas.WeeklyAssignment.model_validate(a) for a in loaded_assignments],
+        "serialize.user_meal_plans": with_db(serialize_meal_plans),
+        "serialize.user_weekly_assignments": with_db(serialize_weekly_assignments),
+    }
+
+
+def run_size(database_url: str, size: int, repeat: int):
+    """Create a fresh schema, generate `size` users of data and time every case"""
+    engine = create_engine(database_url)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    try:
+        generate(engine, users=size, public_recipes=max(10, size // 10), seed=SEED)
+        return {name: time_call(fn, repeat) for name, fn in build_cases(Session).items()}
+    finally:
+        engine.dispose()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str, threshold: float):
+    """Print cases whose median got slower than `threshold` (e.g. 0.2 == 20%) relative to a baseline file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = 0
+    for size, cases in current["results"].items():
+        for name, timing in cases.items():
+            previous = baseline.get("results", {}).get(size, {}).get(name)
+            if not previous or previous["median_ms"] == 0:
+                continue
+            change = (timing["median_ms"] - previous["median_ms"]) / previous["median_ms"]
+            if change > threshold:
+                regressions += 1
+                print(f"⚠️  size={size} {name}: {previous['median_ms']:.3f}ms -> {timing['median_ms']:.3f}ms (+{change:.0%})")
+    print(f"{regressions} regression(s) against {baseline.get('commit', baseline_path)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crud.py functions and schema serialization")
+    parser.add_argument("--database-url", help="Database to benchmark against (default: a temporary SQLite file per size)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Number of users to generate per run")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed iterations per case")
+    parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative median slowdown reported as a regression")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "database": "sqlite" if not args.database_url else args.database_url.split(":", 1)[0],
+        "repeat": args.repeat,
+        "seed": SEED,
+        "results": {},
+    }
+
+    for size in args.sizes:
+        print(f"🚀 Benchmarking size={size}...")
+        if args.database_url:
+            results = run_size(args.database_url, size, args.repeat)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                results = run_size(f"sqlite:///{os.path.join(tmp, 'bench.db')}", size, args.repeat)
+        report["results"][str(size)] = results
+        for name, timing in results.items():
+            print(f"   {name:<45} median {timing['median_ms']:>9.3f}ms  p95 {timing['p95_ms']:>9.3f}ms")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        sys.exit(1 if compare(report, args.compare, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
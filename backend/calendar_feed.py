@@ -0,0 +1,140 @@
+"""
+iCalendar feed of a user's weekly assignments
+Calendar apps poll GET /users/{token}/meal-plan.ics every few minutes, so the
+feed is cheap to revalidate: its ETag/Last-Modified come from one aggregate over
+the assignments in the feed window and their plans (count plus latest
+updated_at), and unchanged feeds return 304 without loading any items. Changed
+feeds are streamed from a date-bounded query in batches, one VEVENT per meal
+plan item, on a session of their own since the request's session is closed
+before the body is sent.
+"""
+
+import os
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import crud
+import nutrition
+
+# Feed window around the current week
+CALENDAR_PAST_WEEKS = int(os.getenv("CALENDAR_PAST_WEEKS", "4"))
+CALENDAR_FUTURE_WEEKS = int(os.getenv("CALENDAR_FUTURE_WEEKS", "12"))
+# How long clients may reuse a feed without revalidating
+CALENDAR_MAX_AGE_SECONDS = int(os.getenv("CALENDAR_MAX_AGE_SECONDS", "300"))
+EVENTS_PER_CHUNK = 200
+# Bump when the rendered output changes so cached feeds are replaced
+FEED_FORMAT_VERSION = 1
+
+DAYS = nutrition.WEEK_DAYS
+# Meal type -> (hour, minute) of the event; unknown types use DEFAULT_MEAL_TIME
+MEAL_TIMES = {"breakfast": (8, 0), "lunch": (12, 30), "snack": (16, 0), "dinner": (19, 0)}
+DEFAULT_MEAL_TIME = (12, 0)
+MEAL_MINUTES = 45
+
+
+def feed_window(today: date) -> Tuple[date, date]:
+    """First and last week start included in the feed"""
+    monday = today - timedelta(days=today.weekday())
+    return monday - timedelta(weeks=CALENDAR_PAST_WEEKS), monday + timedelta(weeks=CALENDAR_FUTURE_WEEKS)
+
+
+def validators(user_id: int, start: date, count: int, last_modified: Optional[datetime]) -> Tuple[str, Optional[str]]:
+    """(ETag, Last-Modified header) for the feed; the window start is part of the ETag so it rolls weekly"""
+    key = f"{FEED_FORMAT_VERSION}:{user_id}:{start}:{count}:{last_modified.isoformat() if last_modified else ''}"
+    etag = '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+    if last_modified is None:
+        return etag, None
+    # Stored timestamps are naive UTC
+    return etag, format_datetime(last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def is_not_modified(if_none_match: Optional[str], if_modified_since: Optional[str],
+                    etag: str, last_modified: Optional[str]) -> bool:
+    """RFC 9110 conditional GET: If-None-Match wins when present"""
+    if if_none_match is not None:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Split content lines longer than 75 octets (RFC 5545 3.1)"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Never cut a UTF-8 sequence in half
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, 74  # Continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _stamp(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(row, dtstamp: datetime) -> str:
+    day = DAYS.index(row.day_of_week) if row.day_of_week in DAYS else 0
+    hour, minute = MEAL_TIMES.get((row.meal_type or "").lower(), DEFAULT_MEAL_TIME)
+    # Floating local time: the meal shows at 08:00 wherever the subscriber is
+    start = datetime.combine(row.week_start_date + timedelta(days=day), datetime.min.time()).replace(hour=hour, minute=minute)
+    end = start + timedelta(minutes=MEAL_MINUTES)
+    title = row.recipe_name or "Meal"
+    if row.meal_type:
+        title = f"{row.meal_type.capitalize()}: {title}"
+    description = f"Meal plan: {row.meal_plan_name or ''}"
+    if row.calories is not None:
+        description += f"\n{round(row.calories)} kcal"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:item-{row.item_id}-{row.week_start_date:%Y%m%d}@nutri-regimen",
+        f"DTSTAMP:{_stamp(dtstamp)}",
+        f"DTSTART:{start:%Y%m%dT%H%M%S}",
+        f"DTEND:{end:%Y%m%dT%H%M%S}",
+        f"SUMMARY:{_escape(title)}",
+        f"DESCRIPTION:{_escape(description)}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) for line in lines)
+
+
+def stream_feed(db: Session, user_id: int, start: date, end: date, last_modified: Optional[datetime]) -> Iterator[str]:
+    """Yield the feed in chunks; closes `db` when done"""
+    dtstamp = last_modified or datetime.utcnow()
+    try:
+        yield "".join(_fold(line) for line in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Nutri-Regimen//Meal Plan//EN",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            "X-WR-CALNAME:Meal plan",
+            f"X-PUBLISHED-TTL:PT{max(CALENDAR_MAX_AGE_SECONDS // 60, 1)}M",
+        ))
+        chunk = []
+        for row in crud.iter_calendar_items(db, user_id, start, end):
+            chunk.append(render_event(row, dtstamp))
+            if len(chunk) >= EVENTS_PER_CHUNK:
+                yield "".join(chunk)
+                chunk = []
+        chunk.append(_fold("END:VCALENDAR"))
+        yield "".join(chunk)
+    finally:
+        db.close()
@@ -0,0 +1,246 @@
+"""
+Response compression
+Compresses buffered responses above a size threshold with the best encoding the
+client accepts: zstd or brotli when their packages are installed, gzip otherwise.
+Compressed bodies of public GET responses (no Authorization header) are kept in
+an LRU cache keyed by a hash of the uncompressed body, so repeated catalog reads
+skip the compression work. Streaming responses are passed through uncompressed.
+Every compressible response carries Vary: Accept-Encoding, compressed or not, so
+shared caches never hand an identity body to a client that asked for another.
+"""
+
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Bodies smaller than this are sent as-is; headers and CPU would outweigh the savings
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Total size of cached compressed bodies; 0 disables the cache
+COMPRESSION_CACHE_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps output deterministic for identical bodies
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _build_codecs() -> Dict[str, Callable[[bytes], bytes]]:
+    """Available encodings in server preference order"""
+    codecs = {}
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        lock = threading.Lock()
+
+        def _zstd(data: bytes) -> bytes:
+            # ZstdCompressor instances are not thread-safe
+            with lock:
+                return compressor.compress(data)
+
+        codecs["zstd"] = _zstd
+    if brotli is not None:
+        codecs["br"] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+    codecs["gzip"] = _gzip
+    return codecs
+
+
+CODECS = _build_codecs()
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick an encoding from an Accept-Encoding header, honouring q-values; None means identity"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in CODECS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        # Strictly greater keeps the server's preference order on ties
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedCache:
+    """Byte-bounded LRU of (encoding, body digest) -> compressed body"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+compressed_cache = CompressedCache(COMPRESSION_CACHE_BYTES)
+
+RESPONSE_BYTES = metrics.Counter(
+    "http_response_bytes_total", "Response body bytes before and after compression", ("encoding", "stage")
+)
+CACHE_LOOKUPS = metrics.Counter(
+    "compression_cache_lookups_total", "Compressed-body cache lookups for public responses", ("result",)
+)
+
+
+def compression_metrics() -> List[str]:
+    lines = ["# HELP compression_cache_bytes Size of cached compressed bodies", "# TYPE compression_cache_bytes gauge"]
+    lines.append(f"compression_cache_bytes {compressed_cache.size}")
+    return lines + RESPONSE_BYTES.render() + CACHE_LOOKUPS.render()
+
+
+def compress(body: bytes, encoding: str, cacheable: bool) -> bytes:
+    if not cacheable or not COMPRESSION_CACHE_BYTES:
+        return CODECS[encoding](body)
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    cached = compressed_cache.get(key)
+    if cached is not None:
+        CACHE_LOOKUPS.inc(("hit",))
+        return cached
+    CACHE_LOOKUPS.inc(("miss",))
+    compressed = CODECS[encoding](body)
+    compressed_cache.put(key, compressed)
+    return compressed
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _vary_accept_encoding(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """`headers` with Accept-Encoding added to Vary"""
+    vary = _header(headers, b"vary")
+    if vary is not None and (b"accept-encoding" in vary.lower() or vary.strip() == b"*"):
+        return headers
+    headers = [(key, value) for key, value in headers if key.lower() != b"vary"]
+    return headers + [(b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding")]
+
+
+def _compressible(headers: List[Tuple[bytes, bytes]]) -> bool:
+    content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+    return _header(headers, b"content-encoding") is None and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete (non-streaming) responses"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        request_headers = scope["headers"]
+        encoding = negotiate((_header(request_headers, b"accept-encoding") or b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, self._identity_send(send))
+            return
+        public = scope["method"] in ("GET", "HEAD") and _header(request_headers, b"authorization") is None
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                if not _compressible(message.get("headers", [])):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Whether this body gets compressed depends on Accept-Encoding, so shared caches must key on it
+                    start_message = {**message, "headers": _vary_accept_encoding(message.get("headers", []))}
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < COMPRESSION_MIN_BYTES:
+                # Streaming or small: send unchanged
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding, cacheable=public and start_message["status"] == 200)
+            RESPONSE_BYTES.inc((encoding, "uncompressed"), len(body))
+            RESPONSE_BYTES.inc((encoding, "compressed"), len(compressed))
+            headers = [(key, value) for key, value in start_message["headers"] if key.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _identity_send(send):
+        """`send` for clients accepting no encoding we offer: bodies go out as-is, marked with Vary"""
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and _compressible(message.get("headers", [])):
+                message = {**message, "headers": _vary_accept_encoding(message.get("headers", []))}
+            await send(message)
+
+        return send_wrapper
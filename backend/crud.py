@@ -1,8 +1,16 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Date, cast, func, or_, insert, select, literal, literal_column, type_coerce
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from collections import defaultdict
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 import models
 import schemas
+import nutrition
+import sync
+import daily_nutrition
+from database import dialect_insert
+from nutrient_matrix import nutrient_matrix
 from schemas import UserCreate, IngredientCreate, RecipeCreate, MealPlanCreate
 
 # User CRUD operations (Supabase authentication)
@@ -36,6 +44,19 @@ def get_user_by_supabase_id(db: Session, supabase_user_id: str):
     """Get user by Supabase user ID"""
     return db.query(models.User).filter(models.User.supabase_user_id == supabase_user_id).first()
 
+def get_user_by_calendar_token(db: Session, token: str):
+    return db.query(models.User).filter(models.User.calendar_token == token).first()
+
+def set_user_calendar_token(db: Session, user_id: int, token: Optional[str]):
+    """Replace (or with None, revoke) the secret in the user's calendar feed URL"""
+    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    if not db_user:
+        return None
+    db_user.calendar_token = token
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
 def update_user(db: Session, user_id: int, user: schemas.UserUpdate):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if not db_user:
@@ -71,9 +92,23 @@ def create_ingredient(db: Session, ingredient: IngredientCreate):
 def get_ingredient(db: Session, ingredient_id: int):
     return db.query(models.Ingredient).filter(models.Ingredient.id == ingredient_id).first()
 
+def update_ingredient(db: Session, ingredient_id: int, ingredient: schemas.IngredientUpdate):
+    db_ingredient = db.query(models.Ingredient).filter(models.Ingredient.id == ingredient_id).first()
+    if not db_ingredient:
+        return None
+    for field, value in ingredient.model_dump(exclude_unset=True).items():
+        setattr(db_ingredient, field, value)
+    db.commit()
+    db.refresh(db_ingredient)
+    return db_ingredient
+
 def get_ingredients(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Ingredient).offset(skip).limit(limit).all()
 
+def get_ingredients_by_ids(db: Session, ingredient_ids: List[int]):
+    """Fetch many ingredients with a single IN query"""
+    return db.query(models.Ingredient).filter(models.Ingredient.id.in_(ingredient_ids)).all()
+
 # Recipe CRUD operations
 def create_recipe(db: Session, recipe: RecipeCreate, user_id: int):
     db_recipe = models.Recipe(
@@ -95,15 +130,58 @@ def create_recipe(db: Session, recipe: RecipeCreate, user_id: int):
             unit=recipe_ingredient.unit
         )
         db.add(db_recipe_ingredient)
-    
+
+    # Precomputed columns behind the nutrition filters and sorts on GET /recipes/
+    lines = [(line.ingredient_id, line.quantity) for line in recipe.ingredients]
+    for column, value in nutrition.recipe_nutrition_values(nutrient_matrix.current(db), lines).items():
+        setattr(db_recipe, column, value)
     db.commit()
     return db_recipe
 
 def get_recipe(db: Session, recipe_id: int):
     return db.query(models.Recipe).filter(models.Recipe.id == recipe_id).first()
 
-def get_recipes(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Recipe).offset(skip).limit(limit).all()
+# Sort keys accepted by get_recipes; the nutrition ones are indexed columns
+RECIPE_SORT_COLUMNS = {
+    "calories": models.Recipe.calories,
+    "protein": models.Recipe.protein,
+    "carbs": models.Recipe.carbs,
+    "fat": models.Recipe.fat,
+    "fiber": models.Recipe.fiber,
+    "protein_density": models.Recipe.protein_density,
+    "name": models.Recipe.name,
+    "created_at": models.Recipe.created_at,
+}
+
+def get_recipes(db: Session, skip: int = 0, limit: int = 100, filters: Optional[schemas.RecipeFilter] = None,
+                sort: Optional[str] = None, descending: bool = False):
+    query = db.query(models.Recipe)
+    if filters is not None:
+        for nutrient in nutrition.RECIPE_NUTRIENT_COLUMNS:
+            column = getattr(models.Recipe, nutrient)
+            low, high = getattr(filters, f"min_{nutrient}"), getattr(filters, f"max_{nutrient}")
+            if low is not None:
+                query = query.filter(column >= low)
+            if high is not None:
+                query = query.filter(column <= high)
+        if filters.category is not None:
+            query = query.filter(models.Recipe.main_category == filters.category)
+        if filters.user_id is not None:
+            query = query.filter(models.Recipe.user_id == filters.user_id)
+        if filters.is_public is not None:
+            query = query.filter(models.Recipe.is_public == ("true" if filters.is_public else "false"))
+    if sort is not None:
+        column = RECIPE_SORT_COLUMNS[sort]
+        # Recipes whose nutrition is not computed yet cannot be ranked; dropping them keeps the sort on the index
+        query = query.filter(column.isnot(None))
+        query = query.order_by(column.desc(), models.Recipe.id.desc()) if descending else query.order_by(column, models.Recipe.id)
+    return query.offset(skip).limit(limit).all()
+
+def get_recipes_by_ids(db: Session, recipe_ids: List[int]):
+    """Fetch many recipes with one IN query, eager-loading their ingredients"""
+    return db.query(models.Recipe).filter(models.Recipe.id.in_(recipe_ids)).options(
+        selectinload(models.Recipe.ingredient_associations).joinedload(models.RecipeIngredient.ingredient)
+    ).all()
 
 # Meal Plan CRUD operations
 def create_meal_plan(db: Session, meal_plan: MealPlanCreate, user_id: int):
@@ -112,8 +190,7 @@ def create_meal_plan(db: Session, meal_plan: MealPlanCreate, user_id: int):
         user_id=user_id
     )
     db.add(db_meal_plan)
-    db.commit()
-    db.refresh(db_meal_plan)
+    db.flush()
     
     # Add meal plan items
     for item in meal_plan.meal_plan_items:
@@ -124,7 +201,10 @@ def create_meal_plan(db: Session, meal_plan: MealPlanCreate, user_id: int):
             meal_type=item.meal_type
         )
         db.add(db_meal_plan_item)
-    
+    db.flush()
+
+    # Stored totals are written in the same transaction as the items
+    db_meal_plan.nutrition = nutrition.meal_plan_nutrition(db, db_meal_plan.id)
     db.commit()
     db.refresh(db_meal_plan)
     return db_meal_plan
@@ -132,9 +212,69 @@ def create_meal_plan(db: Session, meal_plan: MealPlanCreate, user_id: int):
 def get_meal_plan(db: Session, meal_plan_id: int):
     return db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).first()
 
+def get_meal_plan_with_items(db: Session, meal_plan_id: int):
+    """One meal plan with items, recipes and ingredients eager-loaded (a fixed number of queries)"""
+    return db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).options(
+        selectinload(models.MealPlan.meal_plan_items).joinedload(models.MealPlanItem.recipe).selectinload(models.Recipe.ingredient_associations).joinedload(models.RecipeIngredient.ingredient)
+    ).first()
+
+def get_meal_plan_nutrition(db: Session, meal_plan_id: int):
+    """(user_id, is_template, nutrition) of a meal plan: one row, no items, or None"""
+    return db.query(
+        models.MealPlan.user_id, models.MealPlan.is_template, models.MealPlan.nutrition
+    ).filter(models.MealPlan.id == meal_plan_id).first()
+
 def get_meal_plans(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.MealPlan).offset(skip).limit(limit).all()
 
+def get_meal_plans_by_ids(db: Session, meal_plan_ids: List[int]):
+    """Fetch many meal plans with one IN query, eager-loading items, recipes and ingredients"""
+    return db.query(models.MealPlan).filter(models.MealPlan.id.in_(meal_plan_ids)).options(
+        selectinload(models.MealPlan.meal_plan_items).joinedload(models.MealPlanItem.recipe).selectinload(models.Recipe.ingredient_associations).joinedload(models.RecipeIngredient.ingredient)
+    ).all()
+
+def get_meal_plan_access(db: Session, meal_plan_id: int):
+    """(user_id, is_template) of a meal plan without loading it, or None"""
+    return db.query(models.MealPlan.user_id, models.MealPlan.is_template).filter(models.MealPlan.id == meal_plan_id).first()
+
+def clone_meal_plan(db: Session, meal_plan_id: int, user_ids: List[int], name: Optional[str] = None):
+    """
+    Copy a meal plan and its items to each existing user in `user_ids` with two
+    INSERT ... SELECT statements in one transaction. Returns (user_id, new meal plan id)
+    pairs and the number of items copied per plan.
+    """
+    source = models.MealPlan.__table__
+    items = models.MealPlanItem.__table__
+    users = models.User.__table__
+
+    # One copy per target user; joining users skips ids that do not exist
+    plan_copies = select(
+        literal(name) if name is not None else source.c.name,
+        users.c.id,
+        literal("false"),
+        source.c.nutrition,
+    ).select_from(source.join(users, users.c.id.in_(user_ids))).where(source.c.id == meal_plan_id)
+    clones = db.execute(
+        insert(source)
+        .from_select(["name", "user_id", "is_template", "nutrition"], plan_copies)
+        .returning(source.c.user_id, source.c.id)
+    ).all()
+
+    item_count = 0
+    if clones:
+        new_plans = source.alias("new_plans")
+        item_copies = select(
+            new_plans.c.id, items.c.recipe_id, items.c.day_of_week, items.c.meal_type
+        ).select_from(
+            items.join(new_plans, new_plans.c.id.in_([plan_id for _, plan_id in clones]))
+        ).where(items.c.meal_plan_id == meal_plan_id).order_by(new_plans.c.id, items.c.id)
+        copied = db.execute(
+            insert(items).from_select(["meal_plan_id", "recipe_id", "day_of_week", "meal_type"], item_copies)
+        ).rowcount
+        item_count = copied // len(clones)
+    db.commit()
+    return [(user_id, plan_id) for user_id, plan_id in clones], item_count
+
 def get_user_meal_plans(db: Session, user_id: int, skip: int = 0, limit: int = 100):
     return db.query(models.MealPlan).filter(models.MealPlan.user_id == user_id).offset(skip).limit(limit).all()
 
@@ -142,6 +282,9 @@ def delete_meal_plan(db: Session, meal_plan_id: int):
     db_meal_plan = db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).first()
     if db_meal_plan:
         db.delete(db_meal_plan)
+        db.add(models.Tombstone(entity_type="meal_plan", entity_id=meal_plan_id, user_id=db_meal_plan.user_id))
+        db.flush()
+        daily_nutrition.refresh_plans(db, [meal_plan_id])
         db.commit()
     return db_meal_plan
 
@@ -165,22 +308,46 @@ def update_meal_plan(db: Session, meal_plan_id: int, meal_plan: MealPlanCreate):
             meal_type=item.meal_type
         )
         db.add(db_meal_plan_item)
-    
+    db.flush()
+
+    db_meal_plan.nutrition = nutrition.meal_plan_nutrition(db, db_meal_plan.id)
+    # Item changes do not touch the plan row itself, so bump updated_at explicitly
+    db_meal_plan.updated_at = func.now()
     db.commit()
     db.refresh(db_meal_plan)
     return db_meal_plan
 
 # Weekly Assignment CRUD operations
 def create_weekly_assignment(db: Session, assignment: schemas.WeeklyAssignmentCreate):
-    db_assignment = models.WeeklyAssignment(
-        week_start_date=assignment.week_start_date,
-        meal_plan_id=assignment.meal_plan_id,
-        user_id=assignment.user_id
-    )
-    db.add(db_assignment)
+    """Assign a plan to the user's week, replacing any plan already assigned to it"""
+    ids = upsert_weekly_assignments(db, assignment.user_id, [(assignment.week_start_date, assignment.meal_plan_id)])
+    return db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.id == ids[0]).first()
+
+def upsert_weekly_assignments(db: Session, user_id: int, weeks: List[tuple]):
+    """
+    Assign (week_start_date, meal_plan_id) pairs to a user in one
+    INSERT ... ON CONFLICT (user_id, week_start_date) DO UPDATE statement.
+    A week listed twice keeps its last plan. Returns ids in week order.
+    """
+    plan_by_week = dict(weeks)
+    stmt = dialect_insert(db)(models.WeeklyAssignment).values([
+        {"user_id": user_id, "week_start_date": week, "meal_plan_id": meal_plan_id,
+         "created_at": func.now(), "updated_at": func.now()}
+        for week, meal_plan_id in sorted(plan_by_week.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "week_start_date"],
+        set_={"meal_plan_id": stmt.excluded.meal_plan_id, "updated_at": func.now()},
+    ).returning(models.WeeklyAssignment.id, models.WeeklyAssignment.week_start_date)
+    rows = db.execute(stmt).all()
+    daily_nutrition.refresh_weeks(db, user_id, plan_by_week)
     db.commit()
-    db.refresh(db_assignment)
-    return db_assignment
+    return [row.id for row in sorted(rows, key=lambda row: row.week_start_date)]
+
+def get_weekly_assignments_by_ids(db: Session, assignment_ids: List[int]):
+    return db.query(models.WeeklyAssignment).filter(
+        models.WeeklyAssignment.id.in_(assignment_ids)
+    ).order_by(models.WeeklyAssignment.week_start_date).all()
 
 def get_weekly_assignment_by_week(db: Session, week_start_date: str, user_id: int):
     return db.query(models.WeeklyAssignment).filter(
@@ -203,7 +370,10 @@ def update_weekly_assignment(db: Session, assignment_id: int, assignment: schema
         return None
     
     db_assignment.meal_plan_id = assignment.meal_plan_id
-    db_assignment.updated_at = datetime.utcnow()
+    # Database clock, like the column default, so delta sync watermarks compare like with like
+    db_assignment.updated_at = func.now()
+    db.flush()
+    daily_nutrition.refresh_weeks(db, db_assignment.user_id, [db_assignment.week_start_date])
     
     db.commit()
     db.refresh(db_assignment)
@@ -215,5 +385,156 @@ def delete_weekly_assignment(db: Session, assignment_id: int):
     ).first()
     if db_assignment:
         db.delete(db_assignment)
+        db.add(models.Tombstone(entity_type="weekly_assignment", entity_id=assignment_id, user_id=db_assignment.user_id))
+        db.flush()
+        daily_nutrition.refresh_weeks(db, db_assignment.user_id, [db_assignment.week_start_date])
         db.commit()
     return db_assignment
+
+def get_user_weekly_assignments_in_range(db: Session, user_id: int, start: date, end: date):
+    """Assignments whose week starts within [start, end], without the nested meal plan graph"""
+    return db.query(models.WeeklyAssignment).filter(
+        models.WeeklyAssignment.user_id == user_id,
+        models.WeeklyAssignment.week_start_date >= start,
+        models.WeeklyAssignment.week_start_date <= end
+    ).order_by(models.WeeklyAssignment.week_start_date).all()
+
+def get_calendar_feed_version(db: Session, user_id: int, start: date, end: date):
+    """(assignment count, latest updated_at of those assignments, their plans and recipes) for weeks in [start, end]"""
+    in_window = (
+        models.WeeklyAssignment.user_id == user_id,
+        models.WeeklyAssignment.week_start_date >= start,
+        models.WeeklyAssignment.week_start_date <= end,
+    )
+    # Events show recipe names and calories, so recipe edits must change the validators too
+    recipes_updated = select(func.max(models.Recipe.updated_at)).join(
+        models.MealPlanItem, models.MealPlanItem.recipe_id == models.Recipe.id
+    ).join(
+        models.WeeklyAssignment, models.WeeklyAssignment.meal_plan_id == models.MealPlanItem.meal_plan_id
+    ).where(*in_window).correlate(None).scalar_subquery()
+    count, assignments_updated, plans_updated, recipes_updated = db.query(
+        func.count(models.WeeklyAssignment.id),
+        func.max(models.WeeklyAssignment.updated_at),
+        func.max(models.MealPlan.updated_at),
+        recipes_updated,
+    ).outerjoin(models.MealPlan, models.MealPlan.id == models.WeeklyAssignment.meal_plan_id).filter(*in_window).one()
+    stamps = [stamp for stamp in (assignments_updated, plans_updated, recipes_updated) if stamp is not None]
+    return count, max(stamps, default=None)
+
+def iter_calendar_items(db: Session, user_id: int, start: date, end: date, batch_size: int = 500):
+    """Flat rows, one per meal plan item of each assignment in [start, end], streamed in batches"""
+    return db.query(
+        models.WeeklyAssignment.week_start_date,
+        models.MealPlan.name.label("meal_plan_name"),
+        models.MealPlanItem.id.label("item_id"),
+        models.MealPlanItem.day_of_week,
+        models.MealPlanItem.meal_type,
+        models.Recipe.name.label("recipe_name"),
+        models.Recipe.calories,
+    ).join(
+        models.MealPlan, models.MealPlan.id == models.WeeklyAssignment.meal_plan_id
+    ).join(
+        models.MealPlanItem, models.MealPlanItem.meal_plan_id == models.MealPlan.id
+    ).outerjoin(
+        models.Recipe, models.Recipe.id == models.MealPlanItem.recipe_id
+    ).filter(
+        models.WeeklyAssignment.user_id == user_id,
+        models.WeeklyAssignment.week_start_date >= start,
+        models.WeeklyAssignment.week_start_date <= end
+    ).order_by(models.WeeklyAssignment.week_start_date, models.MealPlanItem.id).yield_per(batch_size)
+
+def _date_bucket(db: Session, column, bucket: str):
+    """Expression truncating a date column to its ISO week (Monday) or month"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Inline the unit so GROUP BY and SELECT compile to the same expression
+        return cast(func.date_trunc(literal_column(f"'{bucket}'"), column), Date)
+    modifiers = ("weekday 0", "-6 days") if bucket == "week" else ("start of month",)
+    return type_coerce(func.date(column, *[literal_column(f"'{modifier}'") for modifier in modifiers]), Date)
+
+def get_daily_nutrition_history(db: Session, user_id: int, start: date, end: date, bucket: str):
+    """Per-week or per-month sums of the user's daily_nutrition rows in [start, end]"""
+    period = _date_bucket(db, models.DailyNutrition.date, bucket)
+    return db.query(
+        period.label("start"),
+        func.count().label("days"),
+        *[func.sum(getattr(models.DailyNutrition, nutrient)).label(nutrient) for nutrient in nutrition.NUTRIENT_COLUMNS],
+    ).filter(
+        models.DailyNutrition.user_id == user_id,
+        models.DailyNutrition.date >= start,
+        models.DailyNutrition.date <= end
+    ).group_by(period).order_by(period).all()
+
+def get_user_bootstrap(db: Session, user_id: int, start: date, end: date):
+    """
+    Everything the planner and dashboard need, in a fixed number of queries:
+    assignments in range, the user's plans plus any plan those assignments reference
+    (with items), and each referenced recipe exactly once (with ingredients).
+    """
+    assignments = get_user_weekly_assignments_in_range(db, user_id, start, end)
+    assigned_plan_ids = {a.meal_plan_id for a in assignments}
+
+    meal_plan_filter = models.MealPlan.user_id == user_id
+    if assigned_plan_ids:
+        meal_plan_filter = or_(meal_plan_filter, models.MealPlan.id.in_(assigned_plan_ids))
+    meal_plans = db.query(models.MealPlan).filter(meal_plan_filter).options(
+        selectinload(models.MealPlan.meal_plan_items)
+    ).order_by(models.MealPlan.id).all()
+
+    recipe_ids = sorted({item.recipe_id for plan in meal_plans for item in plan.meal_plan_items})
+    recipes = get_recipes_by_ids(db, recipe_ids) if recipe_ids else []
+    return assignments, meal_plans, recipes
+
+def get_meal_plan_graph(db: Session, meal_plans: List[models.MealPlan]):
+    """
+    Load the items of already-fetched meal plans in one query and every recipe and
+    ingredient they reference exactly once, for normalized responses.
+    Returns (recipes, ingredients); items are attached to the plans.
+    """
+    items_by_plan = defaultdict(list)
+    plan_ids = [plan.id for plan in meal_plans]
+    if plan_ids:
+        items = db.query(models.MealPlanItem).filter(
+            models.MealPlanItem.meal_plan_id.in_(plan_ids)
+        ).order_by(models.MealPlanItem.id)
+        for item in items:
+            items_by_plan[item.meal_plan_id].append(item)
+    for plan in meal_plans:
+        set_committed_value(plan, "meal_plan_items", items_by_plan[plan.id])
+
+    recipe_ids = sorted({item.recipe_id for items in items_by_plan.values() for item in items})
+    recipes = db.query(models.Recipe).filter(models.Recipe.id.in_(recipe_ids)).options(
+        selectinload(models.Recipe.ingredient_associations)
+    ).all() if recipe_ids else []
+    ingredient_ids = sorted({a.ingredient_id for recipe in recipes for a in recipe.ingredient_associations})
+    ingredients = get_ingredients_by_ids(db, ingredient_ids) if ingredient_ids else []
+    return recipes, ingredients
+
+def get_user_weekly_assignments_graph(db: Session, user_id: int):
+    """Weekly assignments plus their distinct meal plans, recipes and ingredients, each loaded once"""
+    assignments = db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.user_id == user_id).all()
+    plan_ids = {a.meal_plan_id for a in assignments}
+    meal_plans = db.query(models.MealPlan).filter(models.MealPlan.id.in_(plan_ids)).all() if plan_ids else []
+    recipes, ingredients = get_meal_plan_graph(db, meal_plans)
+    return assignments, meal_plans, recipes, ingredients
+
+# Delta sync queries
+def get_ingredient_changes(db: Session, start: Optional[sync.Watermark], cutoff: datetime, limit: int):
+    return sync.page_changes(db.query(models.Ingredient), models.Ingredient, start, cutoff, limit)
+
+def get_recipe_changes(db: Session, start: Optional[sync.Watermark], cutoff: datetime, limit: int):
+    query = db.query(models.Recipe).options(selectinload(models.Recipe.ingredient_associations))
+    return sync.page_changes(query, models.Recipe, start, cutoff, limit)
+
+def get_user_changes(db: Session, user_id: int, start: Optional[sync.Watermark], cutoff: datetime):
+    """The user's plans and assignments changed in the window, plus ids deleted in it"""
+    meal_plans = sync.changed_since(
+        db.query(models.MealPlan).filter(models.MealPlan.user_id == user_id).options(selectinload(models.MealPlan.meal_plan_items)),
+        models.MealPlan, start, cutoff,
+    ).all()
+    assignments = sync.changed_since(
+        db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.user_id == user_id),
+        models.WeeklyAssignment, start, cutoff,
+    ).all()
+    deleted_meal_plans = sync.deleted_ids(db, "meal_plan", start, cutoff, user_id=user_id)
+    deleted_assignments = sync.deleted_ids(db, "weekly_assignment", start, cutoff, user_id=user_id)
+    return meal_plans, assignments, deleted_meal_plans, deleted_assignments
@@ -0,0 +1,135 @@
+"""
+Daily nutrition fact table
+`daily_nutrition` holds one row per (user_id, date) for every day of an assigned
+week, copied from the assigned plan's stored per-day totals, so intake history
+over months or years is a range scan on the primary key instead of a walk
+through assignments, plans, items and recipes.
+
+Rows are kept current incrementally:
+- assignment writes rewrite the weeks they touch, in the same transaction
+- plan edits enqueue `refresh_daily_nutrition`, which rewrites every row copied
+  from those plans (a shared plan can back many users' weeks)
+- plan deletes drop the plan's rows with `refresh_plans`, in the same transaction
+- ingredient edits refresh the affected plans' rows in recompute_meal_plan_nutrition
+`backfill_daily_nutrition` rebuilds the table from scratch, e.g. after deploying it.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import and_, delete, func
+from sqlalchemy.orm import Session
+
+import jobs
+import models
+import nutrition
+from database import dialect_insert
+
+BATCH_SIZE = 500
+
+
+def _plan_days(db: Session, meal_plan_id: int, stored: Optional[dict], cache: Dict[int, dict]) -> dict:
+    """Per-day totals of a plan, computed when its stored totals have not been backfilled yet"""
+    if meal_plan_id not in cache:
+        cache[meal_plan_id] = (stored or nutrition.meal_plan_nutrition(db, meal_plan_id)).get("days", {})
+    return cache[meal_plan_id]
+
+
+def _write_assignments(db: Session, condition, only_dates: Optional[Set[date]] = None) -> int:
+    """
+    Upsert fact rows for every assignment matching `condition` (restricted to
+    `only_dates` when given); returns the number of rows.
+    Weeks are expected to start on the same weekday, but when two assignments overlap
+    the day goes to the one with the later week_start_date.
+    """
+    rows = db.query(
+        models.WeeklyAssignment.user_id,
+        models.WeeklyAssignment.week_start_date,
+        models.WeeklyAssignment.meal_plan_id,
+        models.MealPlan.nutrition,
+    ).join(
+        models.MealPlan, models.MealPlan.id == models.WeeklyAssignment.meal_plan_id
+    ).filter(condition).order_by(models.WeeklyAssignment.week_start_date).all()
+
+    cache: Dict[int, dict] = {}
+    facts = {}
+    for row in rows:
+        days = _plan_days(db, row.meal_plan_id, row.nutrition, cache)
+        for offset, day_of_week in enumerate(nutrition.WEEK_DAYS):
+            day = row.week_start_date + timedelta(days=offset)
+            if only_dates is not None and day not in only_dates:
+                continue
+            totals = days.get(day_of_week) or nutrition.empty_totals()
+            facts[(row.user_id, day)] = {
+                "user_id": row.user_id,
+                "date": day,
+                "meal_plan_id": row.meal_plan_id,
+                **{nutrient: totals.get(nutrient, 0.0) for nutrient in nutrition.NUTRIENT_COLUMNS},
+            }
+
+    facts = list(facts.values())
+    insert = dialect_insert(db)
+    for start in range(0, len(facts), BATCH_SIZE * 7):
+        stmt = insert(models.DailyNutrition).values(facts[start:start + BATCH_SIZE * 7])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "date"],
+            set_={
+                "meal_plan_id": stmt.excluded.meal_plan_id,
+                **{nutrient: stmt.excluded[nutrient] for nutrient in nutrition.NUTRIENT_COLUMNS},
+                "updated_at": func.now(),
+            },
+        ))
+    return len(facts)
+
+
+def refresh_weeks(db: Session, user_id: int, week_start_dates: Iterable[date]):
+    """Rewrite a user's rows for the given assigned (or just unassigned) weeks (caller commits)"""
+    weeks = sorted(set(week_start_dates))
+    if not weeks:
+        return
+    days = {week + timedelta(days=offset) for week in weeks for offset in range(7)}
+    db.execute(delete(models.DailyNutrition).where(
+        models.DailyNutrition.user_id == user_id, models.DailyNutrition.date.in_(sorted(days))
+    ))
+    # Overlapping neighbours may own some of the cleared days
+    _write_assignments(db, and_(
+        models.WeeklyAssignment.user_id == user_id,
+        models.WeeklyAssignment.week_start_date.between(weeks[0] - timedelta(days=6), weeks[-1] + timedelta(days=6)),
+    ), only_dates=days)
+
+
+def refresh_plans(db: Session, meal_plan_ids: Iterable[int]):
+    """Rewrite every row copied from the given plans; rows of deleted plans are dropped (caller commits)"""
+    meal_plan_ids = sorted(set(meal_plan_ids))
+    if not meal_plan_ids:
+        return
+    db.execute(delete(models.DailyNutrition).where(models.DailyNutrition.meal_plan_id.in_(meal_plan_ids)))
+    _write_assignments(db, models.WeeklyAssignment.meal_plan_id.in_(meal_plan_ids))
+
+
+@jobs.job_handler("refresh_daily_nutrition")
+def refresh_daily_nutrition(db: Session, payload: dict):
+    """Rewrite the fact rows of payload['meal_plan_ids'] after those plans changed"""
+    meal_plan_ids = payload.get("meal_plan_ids", [])
+    for start in range(0, len(meal_plan_ids), BATCH_SIZE):
+        refresh_plans(db, meal_plan_ids[start:start + BATCH_SIZE])
+        db.commit()
+
+
+@jobs.job_handler("backfill_daily_nutrition")
+def backfill_daily_nutrition(db: Session, payload: dict):
+    """Rebuild the rows of payload['user_id'], or of every user with assignments, BATCH_SIZE users at a time"""
+    user_id: Optional[int] = payload.get("user_id")
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        # Users whose last assignment is gone still have rows to drop
+        user_ids = sorted(
+            {row.user_id for row in db.query(models.WeeklyAssignment.user_id).distinct()}
+            | {row.user_id for row in db.query(models.DailyNutrition.user_id).distinct()}
+        )
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        db.execute(delete(models.DailyNutrition).where(models.DailyNutrition.user_id.in_(batch)))
+        _write_assignments(db, models.WeeklyAssignment.user_id.in_(batch))
+        db.commit()
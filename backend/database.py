@@ -1,5 +1,13 @@
 import os
-from sqlalchemy import create_engine
+import math
+import time
+import hashlib
+import itertools
+import threading
+from typing import List, Optional, Tuple
+from fastapi import Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -13,6 +21,19 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 if not SQLALCHEMY_DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set")
 
+# Optional comma-separated read replica URLs; GET requests are spread across them
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# After a client writes, its reads stay on the primary for this long (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Cookie holding the (wall clock) time until which the client reads from the primary;
+# it travels with the client, so the pin holds whichever worker serves the next read
+PRIMARY_UNTIL_COOKIE = "nr_primary_until"
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+# PostgreSQL replicas replaying WAL further behind than this are taken out of rotation
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+
+READ_ONLY_METHODS = {"GET", "HEAD"}
+
 # Create SQLAlchemy engine for PostgreSQL
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
@@ -22,10 +43,217 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class
 Base = declarative_base()
 
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = True
+        self.last_error: Optional[str] = None
+
+    def configure(self, **engine_options):
+        self.engine.dispose(close=False)
+        self.engine = create_engine(self.url, pool_pre_ping=True, **engine_options)
+        self.SessionLocal.configure(bind=self.engine)
+
+    def replay_status(self, conn) -> Tuple[bool, float]:
+        """
+        (replayed everything received, seconds since the last replayed transaction) on
+        PostgreSQL; other databases only prove connectivity
+        """
+        if self.engine.dialect.name == "postgresql":
+            row = conn.execute(text(
+                "SELECT NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AS caught_up, "
+                "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS replay_age"
+            )).one()
+            return bool(row.caught_up), float(row.replay_age or 0)
+        conn.execute(text("SELECT 1"))
+        return True, 0.0
+
+    def replication_lag(self, conn) -> float:
+        """Seconds of WAL replay lag"""
+        caught_up, replay_age = self.replay_status(conn)
+        # The last replayed transaction ages while the primary is idle; that is not lag
+        return 0.0 if caught_up else replay_age
+
+    def check(self):
+        """Connectivity and replay lag probe run by the background checker"""
+        try:
+            with self.engine.connect() as conn:
+                lag = self.replication_lag(conn)
+            if lag > REPLICA_MAX_LAG_SECONDS:
+                raise RuntimeError(f"replication lag {lag:.1f}s")
+            self.healthy, self.last_error = True, None
+        except Exception as e:
+            self.healthy, self.last_error = False, str(e)
+
+
+class ReplicaRouter:
+    """Round-robin over healthy replicas"""
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(f"replica{i}", url) for i, url in enumerate(urls)]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._checker_pid: Optional[int] = None
+
+    def _ensure_checker(self):
+        # Threads do not survive fork, so (re)start the checker in whichever process routes
+        if self._checker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+            threading.Thread(target=self._check_forever, name="replica-health-check", daemon=True).start()
+
+    def _check_forever(self):
+        while True:
+            time.sleep(REPLICA_HEALTH_CHECK_SECONDS)
+            for replica in self.replicas:
+                replica.check()
+
+    def pick(self) -> Optional[Replica]:
+        self._ensure_checker()
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+
+replica_router = ReplicaRouter(REPLICA_DATABASE_URLS) if REPLICA_DATABASE_URLS else None
+
+
+def configure(pool_size: Optional[int] = None, max_overflow: Optional[int] = None):
+    """
+    Replace the primary and replica engines, e.g. in a freshly forked worker. Pooled
+    connections inherited from the parent are dropped without being closed, so the
+    parent's sockets stay intact. Sessions made from SessionLocal afterwards use the new
+    engine; always read `database.engine` rather than a copy imported earlier.
+    """
+    global engine
+    options = {}
+    if pool_size is not None:
+        options["pool_size"] = pool_size
+    if max_overflow is not None:
+        options["max_overflow"] = max_overflow
+    engine.dispose(close=False)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **options)
+    SessionLocal.configure(bind=engine)
+    for replica in replica_router.replicas if replica_router else []:
+        replica.configure(**options)
+    return engine
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller for rate limiting: its bearer token, else its address"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return hashlib.sha256(authorization.encode()).hexdigest()
+    return request.client.host if request.client else "anonymous"
+
+
+def is_replica_session(db) -> bool:
+    return db.info.get("replica") is not None
+
+
+def wrote_recently(request: Request) -> bool:
+    """Whether the client's primary pin, set by a write in the last READ_YOUR_WRITES_SECONDS, is still on"""
+    try:
+        until = float(request.cookies.get(PRIMARY_UNTIL_COOKIE, ""))
+    except ValueError:
+        return False
+    now = time.time()
+    # A forged far-future value is ignored rather than pinning the client forever
+    return now < until <= now + READ_YOUR_WRITES_SECONDS
+
+
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    """
+    Primary session for writes; for GET/HEAD a replica session when replicas are
+    configured, healthy, and the client has not written in the last
+    READ_YOUR_WRITES_SECONDS.
+    """
+    replica = None
+    if replica_router is not None:
+        if request.method not in READ_ONLY_METHODS:
+            mark_client_write(request)
+        elif not wrote_recently(request):
+            replica = replica_router.pick()
+
+    if replica is not None:
+        db = replica.SessionLocal()
+        db.info["replica"] = replica.name
+    else:
+        db = SessionLocal()
     try:
         yield db
+    except OperationalError as e:
+        if replica is not None:
+            # Take the replica out of rotation until the checker sees it healthy again
+            replica.healthy, replica.last_error = False, str(e)
+        raise
     finally:
         db.close()
+
+
+def dialect_insert(db):
+    """The dialect's insert() construct, which supports ON CONFLICT upserts"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT upserts are not supported on {dialect}")
+    return insert
+
+
+def mark_client_write(request: Request):
+    """Pin the client's next reads to the primary; ReadYourWritesMiddleware sends the pin as a cookie"""
+    if replica_router is not None:
+        request.state.primary_until = time.time() + READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware setting the PRIMARY_UNTIL_COOKIE on responses to requests that wrote"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            until = scope.get("state", {}).get("primary_until")
+            if message["type"] == "http.response.start" and until is not None:
+                cookie = (
+                    f"{PRIMARY_UNTIL_COOKIE}={until:.3f}; Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def pool_metrics() -> List[str]:
+    lines = ["# HELP db_pool_connections Primary connection pool state", "# TYPE db_pool_connections gauge"]
+    pool = engine.pool
+    for state in ("checkedout", "checkedin", "size", "overflow"):
+        counter = getattr(pool, state, None)
+        if callable(counter):
+            lines.append(f'db_pool_connections{{state="{state}"}} {counter()}')
+    return lines
+
+
+def replica_metrics() -> List[str]:
+    lines = ["# HELP db_replica_healthy Whether a read replica is in rotation", "# TYPE db_replica_healthy gauge"]
+    for replica in replica_router.replicas if replica_router else []:
+        lines.append(f'db_replica_healthy{{replica="{replica.name}"}} {int(replica.healthy)}')
+    return lines
@@ -0,0 +1,384 @@
+"""
+Scalable synthetic data generator for Nutri-Regimen
+Builds users, recipes, meal plans and weekly assignments whose shapes follow the
+seed data in init_db.py, and bulk-inserts them (COPY on PostgreSQL, batched
+multi-row INSERTs elsewhere). Recipe nutrition columns, stored meal plan totals
+and the daily_nutrition history are filled the way the API would write them. The same --seed always
+produces the same rows, so benchmark runs are reproducible.
+
+Usage:
+    python generate_data.py --users 10000 --recipes-per-user 8 --plans-per-user 3 --weeks 26
+    DATABASE_URL=sqlite:///./bench.db python generate_data.py --reset --users 100 --seed 7
+"""
+
+import os
+import sys
+import csv
+import io
+import json
+import random
+import time
+import uuid
+import argparse
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import engine as default_engine
+from models import Base, User, Ingredient, Recipe, RecipeIngredient, MealPlan, MealPlanItem, WeeklyAssignment, DailyNutrition
+from init_db import INGREDIENTS_DATA, RECIPES_DATA
+from daily_nutrition import backfill_daily_nutrition
+from nutrient_matrix import NutrientMatrix
+from nutrition import recipe_nutrition_values, slot_lines_nutrition
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+TABLE_ORDER = [Ingredient, User, Recipe, RecipeIngredient, MealPlan, MealPlanItem, WeeklyAssignment]
+EPOCH = datetime(2024, 1, 1)
+
+
+class BulkWriter:
+    """Buffers rows per table and writes them with COPY (PostgreSQL) or executemany INSERTs"""
+
+    def __init__(self, engine: Engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.use_copy = engine.dialect.name == "postgresql"
+        self.buffers = {model.__table__.name: [] for model in TABLE_ORDER}
+        self.counts = {name: 0 for name in self.buffers}
+
+    def add(self, model, row: dict):
+        rows = self.buffers[model.__table__.name]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Parents before children so foreign keys always resolve
+        with self.engine.begin() as conn:
+            for model in TABLE_ORDER:
+                table = model.__table__
+                rows = self.buffers[table.name]
+                if not rows:
+                    continue
+                if self.use_copy:
+                    self._copy(conn, table, rows)
+                else:
+                    conn.execute(insert(table), rows)
+                self.counts[table.name] += len(rows)
+                self.buffers[table.name] = []
+
+    def _copy(self, conn, table, rows):
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["" if row[c] is None else json.dumps(row[c]) if isinstance(row[c], dict) else row[c] for c in columns])
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+
+def next_id(engine: Engine, model) -> int:
+    with engine.connect() as conn:
+        return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def reset_sequences(engine: Engine):
+    """COPY bypasses the serial sequences, so move them past the generated ids"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for model in TABLE_ORDER:
+            if "id" not in model.__table__.c:
+                continue
+            table = model.__table__.name
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+            ))
+
+
+def timestamp(rng: random.Random, days: int = 540) -> datetime:
+    return EPOCH + timedelta(seconds=rng.randrange(days * 86400))
+
+
+def skewed_index(rng: random.Random, size: int, alpha: float = 1.2) -> int:
+    """Pick an index in [0, size) with a long-tailed popularity (low indexes are popular)"""
+    return min(size - 1, int(rng.paretovariate(alpha)) - 1)
+
+
+def count_around(rng: random.Random, mean: float, minimum: int = 0) -> int:
+    """Long-tailed per-user count with the requested mean: most users have a few, some have many"""
+    if mean <= 0:
+        return minimum
+    return max(minimum, int(round(rng.expovariate(1 / mean))))
+
+
+def ensure_ingredients(engine: Engine, writer: BulkWriter, rng: random.Random, variants: int):
+    """Insert the seed catalog (plus jittered variants) when the table is empty; return [(id, data)]"""
+    with engine.connect() as conn:
+        existing = conn.execute(select(Ingredient.id, Ingredient.name, Ingredient.category)).all()
+    if existing:
+        return [(row.id, {"name": row.name, "category": row.category}) for row in existing]
+
+    catalog = []
+    ingredient_id = next_id(engine, Ingredient)
+    for copy in range(variants + 1):
+        for data in INGREDIENTS_DATA:
+            row = dict(data)
+            if copy:
+                row["name"] = f"{data['name']} #{copy + 1}"
+                for key, value in data.items():
+                    if key.endswith("_per_100g"):
+                        jittered = max(0.0, value * rng.uniform(0.85, 1.15))
+                        row[key] = int(round(jittered)) if key == "calories_per_100g" else round(jittered, 1)
+            created = timestamp(rng)
+            row.update(id=ingredient_id, created_at=created, updated_at=created)
+            writer.add(Ingredient, row)
+            catalog.append((ingredient_id, row))
+            ingredient_id += 1
+    writer.flush()
+    return catalog
+
+
+class RecipeFactory:
+    """Derives new recipes from the seed recipes: same structure, jittered quantities, category-preserving swaps"""
+
+    def __init__(self, rng: random.Random, catalog, ingredients_per_recipe: float):
+        self.rng = rng
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.ids_by_name = {}
+        self.ids_by_category = {}
+        for ingredient_id, data in catalog:
+            base_name = data["name"].split(" #")[0]
+            self.ids_by_name.setdefault(base_name, []).append(ingredient_id)
+            self.ids_by_category.setdefault(data["category"], []).append(ingredient_id)
+        self.categories = list(self.ids_by_category)
+        self.category_by_name = {data["name"]: data["category"] for data in INGREDIENTS_DATA}
+        self.templates = [r for r in RECIPES_DATA if all(name in self.ids_by_name for name, _, _ in r["ingredients"])]
+        if not self.templates:
+            raise ValueError("Ingredient catalog does not contain the seed ingredients; run with --reset")
+
+    def ingredients(self):
+        template = self.rng.choice(self.templates)
+        target = max(2, int(round(self.rng.gauss(self.ingredients_per_recipe, 1.5))))
+        lines = []
+        for name, quantity, unit in template["ingredients"]:
+            if self.rng.random() < 0.25:
+                # Swap for another ingredient of the same category
+                pool = self.ids_by_category[self.category_by_name[name]]
+            else:
+                pool = self.ids_by_name[name]
+            lines.append((self.rng.choice(pool), quantity, unit))
+        while len(lines) < target:
+            pool = self.ids_by_category[self.rng.choice(self.categories)]
+            lines.append((self.rng.choice(pool), self.rng.choice([5, 10, 30, 50, 80, 100, 150]), "g"))
+        self.rng.shuffle(lines)
+        lines = lines[:target]
+
+        # (recipe_id, ingredient_id) is the primary key, so merge duplicates
+        merged = {}
+        for ingredient_id, quantity, unit in lines:
+            jittered = round(quantity * self.rng.uniform(0.75, 1.25), 1)
+            if ingredient_id in merged:
+                merged[ingredient_id] = (merged[ingredient_id][0] + jittered, unit)
+            else:
+                merged[ingredient_id] = (jittered, unit)
+        return template, merged
+
+
+def generate(
+    engine: Engine,
+    users: int = 100,
+    recipes_per_user: float = 5,
+    public_recipes: int = 50,
+    plans_per_user: float = 2,
+    weeks: int = 12,
+    ingredients_per_recipe: float = 6,
+    ingredient_variants: int = 0,
+    seed: int = 42,
+    batch_size: int = 10000,
+    start_week: date = date(2025, 1, 6),
+):
+    """Generate and insert a synthetic dataset; returns the number of rows written per table"""
+    rng = random.Random(seed)
+    writer = BulkWriter(engine, batch_size)
+
+    catalog = ensure_ingredients(engine, writer, rng, ingredient_variants)
+    factory = RecipeFactory(rng, catalog, ingredients_per_recipe)
+    # Recipes get their stored nutrition columns, as crud.create_recipe would write them
+    with Session(engine) as db:
+        snapshot = NutrientMatrix().rebuild(db)
+
+    user_id = next_id(engine, User)
+    recipe_id = next_id(engine, Recipe)
+    meal_plan_id = next_id(engine, MealPlan)
+    item_id = next_id(engine, MealPlanItem)
+    assignment_id = next_id(engine, WeeklyAssignment)
+
+    recipe_lines = {}  # recipe id -> (ingredient_id, quantity) lines, for the plans' stored nutrition
+
+    def add_recipe(owner_id, is_public):
+        nonlocal recipe_id
+        template, lines = factory.ingredients()
+        created = timestamp(rng)
+        recipe_lines[recipe_id] = [(ingredient_id, quantity) for ingredient_id, (quantity, _) in lines.items()]
+        writer.add(Recipe, {
+            "id": recipe_id,
+            "name": f"{template['name']} #{recipe_id}",
+            "description": template["description"],
+            "instructions": template["instructions"],
+            "user_id": owner_id,
+            "is_public": is_public,
+            **recipe_nutrition_values(snapshot, recipe_lines[recipe_id]),
+            "created_at": created,
+            "updated_at": created,
+        })
+        for ingredient_id, (quantity, unit) in lines.items():
+            writer.add(RecipeIngredient, {
+                "recipe_id": recipe_id,
+                "ingredient_id": ingredient_id,
+                "quantity": quantity,
+                "unit": unit,
+            })
+        recipe_id += 1
+        return recipe_id - 1
+
+    public_pool = [add_recipe(None, "true") for _ in range(public_recipes)]
+
+    for _ in range(users):
+        created = timestamp(rng)
+        writer.add(User, {
+            "id": user_id,
+            # Leading hex letter: SQLite gives the UUID column numeric affinity and would coerce all-digit values
+            "supabase_user_id": uuid.UUID(int=(0xA << 124) | rng.getrandbits(124), version=4),
+            "email": f"user{user_id}@example.com",
+            "username": f"user{user_id}",
+            "full_name": f"Generated User {user_id}",
+            "avatar_url": None,
+            "created_at": created,
+            "updated_at": created,
+        })
+
+        own_recipes = [add_recipe(user_id, "true" if rng.random() < 0.1 else "false")
+                       for _ in range(count_around(rng, recipes_per_user))]
+
+        plan_ids = []
+        for p in range(count_around(rng, plans_per_user, minimum=1 if weeks else 0)):
+            plan_created = timestamp(rng)
+            items = []
+            for day in DAYS:
+                for meal_type in MEAL_TYPES:
+                    if rng.random() < 0.1:
+                        continue  # Leave some slots empty, as real plans do
+                    if own_recipes and rng.random() < 0.4:
+                        chosen = rng.choice(own_recipes)
+                    elif public_pool:
+                        chosen = public_pool[skewed_index(rng, len(public_pool))]
+                    elif own_recipes:
+                        chosen = rng.choice(own_recipes)
+                    else:
+                        continue
+                    items.append({
+                        "id": item_id,
+                        "meal_plan_id": meal_plan_id,
+                        "recipe_id": chosen,
+                        "day_of_week": day,
+                        "meal_type": meal_type,
+                    })
+                    item_id += 1
+            # Stored totals, as crud.create_meal_plan would write them; the plan row goes first for the foreign keys
+            writer.add(MealPlan, {
+                "id": meal_plan_id,
+                "name": f"Plan {p + 1} of user {user_id}",
+                "user_id": user_id,
+                "is_template": "false",
+                "nutrition": slot_lines_nutrition(snapshot, [
+                    (item["day_of_week"], item["meal_type"], ingredient_id, quantity)
+                    for item in items for ingredient_id, quantity in recipe_lines[item["recipe_id"]]
+                ]),
+                "created_at": plan_created,
+                "updated_at": plan_created,
+            })
+            for item in items:
+                writer.add(MealPlanItem, item)
+            plan_ids.append(meal_plan_id)
+            meal_plan_id += 1
+
+        for week in range(weeks if plan_ids else 0):
+            if rng.random() < 0.2:
+                continue  # Not every week gets planned
+            assigned = timestamp(rng)
+            writer.add(WeeklyAssignment, {
+                "id": assignment_id,
+                "week_start_date": start_week + timedelta(weeks=week),
+                "meal_plan_id": rng.choice(plan_ids),
+                "user_id": user_id,
+                "created_at": assigned,
+                "updated_at": assigned,
+            })
+            assignment_id += 1
+
+        user_id += 1
+
+    writer.flush()
+    reset_sequences(engine)
+    # Daily history rows, as the assignment endpoints would have written them
+    with Session(engine) as db:
+        before = db.query(DailyNutrition).count()
+        backfill_daily_nutrition(db, {})
+        writer.counts[DailyNutrition.__tablename__] = db.query(DailyNutrition).count() - before
+    return writer.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-generate a reproducible synthetic Nutri-Regimen dataset")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--recipes-per-user", type=float, default=5, help="Mean recipes authored per user (long-tailed)")
+    parser.add_argument("--public-recipes", type=int, default=50, help="Shared public recipes everyone plans from")
+    parser.add_argument("--plans-per-user", type=float, default=2, help="Mean meal plans per user (long-tailed)")
+    parser.add_argument("--weeks", type=int, default=12, help="Weeks of assignments per user, about 80%% filled")
+    parser.add_argument("--ingredients-per-recipe", type=float, default=6, help="Mean ingredients per recipe")
+    parser.add_argument("--ingredient-variants", type=int, default=0, help="Extra jittered copies of the seed catalog")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    args = parser.parse_args()
+    engine = default_engine
+
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        print("✅ Database tables recreated successfully")
+
+    print(f"🚀 Generating data for {args.users} users (seed={args.seed})...")
+    started = time.perf_counter()
+    counts = generate(
+        engine,
+        users=args.users,
+        recipes_per_user=args.recipes_per_user,
+        public_recipes=args.public_recipes,
+        plans_per_user=args.plans_per_user,
+        weeks=args.weeks,
+        ingredients_per_recipe=args.ingredients_per_recipe,
+        ingredient_variants=args.ingredient_variants,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for table, count in counts.items():
+        print(f"- {count} {table}")
+    print(f"\n🎉 Inserted {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Liveness and readiness
+`/healthz` only proves the process is serving requests. `/readyz` returns the
+latest snapshot from a background checker that every HEALTH_CHECK_SECONDS runs
+`SELECT 1` on the primary, reads connection pool counters, validates the Supabase
+API keys and pings Supabase Auth, so probes themselves never do any I/O.
+"""
+
+import os
+import json
+import time
+import base64
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from sqlalchemy import text
+
+import database
+
+logger = logging.getLogger("nutri_regimen.health")
+
+HEALTH_CHECK_SECONDS = float(os.getenv("HEALTH_CHECK_SECONDS", "5"))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", "2"))
+# Snapshots older than this many check intervals mean the checker itself is stuck
+STALE_AFTER_INTERVALS = 3
+
+STARTED_AT = time.time()
+
+
+def _pool_status(engine) -> dict:
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            status[name] = counter()
+    if "size" in status and "checkedout" in status:
+        # QueuePool allows `size` plus `_max_overflow` connections in total
+        capacity = status["size"] + max(getattr(pool, "_max_overflow", 0), 0)
+        status["capacity"] = capacity
+        status["saturated"] = status["checkedout"] >= capacity
+    return status
+
+
+def check_database() -> dict:
+    engine = database.engine  # looked up on every check; workers may rebuild the engine
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return {"status": "failing", "error": str(e).splitlines()[0], "pool": _pool_status(engine)}
+    pool = _pool_status(engine)
+    return {
+        "status": "degraded" if pool.get("saturated") else "ok",
+        "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+        "pool": pool,
+    }
+
+
+def check_replicas() -> dict:
+    router = database.replica_router
+    if router is None:
+        return {"status": "ok", "configured": 0}
+    replicas = {replica.name: {"healthy": replica.healthy, "error": replica.last_error} for replica in router.replicas}
+    healthy = sum(1 for replica in router.replicas if replica.healthy)
+    # Reads fall back to the primary, so unhealthy replicas only degrade
+    return {"status": "ok" if healthy == len(replicas) else "degraded", "configured": len(replicas), "replicas": replicas}
+
+
+def _jwt_claims(token: Optional[str]) -> Optional[dict]:
+    try:
+        payload = token.split(".")[1]
+        return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except Exception:
+        return None
+
+
+def check_auth() -> dict:
+    import auth  # deferred: importing auth creates the Supabase clients
+
+    keys = {}
+    problems = []
+    for name, key in (("anon", auth.SUPABASE_ANON_KEY), ("service_role", auth.SUPABASE_SERVICE_ROLE_KEY)):
+        claims = _jwt_claims(key)
+        if claims is None:
+            # Non-JWT (publishable/secret) keys cannot be inspected locally
+            keys[name] = {"format": "opaque"}
+            continue
+        expires = claims.get("exp")
+        keys[name] = {"role": claims.get("role"), "expires_at": datetime.utcfromtimestamp(expires).isoformat() if expires else None}
+        if expires and expires < time.time():
+            problems.append(f"{name} key expired")
+
+    try:
+        response = httpx.get(
+            f"{auth.SUPABASE_URL}/auth/v1/health",
+            headers={"apikey": auth.SUPABASE_ANON_KEY},
+            timeout=HEALTH_CHECK_TIMEOUT_SECONDS,
+        )
+        if response.status_code != 200:
+            problems.append(f"auth service returned {response.status_code}")
+    except httpx.HTTPError as e:
+        problems.append(f"auth service unreachable: {e}")
+
+    result = {"status": "failing" if problems else "ok", "keys": keys}
+    if problems:
+        result["errors"] = problems
+    return result
+
+
+CHECKS = {"database": check_database, "replicas": check_replicas, "auth": check_auth}
+# Failing checks that make the instance unready (others only degrade it)
+CRITICAL_CHECKS = {"database"}
+
+
+class HealthChecker:
+    """Background thread refreshing a readiness snapshot"""
+
+    def __init__(self, interval: float = HEALTH_CHECK_SECONDS):
+        self.interval = interval
+        self.snapshot: Optional[dict] = None
+        self._checked_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="health-check", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_checks(self):
+        results = {}
+        for name, check in CHECKS.items():
+            try:
+                results[name] = check()
+            except Exception as e:
+                logger.exception("Health check %s crashed", name)
+                results[name] = {"status": "failing", "error": str(e)}
+        self.snapshot = {"checked_at": datetime.utcnow().isoformat(), "checks": results}
+        self._checked_at = time.monotonic()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_checks()
+            self._stop.wait(self.interval)
+
+    def readiness(self) -> dict:
+        """Overall status plus the latest check results; never blocks on I/O"""
+        snapshot, checked_at = self.snapshot, self._checked_at
+        if snapshot is None:
+            return {"status": "starting", "ready": False, "checks": {}}
+
+        statuses = {name: result["status"] for name, result in snapshot["checks"].items()}
+        ready = all(statuses.get(name) != "failing" for name in CRITICAL_CHECKS)
+        status = "ok" if all(s == "ok" for s in statuses.values()) else ("failing" if not ready else "degraded")
+        age = time.monotonic() - checked_at
+        if age > STALE_AFTER_INTERVALS * self.interval and status == "ok":
+            status = "degraded"
+        return {
+            "status": status,
+            "ready": ready,
+            "checked_at": snapshot["checked_at"],
+            "age_seconds": round(age, 1),
+            "checks": snapshot["checks"],
+        }
+
+
+health_checker = HealthChecker()
+
+
+def liveness() -> dict:
+    return {"status": "ok", "pid": os.getpid(), "uptime_seconds": round(time.time() - STARTED_AT)}
@@ -14,11 +14,262 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from database import SessionLocal, engine
-from models import Base, User, Ingredient, Recipe, RecipeIngredient, MealPlan, MealPlanItem, WeeklyAssignment
+from models import Base, User, Ingredient, Recipe, RecipeIngredient, MealPlan, MealPlanItem, WeeklyAssignment, DailyNutrition, Tombstone, Job
+import nutrition
+from nutrient_matrix import nutrient_matrix
+from daily_nutrition import backfill_daily_nutrition
 
 # Load environment variables
 load_dotenv()
 
+# Seed catalog shared by init_db and generate_data
+INGREDIENTS_DATA = [
+    # Proteins
+    {"name": "Chicken Breast", "category": "Protein", "calories_per_100g": 165, "protein_per_100g": 31.0, "carbs_per_100g": 0.0, "fat_per_100g": 3.6, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 74.0},
+    {"name": "Salmon Fillet", "category": "Protein", "calories_per_100g": 208, "protein_per_100g": 25.4, "carbs_per_100g": 0.0, "fat_per_100g": 12.4, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 59.0},
+    {"name": "Ground Turkey", "category": "Protein", "calories_per_100g": 189, "protein_per_100g": 27.4, "carbs_per_100g": 0.0, "fat_per_100g": 8.3, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 98.0},
+    {"name": "Eggs", "category": "Protein", "calories_per_100g": 155, "protein_per_100g": 13.0, "carbs_per_100g": 1.1, "fat_per_100g": 11.0, "fiber_per_100g": 0.0, "sugar_per_100g": 1.1, "sodium_per_100g": 124.0},
+    {"name": "Greek Yogurt", "category": "Protein", "calories_per_100g": 97, "protein_per_100g": 10.0, "carbs_per_100g": 3.6, "fat_per_100g": 5.0, "fiber_per_100g": 0.0, "sugar_per_100g": 3.6, "sodium_per_100g": 36.0},
+    {"name": "Tofu", "category": "Protein", "calories_per_100g": 76, "protein_per_100g": 8.0, "carbs_per_100g": 1.9, "fat_per_100g": 4.8, "fiber_per_100g": 0.3, "sugar_per_100g": 0.6, "sodium_per_100g": 7.0},
+    {"name": "Black Beans", "category": "Protein", "calories_per_100g": 132, "protein_per_100g": 8.9, "carbs_per_100g": 23.0, "fat_per_100g": 0.5, "fiber_per_100g": 8.7, "sugar_per_100g": 0.3, "sodium_per_100g": 2.0},
+    {"name": "Lentils", "category": "Protein", "calories_per_100g": 116, "protein_per_100g": 9.0, "carbs_per_100g": 20.0, "fat_per_100g": 0.4, "fiber_per_100g": 7.9, "sugar_per_100g": 1.8, "sodium_per_100g": 2.0},
+    {"name": "Quinoa", "category": "Protein", "calories_per_100g": 120, "protein_per_100g": 4.4, "carbs_per_100g": 22.0, "fat_per_100g": 1.9, "fiber_per_100g": 2.8, "sugar_per_100g": 0.9, "sodium_per_100g": 5.0},
+    
+    # Vegetables
+    {"name": "Broccoli", "category": "Vegetable", "calories_per_100g": 34, "protein_per_100g": 2.8, "carbs_per_100g": 7.0, "fat_per_100g": 0.4, "fiber_per_100g": 2.6, "sugar_per_100g": 1.5, "sodium_per_100g": 33.0},
+    {"name": "Spinach", "category": "Vegetable", "calories_per_100g": 23, "protein_per_100g": 2.9, "carbs_per_100g": 3.6, "fat_per_100g": 0.4, "fiber_per_100g": 2.2, "sugar_per_100g": 0.4, "sodium_per_100g": 79.0},
+    {"name": "Bell Peppers", "category": "Vegetable", "calories_per_100g": 31, "protein_per_100g": 1.0, "carbs_per_100g": 7.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.5, "sugar_per_100g": 4.2, "sodium_per_100g": 4.0},
+    {"name": "Carrots", "category": "Vegetable", "calories_per_100g": 41, "protein_per_100g": 0.9, "carbs_per_100g": 10.0, "fat_per_100g": 0.2, "fiber_per_100g": 2.8, "sugar_per_100g": 4.7, "sodium_per_100g": 69.0},
+    {"name": "Sweet Potato", "category": "Vegetable", "calories_per_100g": 86, "protein_per_100g": 1.6, "carbs_per_100g": 20.0, "fat_per_100g": 0.1, "fiber_per_100g": 3.0, "sugar_per_100g": 4.2, "sodium_per_100g": 5.0},
+    {"name": "Zucchini", "category": "Vegetable", "calories_per_100g": 17, "protein_per_100g": 1.2, "carbs_per_100g": 3.1, "fat_per_100g": 0.3, "fiber_per_100g": 1.0, "sugar_per_100g": 2.5, "sodium_per_100g": 8.0},
+    {"name": "Kale", "category": "Vegetable", "calories_per_100g": 49, "protein_per_100g": 4.3, "carbs_per_100g": 9.0, "fat_per_100g": 0.9, "fiber_per_100g": 3.6, "sugar_per_100g": 2.3, "sodium_per_100g": 38.0},
+    {"name": "Cauliflower", "category": "Vegetable", "calories_per_100g": 25, "protein_per_100g": 1.9, "carbs_per_100g": 5.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.0, "sugar_per_100g": 1.9, "sodium_per_100g": 30.0},
+    {"name": "Asparagus", "category": "Vegetable", "calories_per_100g": 20, "protein_per_100g": 2.2, "carbs_per_100g": 3.9, "fat_per_100g": 0.1, "fiber_per_100g": 2.1, "sugar_per_100g": 1.9, "sodium_per_100g": 2.0},
+    {"name": "Brussels Sprouts", "category": "Vegetable", "calories_per_100g": 43, "protein_per_100g": 3.4, "carbs_per_100g": 9.0, "fat_per_100g": 0.3, "fiber_per_100g": 3.8, "sugar_per_100g": 2.2, "sodium_per_100g": 25.0},
+    
+    # Fruits
+    {"name": "Banana", "category": "Fruit", "calories_per_100g": 89, "protein_per_100g": 1.1, "carbs_per_100g": 23.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.6, "sugar_per_100g": 12.0, "sodium_per_100g": 1.0},
+    {"name": "Apple", "category": "Fruit", "calories_per_100g": 52, "protein_per_100g": 0.3, "carbs_per_100g": 14.0, "fat_per_100g": 0.2, "fiber_per_100g": 2.4, "sugar_per_100g": 10.0, "sodium_per_100g": 1.0},
+    {"name": "Blueberries", "category": "Fruit", "calories_per_100g": 57, "protein_per_100g": 0.7, "carbs_per_100g": 14.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.4, "sugar_per_100g": 10.0, "sodium_per_100g": 1.0},
+    {"name": "Strawberries", "category": "Fruit", "calories_per_100g": 32, "protein_per_100g": 0.7, "carbs_per_100g": 8.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.0, "sugar_per_100g": 4.9, "sodium_per_100g": 1.0},
+    {"name": "Orange", "category": "Fruit", "calories_per_100g": 47, "protein_per_100g": 0.9, "carbs_per_100g": 12.0, "fat_per_100g": 0.1, "fiber_per_100g": 2.4, "sugar_per_100g": 9.4, "sodium_per_100g": 0.0},
+    {"name": "Avocado", "category": "Fruit", "calories_per_100g": 160, "protein_per_100g": 2.0, "carbs_per_100g": 9.0, "fat_per_100g": 15.0, "fiber_per_100g": 7.0, "sugar_per_100g": 0.7, "sodium_per_100g": 7.0},
+    
+    # Grains & Carbs
+    {"name": "Brown Rice", "category": "Grain", "calories_per_100g": 111, "protein_per_100g": 2.6, "carbs_per_100g": 23.0, "fat_per_100g": 0.9, "fiber_per_100g": 1.8, "sugar_per_100g": 0.4, "sodium_per_100g": 5.0},
+    {"name": "Oats", "category": "Grain", "calories_per_100g": 389, "protein_per_100g": 16.9, "carbs_per_100g": 66.0, "fat_per_100g": 6.9, "fiber_per_100g": 10.6, "sugar_per_100g": 0.0, "sodium_per_100g": 2.0},
+    {"name": "Whole Wheat Bread", "category": "Grain", "calories_per_100g": 247, "protein_per_100g": 13.0, "carbs_per_100g": 41.0, "fat_per_100g": 4.2, "fiber_per_100g": 7.0, "sugar_per_100g": 6.0, "sodium_per_100g": 540.0},
+    {"name": "Pasta", "category": "Grain", "calories_per_100g": 131, "protein_per_100g": 5.0, "carbs_per_100g": 25.0, "fat_per_100g": 1.1, "fiber_per_100g": 1.8, "sugar_per_100g": 0.6, "sodium_per_100g": 1.0},
+    
+    # Dairy & Alternatives
+    {"name": "Milk", "category": "Dairy", "calories_per_100g": 42, "protein_per_100g": 3.4, "carbs_per_100g": 5.0, "fat_per_100g": 1.0, "fiber_per_100g": 0.0, "sugar_per_100g": 5.0, "sodium_per_100g": 44.0},
+    {"name": "Cheddar Cheese", "category": "Dairy", "calories_per_100g": 403, "protein_per_100g": 25.0, "carbs_per_100g": 1.3, "fat_per_100g": 33.0, "fiber_per_100g": 0.0, "sugar_per_100g": 0.5, "sodium_per_100g": 621.0},
+    {"name": "Almond Milk", "category": "Dairy Alternative", "calories_per_100g": 17, "protein_per_100g": 0.6, "carbs_per_100g": 1.5, "fat_per_100g": 1.1, "fiber_per_100g": 0.3, "sugar_per_100g": 0.0, "sodium_per_100g": 63.0},
+    
+    # Nuts & Seeds
+    {"name": "Almonds", "category": "Nuts", "calories_per_100g": 579, "protein_per_100g": 21.0, "carbs_per_100g": 22.0, "fat_per_100g": 50.0, "fiber_per_100g": 12.0, "sugar_per_100g": 4.4, "sodium_per_100g": 1.0},
+    {"name": "Walnuts", "category": "Nuts", "calories_per_100g": 654, "protein_per_100g": 15.0, "carbs_per_100g": 14.0, "fat_per_100g": 65.0, "fiber_per_100g": 6.7, "sugar_per_100g": 2.6, "sodium_per_100g": 2.0},
+    {"name": "Chia Seeds", "category": "Seeds", "calories_per_100g": 486, "protein_per_100g": 17.0, "carbs_per_100g": 42.0, "fat_per_100g": 31.0, "fiber_per_100g": 34.0, "sugar_per_100g": 0.0, "sodium_per_100g": 16.0},
+    
+    # Oils & Fats
+    {"name": "Olive Oil", "category": "Oil", "calories_per_100g": 884, "protein_per_100g": 0.0, "carbs_per_100g": 0.0, "fat_per_100g": 100.0, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 2.0},
+    {"name": "Coconut Oil", "category": "Oil", "calories_per_100g": 862, "protein_per_100g": 0.0, "carbs_per_100g": 0.0, "fat_per_100g": 100.0, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 0.0},
+    
+    # Herbs & Spices
+    {"name": "Garlic", "category": "Herb", "calories_per_100g": 149, "protein_per_100g": 6.4, "carbs_per_100g": 33.0, "fat_per_100g": 0.5, "fiber_per_100g": 2.1, "sugar_per_100g": 1.0, "sodium_per_100g": 17.0},
+    {"name": "Ginger", "category": "Spice", "calories_per_100g": 80, "protein_per_100g": 1.8, "carbs_per_100g": 18.0, "fat_per_100g": 0.8, "fiber_per_100g": 2.0, "sugar_per_100g": 1.7, "sodium_per_100g": 13.0},
+    {"name": "Basil", "category": "Herb", "calories_per_100g": 22, "protein_per_100g": 3.2, "carbs_per_100g": 2.6, "fat_per_100g": 0.6, "fiber_per_100g": 1.6, "sugar_per_100g": 0.3, "sodium_per_100g": 4.0},
+    {"name": "Oregano", "category": "Herb", "calories_per_100g": 265, "protein_per_100g": 9.0, "carbs_per_100g": 69.0, "fat_per_100g": 4.3, "fiber_per_100g": 42.5, "sugar_per_100g": 4.1, "sodium_per_100g": 25.0},
+]
+
+# Seed recipes; "owner" is an index into the sample users, omitted for public recipes
+RECIPES_DATA = [
+    {
+        "name": "Grilled Chicken with Quinoa Bowl",
+        "description": "A healthy, protein-packed bowl with grilled chicken breast, fluffy quinoa, and roasted vegetables",
+        "instructions": """1. Season chicken breast with salt, pepper, and herbs
+2. Grill chicken for 6-7 minutes per side until cooked through
+3. Cook quinoa according to package directions
+4. Roast broccoli and bell peppers at 400°F for 20 minutes
+5. Slice chicken and serve over quinoa with vegetables
+6. Drizzle with olive oil and lemon juice""",
+        "is_public": "true",
+        "ingredients": [
+            ("Chicken Breast", 150, "g"),
+            ("Quinoa", 80, "g"),
+            ("Broccoli", 100, "g"),
+            ("Bell Peppers", 80, "g"),
+            ("Olive Oil", 10, "ml"),
+        ]
+    },
+    {
+        "name": "Salmon and Sweet Potato Power Bowl",
+        "description": "Omega-3 rich salmon with roasted sweet potato and leafy greens",
+        "instructions": """1. Preheat oven to 425°F
+2. Cut sweet potato into cubes and roast for 25 minutes
+3. Season salmon with herbs and bake for 12-15 minutes
+4. Massage kale with olive oil and lemon
+5. Combine all ingredients in a bowl
+6. Top with avocado slices""",
+        "owner": 1,
+        "ingredients": [
+            ("Salmon Fillet", 120, "g"),
+            ("Sweet Potato", 150, "g"),
+            ("Kale", 60, "g"),
+            ("Avocado", 50, "g"),
+            ("Olive Oil", 8, "ml"),
+        ]
+    },
+    {
+        "name": "Mediterranean Chickpea Salad",
+        "description": "Fresh and vibrant salad with chickpeas, vegetables, and Mediterranean flavors",
+        "instructions": """1. Drain and rinse chickpeas
+2. Dice cucumber, tomatoes, and bell peppers
+3. Crumble feta cheese
+4. Mix olive oil, lemon juice, oregano for dressing
+5. Combine all ingredients and toss with dressing
+6. Let marinate for 30 minutes before serving""",
+        "owner": 0,
+        "ingredients": [
+            ("Black Beans", 100, "g"),  # Using black beans as chickpea substitute
+            ("Bell Peppers", 80, "g"),
+            ("Olive Oil", 15, "ml"),
+            ("Oregano", 2, "g"),
+        ]
+    },
+    {
+        "name": "Turkey and Vegetable Stir-Fry",
+        "description": "Quick and healthy stir-fry with lean ground turkey and colorful vegetables",
+        "instructions": """1. Heat oil in a large pan or wok
+2. Cook ground turkey until browned
+3. Add garlic and ginger, cook for 1 minute
+4. Add vegetables and stir-fry for 5-7 minutes
+5. Season with soy sauce and herbs
+6. Serve over brown rice""",
+        "owner": 2,
+        "ingredients": [
+            ("Ground Turkey", 120, "g"),
+            ("Broccoli", 80, "g"),
+            ("Carrots", 60, "g"),
+            ("Garlic", 5, "g"),
+            ("Ginger", 3, "g"),
+            ("Brown Rice", 80, "g"),
+            ("Olive Oil", 10, "ml"),
+        ]
+    },
+    {
+        "name": "Greek Yogurt Berry Parfait",
+        "description": "Protein-rich breakfast parfait with Greek yogurt, berries, and nuts",
+        "instructions": """1. Layer Greek yogurt in a glass or bowl
+2. Add a layer of mixed berries
+3. Sprinkle with chopped almonds
+4. Repeat layers
+5. Top with a drizzle of honey if desired
+6. Serve immediately""",
+        "owner": 3,
+        "ingredients": [
+            ("Greek Yogurt", 150, "g"),
+            ("Blueberries", 50, "g"),
+            ("Strawberries", 50, "g"),
+            ("Almonds", 20, "g"),
+        ]
+    },
+    {
+        "name": "Vegetarian Lentil Curry",
+        "description": "Hearty and flavorful lentil curry packed with vegetables and spices",
+        "instructions": """1. Sauté onions, garlic, and ginger in oil
+2. Add curry spices and cook for 1 minute
+3. Add lentils, vegetables, and coconut milk
+4. Simmer for 20-25 minutes until lentils are tender
+5. Season with salt and pepper
+6. Serve with brown rice""",
+        "owner": 1,
+        "ingredients": [
+            ("Lentils", 100, "g"),
+            ("Spinach", 80, "g"),
+            ("Carrots", 60, "g"),
+            ("Garlic", 8, "g"),
+            ("Ginger", 5, "g"),
+            ("Coconut Oil", 10, "ml"),
+        ]
+    },
+    {
+        "name": "Tofu Buddha Bowl",
+        "description": "Nutritious plant-based bowl with marinated tofu and fresh vegetables",
+        "instructions": """1. Press tofu and cut into cubes
+2. Marinate tofu in soy sauce and spices
+3. Pan-fry tofu until golden
+4. Prepare quinoa and roast vegetables
+5. Arrange all components in a bowl
+6. Drizzle with tahini dressing""",
+        "owner": 2,
+        "ingredients": [
+            ("Tofu", 120, "g"),
+            ("Quinoa", 70, "g"),
+            ("Kale", 60, "g"),
+            ("Carrots", 50, "g"),
+            ("Avocado", 60, "g"),
+            ("Olive Oil", 12, "ml"),
+        ]
+    },
+    {
+        "name": "Overnight Oats with Berries",
+        "description": "Make-ahead breakfast with oats, milk, and fresh berries",
+        "instructions": """1. Mix oats with milk in a jar
+2. Add chia seeds and vanilla
+3. Refrigerate overnight
+4. In the morning, top with berries
+5. Add nuts for extra crunch
+6. Enjoy cold or warm""",
+        "owner": 3,
+        "ingredients": [
+            ("Oats", 50, "g"),
+            ("Almond Milk", 150, "ml"),
+            ("Chia Seeds", 10, "g"),
+            ("Blueberries", 40, "g"),
+            ("Strawberries", 40, "g"),
+            ("Walnuts", 15, "g"),
+        ]
+    },
+    {
+        "name": "Egg and Vegetable Scramble",
+        "description": "Protein-rich breakfast scramble with eggs and colorful vegetables",
+        "instructions": """1. Heat oil in a non-stick pan
+2. Sauté vegetables until tender
+3. Beat eggs and pour into pan
+4. Scramble eggs with vegetables
+5. Season with herbs and spices
+6. Serve with whole grain toast""",
+        "owner": 0,
+        "ingredients": [
+            ("Eggs", 120, "g"),  # About 2 large eggs
+            ("Spinach", 50, "g"),
+            ("Bell Peppers", 60, "g"),
+            ("Olive Oil", 8, "ml"),
+            ("Whole Wheat Bread", 30, "g"),
+        ]
+    },
+    {
+        "name": "Asian-Style Lettuce Wraps",
+        "description": "Light and flavorful lettuce wraps with seasoned protein and vegetables",
+        "instructions": """1. Cook ground turkey with garlic and ginger
+2. Add vegetables and stir-fry briefly
+3. Season with Asian-inspired spices
+4. Wash and separate lettuce leaves
+5. Fill lettuce cups with mixture
+6. Garnish with herbs and serve""",
+        "owner": 1,
+        "ingredients": [
+            ("Ground Turkey", 100, "g"),
+            ("Garlic", 6, "g"),
+            ("Ginger", 4, "g"),
+            ("Carrots", 40, "g"),
+            ("Bell Peppers", 50, "g"),
+            ("Olive Oil", 8, "ml"),
+        ]
+    }
+]
+
 def create_tables():
     """Create all database tables"""
     # Drop all tables first to ensure schema updates are applied
@@ -37,71 +288,12 @@ def create_tables():
 def init_ingredients(db: Session):
     """Initialize ingredients with comprehensive nutritional data"""
     
-    ingredients_data = [
-        # Proteins
-        {"name": "Chicken Breast", "category": "Protein", "calories_per_100g": 165, "protein_per_100g": 31.0, "carbs_per_100g": 0.0, "fat_per_100g": 3.6, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 74.0},
-        {"name": "Salmon Fillet", "category": "Protein", "calories_per_100g": 208, "protein_per_100g": 25.4, "carbs_per_100g": 0.0, "fat_per_100g": 12.4, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 59.0},
-        {"name": "Ground Turkey", "category": "Protein", "calories_per_100g": 189, "protein_per_100g": 27.4, "carbs_per_100g": 0.0, "fat_per_100g": 8.3, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 98.0},
-        {"name": "Eggs", "category": "Protein", "calories_per_100g": 155, "protein_per_100g": 13.0, "carbs_per_100g": 1.1, "fat_per_100g": 11.0, "fiber_per_100g": 0.0, "sugar_per_100g": 1.1, "sodium_per_100g": 124.0},
-        {"name": "Greek Yogurt", "category": "Protein", "calories_per_100g": 97, "protein_per_100g": 10.0, "carbs_per_100g": 3.6, "fat_per_100g": 5.0, "fiber_per_100g": 0.0, "sugar_per_100g": 3.6, "sodium_per_100g": 36.0},
-        {"name": "Tofu", "category": "Protein", "calories_per_100g": 76, "protein_per_100g": 8.0, "carbs_per_100g": 1.9, "fat_per_100g": 4.8, "fiber_per_100g": 0.3, "sugar_per_100g": 0.6, "sodium_per_100g": 7.0},
-        {"name": "Black Beans", "category": "Protein", "calories_per_100g": 132, "protein_per_100g": 8.9, "carbs_per_100g": 23.0, "fat_per_100g": 0.5, "fiber_per_100g": 8.7, "sugar_per_100g": 0.3, "sodium_per_100g": 2.0},
-        {"name": "Lentils", "category": "Protein", "calories_per_100g": 116, "protein_per_100g": 9.0, "carbs_per_100g": 20.0, "fat_per_100g": 0.4, "fiber_per_100g": 7.9, "sugar_per_100g": 1.8, "sodium_per_100g": 2.0},
-        {"name": "Quinoa", "category": "Protein", "calories_per_100g": 120, "protein_per_100g": 4.4, "carbs_per_100g": 22.0, "fat_per_100g": 1.9, "fiber_per_100g": 2.8, "sugar_per_100g": 0.9, "sodium_per_100g": 5.0},
-        
-        # Vegetables
-        {"name": "Broccoli", "category": "Vegetable", "calories_per_100g": 34, "protein_per_100g": 2.8, "carbs_per_100g": 7.0, "fat_per_100g": 0.4, "fiber_per_100g": 2.6, "sugar_per_100g": 1.5, "sodium_per_100g": 33.0},
-        {"name": "Spinach", "category": "Vegetable", "calories_per_100g": 23, "protein_per_100g": 2.9, "carbs_per_100g": 3.6, "fat_per_100g": 0.4, "fiber_per_100g": 2.2, "sugar_per_100g": 0.4, "sodium_per_100g": 79.0},
-        {"name": "Bell Peppers", "category": "Vegetable", "calories_per_100g": 31, "protein_per_100g": 1.0, "carbs_per_100g": 7.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.5, "sugar_per_100g": 4.2, "sodium_per_100g": 4.0},
-        {"name": "Carrots", "category": "Vegetable", "calories_per_100g": 41, "protein_per_100g": 0.9, "carbs_per_100g": 10.0, "fat_per_100g": 0.2, "fiber_per_100g": 2.8, "sugar_per_100g": 4.7, "sodium_per_100g": 69.0},
-        {"name": "Sweet Potato", "category": "Vegetable", "calories_per_100g": 86, "protein_per_100g": 1.6, "carbs_per_100g": 20.0, "fat_per_100g": 0.1, "fiber_per_100g": 3.0, "sugar_per_100g": 4.2, "sodium_per_100g": 5.0},
-        {"name": "Zucchini", "category": "Vegetable", "calories_per_100g": 17, "protein_per_100g": 1.2, "carbs_per_100g": 3.1, "fat_per_100g": 0.3, "fiber_per_100g": 1.0, "sugar_per_100g": 2.5, "sodium_per_100g": 8.0},
-        {"name": "Kale", "category": "Vegetable", "calories_per_100g": 49, "protein_per_100g": 4.3, "carbs_per_100g": 9.0, "fat_per_100g": 0.9, "fiber_per_100g": 3.6, "sugar_per_100g": 2.3, "sodium_per_100g": 38.0},
-        {"name": "Cauliflower", "category": "Vegetable", "calories_per_100g": 25, "protein_per_100g": 1.9, "carbs_per_100g": 5.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.0, "sugar_per_100g": 1.9, "sodium_per_100g": 30.0},
-        {"name": "Asparagus", "category": "Vegetable", "calories_per_100g": 20, "protein_per_100g": 2.2, "carbs_per_100g": 3.9, "fat_per_100g": 0.1, "fiber_per_100g": 2.1, "sugar_per_100g": 1.9, "sodium_per_100g": 2.0},
-        {"name": "Brussels Sprouts", "category": "Vegetable", "calories_per_100g": 43, "protein_per_100g": 3.4, "carbs_per_100g": 9.0, "fat_per_100g": 0.3, "fiber_per_100g": 3.8, "sugar_per_100g": 2.2, "sodium_per_100g": 25.0},
-        
-        # Fruits
-        {"name": "Banana", "category": "Fruit", "calories_per_100g": 89, "protein_per_100g": 1.1, "carbs_per_100g": 23.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.6, "sugar_per_100g": 12.0, "sodium_per_100g": 1.0},
-        {"name": "Apple", "category": "Fruit", "calories_per_100g": 52, "protein_per_100g": 0.3, "carbs_per_100g": 14.0, "fat_per_100g": 0.2, "fiber_per_100g": 2.4, "sugar_per_100g": 10.0, "sodium_per_100g": 1.0},
-        {"name": "Blueberries", "category": "Fruit", "calories_per_100g": 57, "protein_per_100g": 0.7, "carbs_per_100g": 14.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.4, "sugar_per_100g": 10.0, "sodium_per_100g": 1.0},
-        {"name": "Strawberries", "category": "Fruit", "calories_per_100g": 32, "protein_per_100g": 0.7, "carbs_per_100g": 8.0, "fat_per_100g": 0.3, "fiber_per_100g": 2.0, "sugar_per_100g": 4.9, "sodium_per_100g": 1.0},
-        {"name": "Orange", "category": "Fruit", "calories_per_100g": 47, "protein_per_100g": 0.9, "carbs_per_100g": 12.0, "fat_per_100g": 0.1, "fiber_per_100g": 2.4, "sugar_per_100g": 9.4, "sodium_per_100g": 0.0},
-        {"name": "Avocado", "category": "Fruit", "calories_per_100g": 160, "protein_per_100g": 2.0, "carbs_per_100g": 9.0, "fat_per_100g": 15.0, "fiber_per_100g": 7.0, "sugar_per_100g": 0.7, "sodium_per_100g": 7.0},
-        
-        # Grains & Carbs
-        {"name": "Brown Rice", "category": "Grain", "calories_per_100g": 111, "protein_per_100g": 2.6, "carbs_per_100g": 23.0, "fat_per_100g": 0.9, "fiber_per_100g": 1.8, "sugar_per_100g": 0.4, "sodium_per_100g": 5.0},
-        {"name": "Oats", "category": "Grain", "calories_per_100g": 389, "protein_per_100g": 16.9, "carbs_per_100g": 66.0, "fat_per_100g": 6.9, "fiber_per_100g": 10.6, "sugar_per_100g": 0.0, "sodium_per_100g": 2.0},
-        {"name": "Whole Wheat Bread", "category": "Grain", "calories_per_100g": 247, "protein_per_100g": 13.0, "carbs_per_100g": 41.0, "fat_per_100g": 4.2, "fiber_per_100g": 7.0, "sugar_per_100g": 6.0, "sodium_per_100g": 540.0},
-        {"name": "Pasta", "category": "Grain", "calories_per_100g": 131, "protein_per_100g": 5.0, "carbs_per_100g": 25.0, "fat_per_100g": 1.1, "fiber_per_100g": 1.8, "sugar_per_100g": 0.6, "sodium_per_100g": 1.0},
-        
-        # Dairy & Alternatives
-        {"name": "Milk", "category": "Dairy", "calories_per_100g": 42, "protein_per_100g": 3.4, "carbs_per_100g": 5.0, "fat_per_100g": 1.0, "fiber_per_100g": 0.0, "sugar_per_100g": 5.0, "sodium_per_100g": 44.0},
-        {"name": "Cheddar Cheese", "category": "Dairy", "calories_per_100g": 403, "protein_per_100g": 25.0, "carbs_per_100g": 1.3, "fat_per_100g": 33.0, "fiber_per_100g": 0.0, "sugar_per_100g": 0.5, "sodium_per_100g": 621.0},
-        {"name": "Almond Milk", "category": "Dairy Alternative", "calories_per_100g": 17, "protein_per_100g": 0.6, "carbs_per_100g": 1.5, "fat_per_100g": 1.1, "fiber_per_100g": 0.3, "sugar_per_100g": 0.0, "sodium_per_100g": 63.0},
-        
-        # Nuts & Seeds
-        {"name": "Almonds", "category": "Nuts", "calories_per_100g": 579, "protein_per_100g": 21.0, "carbs_per_100g": 22.0, "fat_per_100g": 50.0, "fiber_per_100g": 12.0, "sugar_per_100g": 4.4, "sodium_per_100g": 1.0},
-        {"name": "Walnuts", "category": "Nuts", "calories_per_100g": 654, "protein_per_100g": 15.0, "carbs_per_100g": 14.0, "fat_per_100g": 65.0, "fiber_per_100g": 6.7, "sugar_per_100g": 2.6, "sodium_per_100g": 2.0},
-        {"name": "Chia Seeds", "category": "Seeds", "calories_per_100g": 486, "protein_per_100g": 17.0, "carbs_per_100g": 42.0, "fat_per_100g": 31.0, "fiber_per_100g": 34.0, "sugar_per_100g": 0.0, "sodium_per_100g": 16.0},
-        
-        # Oils & Fats
-        {"name": "Olive Oil", "category": "Oil", "calories_per_100g": 884, "protein_per_100g": 0.0, "carbs_per_100g": 0.0, "fat_per_100g": 100.0, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 2.0},
-        {"name": "Coconut Oil", "category": "Oil", "calories_per_100g": 862, "protein_per_100g": 0.0, "carbs_per_100g": 0.0, "fat_per_100g": 100.0, "fiber_per_100g": 0.0, "sugar_per_100g": 0.0, "sodium_per_100g": 0.0},
-        
-        # Herbs & Spices
-        {"name": "Garlic", "category": "Herb", "calories_per_100g": 149, "protein_per_100g": 6.4, "carbs_per_100g": 33.0, "fat_per_100g": 0.5, "fiber_per_100g": 2.1, "sugar_per_100g": 1.0, "sodium_per_100g": 17.0},
-        {"name": "Ginger", "category": "Spice", "calories_per_100g": 80, "protein_per_100g": 1.8, "carbs_per_100g": 18.0, "fat_per_100g": 0.8, "fiber_per_100g": 2.0, "sugar_per_100g": 1.7, "sodium_per_100g": 13.0},
-        {"name": "Basil", "category": "Herb", "calories_per_100g": 22, "protein_per_100g": 3.2, "carbs_per_100g": 2.6, "fat_per_100g": 0.6, "fiber_per_100g": 1.6, "sugar_per_100g": 0.3, "sodium_per_100g": 4.0},
-        {"name": "Oregano", "category": "Herb", "calories_per_100g": 265, "protein_per_100g": 9.0, "carbs_per_100g": 69.0, "fat_per_100g": 4.3, "fiber_per_100g": 42.5, "sugar_per_100g": 4.1, "sodium_per_100g": 25.0},
-    ]
-    
-    for ingredient_data in ingredients_data:
+    for ingredient_data in INGREDIENTS_DATA:
         ingredient = Ingredient(**ingredient_data)
         db.add(ingredient)
     
     db.commit()
-    print(f"✅ Added {len(ingredients_data)} ingredients to the database")
+    print(f"✅ Added {len(INGREDIENTS_DATA)} ingredients to the database")
 
 def init_users(db: Session):
     """Initialize sample users"""
@@ -150,200 +342,13 @@ def init_public_recipes(db: Session):
     users = db.query(User).all()
     ingredients = {ing.name: ing for ing in db.query(Ingredient).all()}
     
-    recipes_data = [
-        {
-            "name": "Grilled Chicken with Quinoa Bowl",
-            "description": "A healthy, protein-packed bowl with grilled chicken breast, fluffy quinoa, and roasted vegetables",
-            "instructions": """1. Season chicken breast with salt, pepper, and herbs
-2. Grill chicken for 6-7 minutes per side until cooked through
-3. Cook quinoa according to package directions
-4. Roast broccoli and bell peppers at 400°F for 20 minutes
-5. Slice chicken and serve over quinoa with vegetables
-6. Drizzle with olive oil and lemon juice""",
-            "is_public": "true",
-            "ingredients": [
-                ("Chicken Breast", 150, "g"),
-                ("Quinoa", 80, "g"),
-                ("Broccoli", 100, "g"),
-                ("Bell Peppers", 80, "g"),
-                ("Olive Oil", 10, "ml"),
-            ]
-        },
-        {
-            "name": "Salmon and Sweet Potato Power Bowl",
-            "description": "Omega-3 rich salmon with roasted sweet potato and leafy greens",
-            "instructions": """1. Preheat oven to 425°F
-2. Cut sweet potato into cubes and roast for 25 minutes
-3. Season salmon with herbs and bake for 12-15 minutes
-4. Massage kale with olive oil and lemon
-5. Combine all ingredients in a bowl
-6. Top with avocado slices""",
-            "user_id": users[1].id,
-            "ingredients": [
-                ("Salmon Fillet", 120, "g"),
-                ("Sweet Potato", 150, "g"),
-                ("Kale", 60, "g"),
-                ("Avocado", 50, "g"),
-                ("Olive Oil", 8, "ml"),
-            ]
-        },
-        {
-            "name": "Mediterranean Chickpea Salad",
-            "description": "Fresh and vibrant salad with chickpeas, vegetables, and Mediterranean flavors",
-            "instructions": """1. Drain and rinse chickpeas
-2. Dice cucumber, tomatoes, and bell peppers
-3. Crumble feta cheese
-4. Mix olive oil, lemon juice, oregano for dressing
-5. Combine all ingredients and toss with dressing
-6. Let marinate for 30 minutes before serving""",
-            "user_id": users[0].id,
-            "ingredients": [
-                ("Black Beans", 100, "g"),  # Using black beans as chickpea substitute
-                ("Bell Peppers", 80, "g"),
-                ("Olive Oil", 15, "ml"),
-                ("Oregano", 2, "g"),
-            ]
-        },
-        {
-            "name": "Turkey and Vegetable Stir-Fry",
-            "description": "Quick and healthy stir-fry with lean ground turkey and colorful vegetables",
-            "instructions": """1. Heat oil in a large pan or wok
-2. Cook ground turkey until browned
-3. Add garlic and ginger, cook for 1 minute
-4. Add vegetables and stir-fry for 5-7 minutes
-5. Season with soy sauce and herbs
-6. Serve over brown rice""",
-            "user_id": users[2].id,
-            "ingredients": [
-                ("Ground Turkey", 120, "g"),
-                ("Broccoli", 80, "g"),
-                ("Carrots", 60, "g"),
-                ("Garlic", 5, "g"),
-                ("Ginger", 3, "g"),
-                ("Brown Rice", 80, "g"),
-                ("Olive Oil", 10, "ml"),
-            ]
-        },
-        {
-            "name": "Greek Yogurt Berry Parfait",
-            "description": "Protein-rich breakfast parfait with Greek yogurt, berries, and nuts",
-            "instructions": """1. Layer Greek yogurt in a glass or bowl
-2. Add a layer of mixed berries
-3. Sprinkle with chopped almonds
-4. Repeat layers
-5. Top with a drizzle of honey if desired
-6. Serve immediately""",
-            "user_id": users[3].id,
-            "ingredients": [
-                ("Greek Yogurt", 150, "g"),
-                ("Blueberries", 50, "g"),
-                ("Strawberries", 50, "g"),
-                ("Almonds", 20, "g"),
-            ]
-        },
-        {
-            "name": "Vegetarian Lentil Curry",
-            "description": "Hearty and flavorful lentil curry packed with vegetables and spices",
-            "instructions": """1. Sauté onions, garlic, and ginger in oil
-2. Add curry spices and cook for 1 minute
-3. Add lentils, vegetables, and coconut milk
-4. Simmer for 20-25 minutes until lentils are tender
-5. Season with salt and pepper
-6. Serve with brown rice""",
-            "user_id": users[1].id,
-            "ingredients": [
-                ("Lentils", 100, "g"),
-                ("Spinach", 80, "g"),
-                ("Carrots", 60, "g"),
-                ("Garlic", 8, "g"),
-                ("Ginger", 5, "g"),
-                ("Coconut Oil", 10, "ml"),
-            ]
-        },
-        {
-            "name": "Tofu Buddha Bowl",
-            "description": "Nutritious plant-based bowl with marinated tofu and fresh vegetables",
-            "instructions": """1. Press tofu and cut into cubes
-2. Marinate tofu in soy sauce and spices
-3. Pan-fry tofu until golden
-4. Prepare quinoa and roast vegetables
-5. Arrange all components in a bowl
-6. Drizzle with tahini dressing""",
-            "user_id": users[2].id,
-            "ingredients": [
-                ("Tofu", 120, "g"),
-                ("Quinoa", 70, "g"),
-                ("Kale", 60, "g"),
-                ("Carrots", 50, "g"),
-                ("Avocado", 60, "g"),
-                ("Olive Oil", 12, "ml"),
-            ]
-        },
-        {
-            "name": "Overnight Oats with Berries",
-            "description": "Make-ahead breakfast with oats, milk, and fresh berries",
-            "instructions": """1. Mix oats with milk in a jar
-2. Add chia seeds and vanilla
-3. Refrigerate overnight
-4. In the morning, top with berries
-5. Add nuts for extra crunch
-6. Enjoy cold or warm""",
-            "user_id": users[3].id,
-            "ingredients": [
-                ("Oats", 50, "g"),
-                ("Almond Milk", 150, "ml"),
-                ("Chia Seeds", 10, "g"),
-                ("Blueberries", 40, "g"),
-                ("Strawberries", 40, "g"),
-                ("Walnuts", 15, "g"),
-            ]
-        },
-        {
-            "name": "Egg and Vegetable Scramble",
-            "description": "Protein-rich breakfast scramble with eggs and colorful vegetables",
-            "instructions": """1. Heat oil in a non-stick pan
-2. Sauté vegetables until tender
-3. Beat eggs and pour into pan
-4. Scramble eggs with vegetables
-5. Season with herbs and spices
-6. Serve with whole grain toast""",
-            "user_id": users[0].id,
-            "ingredients": [
-                ("Eggs", 120, "g"),  # About 2 large eggs
-                ("Spinach", 50, "g"),
-                ("Bell Peppers", 60, "g"),
-                ("Olive Oil", 8, "ml"),
-                ("Whole Wheat Bread", 30, "g"),
-            ]
-        },
-        {
-            "name": "Asian-Style Lettuce Wraps",
-            "description": "Light and flavorful lettuce wraps with seasoned protein and vegetables",
-            "instructions": """1. Cook ground turkey with garlic and ginger
-2. Add vegetables and stir-fry briefly
-3. Season with Asian-inspired spices
-4. Wash and separate lettuce leaves
-5. Fill lettuce cups with mixture
-6. Garnish with herbs and serve""",
-            "user_id": users[1].id,
-            "ingredients": [
-                ("Ground Turkey", 100, "g"),
-                ("Garlic", 6, "g"),
-                ("Ginger", 4, "g"),
-                ("Carrots", 40, "g"),
-                ("Bell Peppers", 50, "g"),
-                ("Olive Oil", 8, "ml"),
-            ]
-        }
-    ]
-    
-    for recipe_data in recipes_data:
+    for recipe_data in RECIPES_DATA:
         # Create recipe (public recipes available to all users)
         recipe = Recipe(
             name=recipe_data["name"],
             description=recipe_data["description"],
             instructions=recipe_data["instructions"],
-            user_id=recipe_data.get("user_id"),  # Can be None for public recipes
+            user_id=users[recipe_data["owner"]].id if "owner" in recipe_data else None,  # None for public recipes
             is_public=recipe_data.get("is_public", "true")  # Default to public
         )
         db.add(recipe)
@@ -359,9 +364,17 @@ def init_public_recipes(db: Session):
                     unit=unit
                 )
                 db.add(recipe_ingredient)
+
+        # Precomputed nutrition columns, as crud.create_recipe writes them
+        lines = [
+            (ingredients[ingredient_name].id, quantity)
+            for ingredient_name, quantity, _ in recipe_data["ingredients"] if ingredient_name in ingredients
+        ]
+        for column, value in nutrition.recipe_nutrition_values(nutrient_matrix.current(db), lines).items():
+            setattr(recipe, column, value)
     
     db.commit()
-    print(f"✅ Added {len(recipes_data)} recipes with ingredients to the database")
+    print(f"✅ Added {len(RECIPES_DATA)} recipes with ingredients to the database")
 
 def init_meal_plans(db: Session):
     """Initialize sample meal plans"""
@@ -467,6 +480,10 @@ def init_meal_plans(db: Session):
                     meal_type=meal_data["meal_type"]
                 )
                 db.add(meal_plan_item)
+        db.flush()
+
+        # Stored totals, as crud.create_meal_plan writes them
+        meal_plan.nutrition = nutrition.meal_plan_nutrition(db, meal_plan.id)
     
     db.commit()
     print(f"✅ Added {len(meal_plans_data)} meal plans with items to the database")
@@ -502,10 +519,17 @@ def init_weekly_assignments(db: Session):
     db.commit()
     print(f"✅ Added {len(weekly_assignments_data)} weekly assignments to the database")
 
+    # Fill the intake history for the assigned weeks, as the API does on every assignment save
+    backfill_daily_nutrition(db, {})
+    print(f"✅ Added {db.query(DailyNutrition).count()} daily nutrition rows to the database")
+
 def clear_database(db: Session):
     """Clear all data from the database (for development/testing)"""
     
     # Delete in reverse order of dependencies
+    db.query(Job).delete()
+    db.query(Tombstone).delete()
+    db.query(DailyNutrition).delete()  # References users
     db.query(WeeklyAssignment).delete()
     db.query(MealPlanItem).delete()
     db.query(MealPlan).delete()
@@ -548,6 +572,7 @@ def main():
         print(f"- {db.query(MealPlan).count()} meal plans")
         print(f"- {db.query(MealPlanItem).count()} meal plan items")
         print(f"- {db.query(WeeklyAssignment).count()} weekly assignments")
+        print(f"- {db.query(DailyNutrition).count()} daily nutrition rows")
         
     except Exception as e:
         print(f"❌ Error during database initialization: {e}")
@@ -0,0 +1,240 @@
+"""
+In-process background job runner backed by the `jobs` table
+Handlers in main.py enqueue work (deduplicated by key) and return immediately;
+a pool of worker threads, started with the API or standalone via
+`python jobs.py`, claims due jobs, runs the registered handler and retries
+failures with exponential backoff.
+
+Usage:
+    python jobs.py --workers 4            # standalone worker process
+    python jobs.py --enqueue prune_jobs   # enqueue a job by hand
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import logs
+import models
+from database import SessionLocal
+
+logger = logging.getLogger("nutri_regimen.jobs")
+
+# Run worker threads inside the API process; set false when running `python jobs.py` separately
+JOBS_IN_PROCESS = os.getenv("JOBS_IN_PROCESS", "true").lower() == "true"
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Running jobs whose worker has not finished within this long are assumed dead and retried
+JOB_LOCK_TIMEOUT_SECONDS = float(os.getenv("JOB_LOCK_TIMEOUT_SECONDS", "300"))
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "2"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+
+_handlers: Dict[str, Callable[[Session, dict], None]] = {}
+
+
+def job_handler(kind: str):
+    """Register `fn(db, payload)` as the handler for jobs of this kind"""
+    def register(fn):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(db: Session, kind: str, payload: Optional[dict] = None, key: Optional[str] = None,
+            delay_seconds: float = 0, max_attempts: int = 5) -> models.Job:
+    """
+    Add a job and commit. When `key` is given and a pending job with the same key
+    exists, that job is returned instead of creating a duplicate. A job that is already
+    running gave up its key when it was claimed, so work committed before this call is
+    always picked up by a job that starts after it.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+    if key is not None:
+        existing = db.query(models.Job).filter(models.Job.dedupe_key == key, models.Job.status == "pending").first()
+        if existing:
+            return existing
+
+    job = models.Job(
+        kind=kind,
+        dedupe_key=key,
+        payload=payload or {},
+        status="pending",
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    savepoint = db.begin_nested()
+    try:
+        db.add(job)
+        savepoint.commit()
+    except IntegrityError:
+        # Another request enqueued the same key concurrently
+        savepoint.rollback()
+        return db.query(models.Job).filter(models.Job.dedupe_key == key).first()
+    db.commit()
+    return job
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_next(db: Session) -> Optional[models.Job]:
+    """Atomically move one due job to running; safe across threads and processes"""
+    now = datetime.utcnow()
+    due = or_(
+        (models.Job.status == "pending") & (models.Job.run_at <= now),
+        (models.Job.status == "running") & (models.Job.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS)),
+    )
+    query = db.query(models.Job.id).filter(due).order_by(models.Job.run_at).limit(5)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    candidate_ids = [row.id for row in query]
+
+    for job_id in candidate_ids:
+        # Conditional update: only one worker can flip a given job to running. The key is
+        # released so an enqueue during the run queues a fresh job instead of reusing this one
+        claimed = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, due)
+            .values(status="running", locked_at=now, attempts=models.Job.attempts + 1, dedupe_key=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed:
+            db.commit()
+            return db.get(models.Job, job_id)
+    db.commit()
+    return None
+
+
+def run_job(db: Session, job: models.Job):
+    handler = _handlers.get(job.kind)
+    # Log records written while the job runs carry "job-<id>" where requests carry their X-Request-ID
+    token = logs.set_request_id(f"job-{job.id}")
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        handler(db, job.payload or {})
+        db.commit()
+        job.status, job.last_error = "done", None
+    except Exception:
+        db.rollback()
+        job.last_error = traceback.format_exc(limit=5)
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            logger.error("Job %s (%s) failed permanently after %s attempts", job.id, job.kind, job.attempts)
+        else:
+            job.status = "pending"
+            job.run_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+            logger.warning("Job %s (%s) failed, retry %s/%s scheduled", job.id, job.kind, job.attempts, job.max_attempts)
+    finally:
+        logs.reset_request_id(token)
+    job.locked_at = None
+    db.commit()
+
+
+def run_pending(limit: Optional[int] = None) -> int:
+    """Run due jobs on the calling thread until none are left (or `limit` ran); returns how many ran"""
+    ran = 0
+    with SessionLocal() as db:
+        while limit is None or ran < limit:
+            job = claim_next(db)
+            if job is None:
+                break
+            run_job(db, job)
+            ran += 1
+    return ran
+
+
+class JobWorker:
+    """Pool of polling worker threads"""
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                ran = run_pending(limit=10)
+            except Exception:
+                logger.exception("Job worker loop error")
+                ran = 0
+            if not ran:
+                self._stop.wait(self.poll_seconds)
+
+
+@job_handler("prune_jobs")
+def prune_jobs(db: Session, payload: dict):
+    """Delete finished jobs older than payload['days'] (default 7)"""
+    cutoff = datetime.utcnow() - timedelta(days=payload.get("days", 7))
+    db.query(models.Job).filter(
+        models.Job.status.in_(["done", "failed"]),
+        models.Job.run_at < cutoff
+    ).delete(synchronize_session=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Nutri-Regimen background jobs")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    parser.add_argument("--enqueue", metavar="KIND", help="Enqueue a job of this kind and exit")
+    parser.add_argument("--once", action="store_true", help="Run due jobs on this thread and exit")
+    args = parser.parse_args()
+
+    # Handlers registered by the API modules
+    import main as _api  # noqa: F401
+
+    if args.enqueue:
+        with SessionLocal() as db:
+            job = enqueue(db, args.enqueue)
+            print(f"✅ Enqueued job {job.id} ({job.kind})")
+        return
+    if args.once:
+        print(f"✅ Ran {run_pending()} job(s)")
+        return
+
+    worker = JobWorker(workers=args.workers)
+    worker.start()
+    print(f"🚀 Job worker running with {args.workers} thread(s)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    # Go through the importable module so handlers registered by main.py share its registry
+    import jobs
+    jobs.main()
@@ -0,0 +1,258 @@
+"""
+Structured, non-blocking logging
+Every record is written as one JSON object per line (LOG_FORMAT=text for local
+development) and carries the id of the request being served. Request threads
+only put records on a bounded queue; a QueueListener thread formats and writes
+them, so a slow stdout or a burst of errors never stalls a request. When the
+queue is full, records are dropped and counted instead of blocking. LOG_LEVEL
+sets the level of the app's "nutri_regimen" loggers; other libraries stay at
+WARNING.
+
+RequestIdMiddleware takes the id from an incoming X-Request-ID header (or makes
+one) and returns it on the response. SampledLogger caps high-volume messages
+such as authentication failures: the first LOG_SAMPLE_BURST records per key in
+each LOG_SAMPLE_WINDOW_SECONDS pass, then one in LOG_SAMPLE_EVERY, and each
+emitted record reports how many were suppressed since the previous one.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+import metrics
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json or text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "10"))
+LOG_SAMPLE_WINDOW_SECONDS = float(os.getenv("LOG_SAMPLE_WINDOW_SECONDS", "60"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "100"))
+# Requests are logged when they take at least this long, or always with ACCESS_LOG=true
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+ACCESS_LOG = os.getenv("ACCESS_LOG", "false").lower() == "true"
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+APP_LOGGER = "nutri_regimen"  # Parent of every logger in this app; LOG_LEVEL is set here
+
+access_logger = logging.getLogger("nutri_regimen.access")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came from `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+RECORDS_DROPPED_TOTAL = metrics.Counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full", ()
+)
+RECORDS_SUPPRESSED_TOTAL = metrics.Counter(
+    "log_records_suppressed_total", "Log records suppressed by sampling, by logger", ("logger",)
+)
+
+
+def log_metrics() -> List[str]:
+    return RECORDS_DROPPED_TOTAL.render() + RECORDS_SUPPRESSED_TOTAL.render()
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def set_request_id(request_id: Optional[str]):
+    """Bind `request_id` to the current context (e.g. a job run); returns a token for reset_request_id"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: full queue means the record is dropped"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback on the calling thread (args may not be
+        # safe to format later) but keep the record's fields for the JSON formatter
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            RECORDS_DROPPED_TOTAL.inc(())
+
+
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def _output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _start_listener():
+    global _listener
+    # A fresh queue: after a fork the old one may hold a lock owned by a thread that no longer exists
+    _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(_queue_handler.queue, _output_handler())
+    _listener.start()
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread (processes ending with os._exit)"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()  # Flushes queued records
+
+
+def configure_logging():
+    """Route the root logger through the queue; idempotent, and restarted in forked workers"""
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    _queue_handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    # LOG_LEVEL applies to our own loggers; libraries (httpx, uvicorn, ...) only get warnings into the queue
+    root.setLevel(logging.WARNING)
+    logging.getLogger(APP_LOGGER).setLevel(LOG_LEVEL)
+    _start_listener()
+    atexit.register(stop_logging)
+    # serve.py imports the app before forking; threads do not survive fork
+    os.register_at_fork(after_in_child=_start_listener)
+
+
+class SampledLogger:
+    """Rate-limits a high-volume message per key; see the module docstring"""
+
+    def __init__(self, logger: logging.Logger, burst: int = LOG_SAMPLE_BURST,
+                 window_seconds: float = LOG_SAMPLE_WINDOW_SECONDS, every: int = LOG_SAMPLE_EVERY):
+        self.logger = logger
+        self.burst = burst
+        self.window_seconds = window_seconds
+        self.every = max(every, 1)
+        self._lock = threading.Lock()
+        self._windows: Dict[str, list] = {}  # key -> [window start, seen in window, suppressed since last emit]
+
+    def log(self, level: int, msg: str, *args, key: Optional[str] = None, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        key = key or msg
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.window_seconds:
+                window = self._windows[key] = [now, 0, window[2] if window else 0]
+            window[1] += 1
+            if window[1] > self.burst and (window[1] - self.burst) % self.every:
+                window[2] += 1
+                RECORDS_SUPPRESSED_TOTAL.inc((self.logger.name,))
+                return
+            suppressed, window[2] = window[2], 0
+        if suppressed:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "suppressed": suppressed}
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def warning(self, msg: str, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    def error(self, msg: str, *args, **kwargs):
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware binding X-Request-ID to the request's log records and echoing it back"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = _request_id.set(request_id)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            if ACCESS_LOG or duration_ms >= SLOW_REQUEST_MS:
+                access_logger.log(
+                    logging.INFO if duration_ms < SLOW_REQUEST_MS else logging.WARNING,
+                    "%s %s %s %.1f ms", scope["method"], scope["path"], status_code, duration_ms,
+                    extra={
+                        "method": scope["method"],
+                        "route": metrics.route_label(scope),
+                        "status": status_code,
+                        "duration_ms": round(duration_ms, 1),
+                    },
+                )
+            _request_id.reset(token)
@@ -1,17 +1,36 @@
-from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status
+import secrets
+from typing import List, Optional, Union
+from datetime import date, timedelta
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 
-import models, schemas, crud
-from database import engine, get_db
-from auth import get_current_user, get_current_user_optional
+import models, schemas, crud, metrics, nutrition, jobs, sync, logs, calendar_feed, migrations
+from health import health_checker, liveness
+from admission import AdmissionMiddleware, admission_metrics
+from compression import CompressionMiddleware, compression_metrics
+from database import engine, get_db, pool_metrics, replica_metrics, SessionLocal, ReadYourWritesMiddleware
+from recipe_index import recipe_index
+from nutrient_matrix import nutrient_matrix
+from auth import get_current_user, get_current_user_optional, get_admin_user
+
+# JSON log lines written from a background thread (see logs.py)
+logs.configure_logging()
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+# Bring existing tables up to date (constraints create_all does not add)
+migrations.upgrade(engine)
 
 app = FastAPI(title="Nutri-Regimen API")
 
+# Sends the primary pin of requests that wrote as a cookie, so read-your-writes holds across workers
+app.add_middleware(ReadYourWritesMiddleware)
+
+# Shed load per route class before requests reach the threadpool (inside CORS so 429/503 stay readable)
+app.add_middleware(AdmissionMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -19,13 +38,139 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# gzip/brotli/zstd for large JSON bodies, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency and SQL statement metrics (served at /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_collector(pool_metrics)
+metrics.register_collector(replica_metrics)
+metrics.register_collector(admission_metrics)
+metrics.register_collector(compression_metrics)
+metrics.register_collector(logs.log_metrics)
+
+# Outermost, so every response (including 429s and errors) carries X-Request-ID
+app.add_middleware(logs.RequestIdMiddleware)
+
+# Maximum number of ids accepted by the /batch endpoints
+MAX_BATCH_IDS = 100
+# Maximum number of target users for one admin clone request
+MAX_CLONE_USERS = 5000
+# Maximum number of pantry ingredients accepted by /recipes/match
+MAX_PANTRY_INGREDIENTS = 500
+# Maximum number of weeks assigned by one bulk request
+MAX_BULK_WEEKS = 104
+# Longest range served by /users/me/nutrition/history
+MAX_HISTORY_DAYS = 3660
+
+def parse_batch_ids(ids: str) -> List[int]:
+    """Parse a comma-separated id list, dropping duplicates but keeping request order"""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be a comma-separated list of integers")
+    if not parsed:
+        raise HTTPException(status_code=422, detail="At least one id is required")
+    if len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be fetched per request")
+    return parsed
+
+def order_batch(rows, requested_ids: List[int]):
+    """Return rows in requested order plus the ids that were not found"""
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in requested_ids if i in by_id], [i for i in requested_ids if i not in by_id]
+
+def sync_window(db: Session, since: Optional[str]):
+    try:
+        return sync.sync_window(db, since)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="since must be a watermark returned by a previous sync")
+
+def recipe_filter(
+    min_calories: Optional[float] = None, max_calories: Optional[float] = None,
+    min_protein: Optional[float] = None, max_protein: Optional[float] = None,
+    min_carbs: Optional[float] = None, max_carbs: Optional[float] = None,
+    min_fat: Optional[float] = None, max_fat: Optional[float] = None,
+    min_fiber: Optional[float] = None, max_fiber: Optional[float] = None,
+    category: Optional[str] = Query(None, description="Category of the recipe's main ingredient"),
+    user_id: Optional[int] = Query(None, description="Only recipes created by this user"),
+    is_public: Optional[bool] = None,
+) -> schemas.RecipeFilter:
+    """Query parameters of GET /recipes/ (nutrition is per serving)"""
+    return schemas.RecipeFilter(**locals())
+
+def response_format(
+    format: str = Query("nested", pattern="^(nested|normalized)$", description="'normalized' returns entities keyed by id instead of nesting them")
+) -> str:
+    return format
+
+def normalized_meal_plans(db: Session, meal_plans):
+    """Normalized body for a list of plans: each plan, recipe and ingredient appears once"""
+    recipes, ingredients = crud.get_meal_plan_graph(db, meal_plans)
+    return {
+        "result": [plan.id for plan in meal_plans],
+        "meal_plans": {plan.id: plan for plan in meal_plans},
+        "recipes": {recipe.id: recipe for recipe in recipes},
+        "ingredients": {ingredient.id: ingredient for ingredient in ingredients},
+    }
+
+def normalized_weekly_assignments(db: Session, user_id: int):
+    assignments, meal_plans, recipes, ingredients = crud.get_user_weekly_assignments_graph(db, user_id)
+    return {
+        "result": [assignment.id for assignment in assignments],
+        "weekly_assignments": {assignment.id: assignment for assignment in assignments},
+        "meal_plans": {plan.id: plan for plan in meal_plans},
+        "recipes": {recipe.id: recipe for recipe in recipes},
+        "ingredients": {ingredient.id: ingredient for ingredient in ingredients},
+    }
+
+# Background job workers (disable with JOBS_IN_PROCESS=false and run `python jobs.py` instead)
+job_worker = jobs.JobWorker() if jobs.JOBS_IN_PROCESS else None
+
+@app.on_event("startup")
+def start_job_worker():
+    if job_worker:
+        job_worker.start()
+
+@app.on_event("shutdown")
+def stop_job_worker():
+    if job_worker:
+        job_worker.stop()
+
+@app.on_event("startup")
+def start_health_checker():
+    health_checker.start()
+
+@app.on_event("shutdown")
+def stop_health_checker():
+    health_checker.stop()
+
 # Root endpoint
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Nutri-Regimen API with Supabase Authentication"}
 
+# Health probes: both answer from memory, dependency checks run in the background
+@app.get("/healthz", include_in_schema=False)
+def read_liveness():
+    """Process is up and serving requests"""
+    return liveness()
+
+@app.get("/readyz", include_in_schema=False)
+def read_readiness():
+    """Latest database/auth check results; 503 until the database is reachable"""
+    readiness = health_checker.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
+# Prometheus metrics endpoint
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    """Request latency histograms and per-route SQL statement counts, time and rows"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Authentication endpoints
 @app.get("/auth/me", response_model=schemas.User)
 def get_current_user_info(current_user: models.User = Depends(get_current_user)):
@@ -38,6 +183,137 @@ def read_users_me(current_user: models.User = Depends(get_current_user)):
     """Get current user profile"""
     return current_user
 
+@app.get("/users/me/bootstrap", response_model=schemas.UserBootstrap)
+def read_current_user_bootstrap(
+    from_date: Optional[date] = Query(None, alias="from", description="First week start to include (default: first week of this month)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last week start to include (default: end of this month)"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Plans, assignments in range, the recipes they reference and summary stats in one response"""
+    if from_date is None or to_date is None:
+        today = date.today()
+        first_of_month = today.replace(day=1)
+        next_month = (first_of_month + timedelta(days=32)).replace(day=1)
+        # Same window as the dashboard: from the Monday of the week containing the 1st
+        from_date = from_date or first_of_month - timedelta(days=first_of_month.weekday())
+        to_date = to_date or next_month - timedelta(days=1)
+    if from_date > to_date:
+        raise HTTPException(status_code=422, detail="'from' must not be after 'to'")
+
+    assignments, meal_plans, recipes = crud.get_user_bootstrap(db, current_user.id, from_date, to_date)
+    recipe_totals = nutrition.recipes_totals(db, recipes)
+    stats = nutrition.summarize_assignments(assignments, {plan.id: plan for plan in meal_plans}, recipe_totals)
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "meal_plans": meal_plans,
+        "weekly_assignments": assignments,
+        "recipes": recipes,
+        "stats": stats,
+    }
+
+@app.get("/users/me/changes", response_model=schemas.UserChanges)
+def read_current_user_changes(
+    since: Optional[str] = Query(None, description="Watermark from the previous sync; omit for a full sync"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """The current user's meal plans and weekly assignments changed or deleted since the watermark"""
+    start, cutoff, reset = sync_window(db, since)
+    meal_plans, assignments, deleted_meal_plans, deleted_assignments = crud.get_user_changes(db, current_user.id, start, cutoff)
+    return {
+        "meal_plans": meal_plans,
+        "weekly_assignments": assignments,
+        "deleted_meal_plans": deleted_meal_plans,
+        "deleted_weekly_assignments": deleted_assignments,
+        "watermark": str(sync.Watermark(cutoff)),
+        "reset": reset,
+    }
+
+@app.get("/users/me/nutrition/history", response_model=schemas.NutritionHistory)
+def read_nutrition_history(
+    from_date: Optional[date] = Query(None, alias="from", description="First day to include (default: 12 weeks or 12 months before 'to')"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last day to include (default: today)"),
+    bucket: str = Query("week", pattern="^(week|month)$", description="week (starting Monday) or month"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Planned intake per week or month, aggregated from the daily_nutrition fact table"""
+    to_date = to_date or date.today()
+    if from_date is None:
+        if bucket == "week":
+            from_date = to_date - timedelta(days=to_date.weekday()) - timedelta(weeks=11)
+        else:
+            from_date = (to_date.replace(day=1) - timedelta(days=320)).replace(day=1)
+    if from_date > to_date:
+        raise HTTPException(status_code=422, detail="'from' must not be after 'to'")
+    if (to_date - from_date).days >= MAX_HISTORY_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_HISTORY_DAYS} days can be requested at once")
+
+    rows = crud.get_daily_nutrition_history(db, current_user.id, from_date, to_date, bucket)
+    return {
+        "from_date": from_date,
+        "to_date": to_date,
+        "bucket": bucket,
+        "buckets": [
+            {
+                "start": row.start,
+                "days": row.days,
+                "totals": {nutrient: round(getattr(row, nutrient) or 0, 1) for nutrient in nutrition.NUTRIENT_COLUMNS},
+                "daily_averages": {nutrient: round((getattr(row, nutrient) or 0) / row.days, 1) for nutrient in nutrition.NUTRIENT_COLUMNS},
+            }
+            for row in rows
+        ],
+    }
+
+@app.post("/users/me/calendar-token", response_model=schemas.CalendarFeed)
+def create_calendar_token(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create or rotate the secret URL of the current user's .ics feed; the old URL stops working"""
+    token = secrets.token_urlsafe(32)
+    crud.set_user_calendar_token(db, current_user.id, token)
+    return {"token": token, "path": f"/users/{token}/meal-plan.ics"}
+
+@app.delete("/users/me/calendar-token", status_code=204)
+def delete_calendar_token(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Disable the current user's .ics feed"""
+    crud.set_user_calendar_token(db, current_user.id, None)
+    return Response(status_code=204)
+
+@app.get("/users/{token}/meal-plan.ics")
+def read_meal_plan_calendar(token: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Weekly assignments as an iCalendar feed for calendar apps, which cannot send a
+    bearer token: the secret token in the path identifies the user. Supports
+    If-None-Match / If-Modified-Since, answering 304 from one aggregate query.
+    """
+    user = crud.get_user_by_calendar_token(db, token)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Calendar feed not found")
+    start, end = calendar_feed.feed_window(date.today())
+    count, last_modified = crud.get_calendar_feed_version(db, user.id, start, end)
+    etag, last_modified_header = calendar_feed.validators(user.id, start, count, last_modified)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={calendar_feed.CALENDAR_MAX_AGE_SECONDS}"}
+    if last_modified_header:
+        headers["Last-Modified"] = last_modified_header
+    if calendar_feed.is_not_modified(
+        request.headers.get("if-none-match"), request.headers.get("if-modified-since"), etag, last_modified_header
+    ):
+        return Response(status_code=304, headers=headers)
+    # The request's session is closed before the body streams; the feed uses its own on the same database
+    feed_db = Session(bind=db.get_bind())
+    return StreamingResponse(
+        calendar_feed.stream_feed(feed_db, user.id, start, end, last_modified),
+        media_type="text/calendar; charset=utf-8",
+        headers=headers,
+    )
+
 @app.put("/users/me", response_model=schemas.User)
 def update_current_user(
     user_update: schemas.UserUpdate,
@@ -81,7 +357,9 @@ def create_ingredient(
     current_user: models.User = Depends(get_current_user)
 ):
     """Create a new ingredient"""
-    return crud.create_ingredient(db=db, ingredient=ingredient)
+    db_ingredient = crud.create_ingredient(db=db, ingredient=ingredient)
+    nutrient_matrix.rebuild(db)
+    return db_ingredient
 
 @app.get("/ingredients/", response_model=List[schemas.Ingredient])
 def read_ingredients(
@@ -93,6 +371,33 @@ def read_ingredients(
     ingredients = crud.get_ingredients(db, skip=skip, limit=limit)
     return ingredients
 
+@app.get("/ingredients/batch", response_model=schemas.IngredientBatch)
+def read_ingredients_batch(
+    ids: str = Query(..., description="Comma-separated ingredient ids"),
+    db: Session = Depends(get_db)
+):
+    """Get several ingredients by ID in one request (public endpoint)"""
+    requested_ids = parse_batch_ids(ids)
+    items, missing = order_batch(crud.get_ingredients_by_ids(db, requested_ids), requested_ids)
+    return {"items": items, "missing": missing}
+
+@app.get("/ingredients/changes", response_model=schemas.IngredientChanges)
+def read_ingredient_changes(
+    since: Optional[str] = Query(None, description="Watermark from the previous sync; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=sync.MAX_CHANGES_PAGE),
+    db: Session = Depends(get_db)
+):
+    """Ingredients created or updated since the watermark (public endpoint)"""
+    start, cutoff, reset = sync_window(db, since)
+    items, watermark, has_more = crud.get_ingredient_changes(db, start, cutoff, limit)
+    return {
+        "items": items,
+        "deleted": sync.deleted_ids(db, "ingredient", start, cutoff),
+        "watermark": str(watermark),
+        "has_more": has_more,
+        "reset": reset,
+    }
+
 @app.get("/ingredients/{ingredient_id}", response_model=schemas.Ingredient)
 def read_ingredient(
     ingredient_id: int, 
@@ -104,6 +409,22 @@ def read_ingredient(
         raise HTTPException(status_code=404, detail="Ingredient not found")
     return db_ingredient
 
+@app.put("/ingredients/{ingredient_id}", response_model=schemas.Ingredient)
+def update_ingredient(
+    ingredient_id: int,
+    ingredient: schemas.IngredientUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Update an ingredient; stored recipe and meal plan totals that use it are refreshed in the background"""
+    db_ingredient = crud.update_ingredient(db, ingredient_id=ingredient_id, ingredient=ingredient)
+    if db_ingredient is None:
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+    nutrient_matrix.rebuild(db)
+    for kind in ("recompute_meal_plan_nutrition", "recompute_recipe_nutrition"):
+        jobs.enqueue(db, kind, {"ingredient_id": ingredient_id}, key=f"{kind}:{ingredient_id}")
+    return db_ingredient
+
 # Recipe endpoints
 @app.post("/recipes/", response_model=schemas.Recipe, status_code=status.HTTP_201_CREATED)
 def create_recipe(
@@ -112,18 +433,81 @@ def create_recipe(
     db: Session = Depends(get_db)
 ):
     """Create a new recipe"""
-    return crud.create_recipe(db=db, recipe=recipe, user_id=current_user.id)
+    db_recipe = crud.create_recipe(db=db, recipe=recipe, user_id=current_user.id)
+    recipe_index.upsert_recipe(db, db_recipe)
+    return db_recipe
 
 @app.get("/recipes/", response_model=List[schemas.Recipe])
 def read_recipes(
     skip: int = 0, 
     limit: int = 100, 
+    filters: schemas.RecipeFilter = Depends(recipe_filter),
+    sort: Optional[str] = Query(None, pattern=f"^({'|'.join(crud.RECIPE_SORT_COLUMNS)})$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
     db: Session = Depends(get_db)
 ):
-    """Get all recipes (public endpoint)"""
-    recipes = crud.get_recipes(db, skip=skip, limit=limit)
+    """Get all recipes, optionally filtered by per-serving nutrition, main ingredient category or owner (public endpoint)"""
+    for nutrient in nutrition.RECIPE_NUTRIENT_COLUMNS:
+        low, high = getattr(filters, f"min_{nutrient}"), getattr(filters, f"max_{nutrient}")
+        if low is not None and high is not None and low > high:
+            raise HTTPException(status_code=422, detail=f"min_{nutrient} must not be greater than max_{nutrient}")
+    recipes = crud.get_recipes(db, skip=skip, limit=limit, filters=filters, sort=sort, descending=order == "desc")
     return recipes
 
+@app.post("/recipes/match", response_model=List[schemas.RecipeMatch])
+def match_recipes(
+    pantry: schemas.PantryMatch,
+    db: Session = Depends(get_db)
+):
+    """Recipes needing the fewest ingredients beyond the given pantry, with coverage scores (public endpoint)"""
+    if not pantry.ingredient_ids:
+        raise HTTPException(status_code=422, detail="At least one ingredient id is required")
+    if len(pantry.ingredient_ids) > MAX_PANTRY_INGREDIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PANTRY_INGREDIENTS} ingredients can be matched per request")
+    if not 1 <= pantry.limit <= MAX_BATCH_IDS:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {MAX_BATCH_IDS}")
+
+    recipe_index.ensure_fresh(SessionLocal)
+    matches = recipe_index.match(pantry.ingredient_ids, k=pantry.limit, max_missing=pantry.max_missing)
+    recipes = {recipe.id: recipe for recipe in crud.get_recipes_by_ids(db, [recipe_id for recipe_id, *_ in matches])}
+    return [
+        {
+            "matched": matched,
+            "missing": total - matched,
+            "coverage": matched / total,
+            "missing_ingredient_ids": missing_ids,
+            "recipe": recipes[recipe_id],
+        }
+        for recipe_id, matched, total, missing_ids in matches if recipe_id in recipes
+    ]
+
+@app.get("/recipes/batch", response_model=schemas.RecipeBatch)
+def read_recipes_batch(
+    ids: str = Query(..., description="Comma-separated recipe ids"),
+    db: Session = Depends(get_db)
+):
+    """Get several recipes by ID in one request (public endpoint)"""
+    requested_ids = parse_batch_ids(ids)
+    items, missing = order_batch(crud.get_recipes_by_ids(db, requested_ids), requested_ids)
+    return {"items": items, "missing": missing}
+
+@app.get("/recipes/changes", response_model=schemas.RecipeChanges)
+def read_recipe_changes(
+    since: Optional[str] = Query(None, description="Watermark from the previous sync; omit for a full sync"),
+    limit: int = Query(500, ge=1, le=sync.MAX_CHANGES_PAGE),
+    db: Session = Depends(get_db)
+):
+    """Recipes created or updated since the watermark (public endpoint)"""
+    start, cutoff, reset = sync_window(db, since)
+    items, watermark, has_more = crud.get_recipe_changes(db, start, cutoff, limit)
+    return {
+        "items": items,
+        "deleted": sync.deleted_ids(db, "recipe", start, cutoff),
+        "watermark": str(watermark),
+        "has_more": has_more,
+        "reset": reset,
+    }
+
 @app.get("/recipes/{recipe_id}", response_model=schemas.Recipe)
 def read_recipe(
     recipe_id: int, 
@@ -135,6 +519,26 @@ def read_recipe(
         raise HTTPException(status_code=404, detail="Recipe not found")
     return db_recipe
 
+def scored_recipes(db: Session, scored):
+    """Load (recipe_id, score) pairs in one query, keeping score order"""
+    recipes = {recipe.id: recipe for recipe in crud.get_recipes_by_ids(db, [recipe_id for recipe_id, _ in scored])}
+    return [
+        {"score": round(score, 4), "recipe": recipes[recipe_id]}
+        for recipe_id, score in scored if recipe_id in recipes
+    ]
+
+@app.get("/recipes/{recipe_id}/similar", response_model=List[schemas.SimilarRecipe])
+def read_similar_recipes(
+    recipe_id: int,
+    k: int = Query(10, ge=1, le=MAX_BATCH_IDS),
+    db: Session = Depends(get_db)
+):
+    """Recipes closest in ingredient composition and macro profile (public endpoint)"""
+    recipe_index.ensure_fresh(SessionLocal)
+    if crud.get_recipe(db, recipe_id=recipe_id) is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return scored_recipes(db, recipe_index.similar(recipe_id, k=k))
+
 # Meal Plan endpoints
 @app.post("/meal-plans/", response_model=schemas.MealPlan, status_code=status.HTTP_201_CREATED)
 def create_meal_plan(
@@ -145,17 +549,37 @@ def create_meal_plan(
     """Create a new meal plan"""
     return crud.create_meal_plan(db=db, meal_plan=meal_plan, user_id=current_user.id)
 
-@app.get("/meal-plans/", response_model=List[schemas.MealPlan])
+@app.get("/meal-plans/", response_model=Union[List[schemas.MealPlan], schemas.NormalizedMealPlans])
 def read_meal_plans(
     skip: int = 0, 
     limit: int = 100, 
+    format: str = Depends(response_format),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Get all meal plans (authenticated users only)"""
     meal_plans = crud.get_meal_plans(db, skip=skip, limit=limit)
+    if format == "normalized":
+        return normalized_meal_plans(db, meal_plans)
     return meal_plans
 
+@app.get("/meal-plans/batch", response_model=schemas.MealPlanBatch)
+def read_meal_plans_batch(
+    ids: str = Query(..., description="Comma-separated meal plan ids"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Get several of the current user's meal plans (or templates) by ID in one request"""
+    requested_ids = parse_batch_ids(ids)
+    found, missing = order_batch(crud.get_meal_plans_by_ids(db, requested_ids), requested_ids)
+    items, forbidden = [], []
+    for meal_plan in found:
+        if meal_plan.user_id == current_user.id or meal_plan.is_template == "true":
+            items.append(meal_plan)
+        else:
+            forbidden.append(meal_plan.id)
+    return {"items": items, "missing": missing, "forbidden": forbidden}
+
 @app.get("/meal-plans/{meal_plan_id}", response_model=schemas.MealPlan)
 def read_meal_plan(
     meal_plan_id: int, 
@@ -163,27 +587,126 @@ def read_meal_plan(
     current_user: models.User = Depends(get_current_user)
 ):
     """Get meal plan by ID"""
-    db_meal_plan = crud.get_meal_plan(db, meal_plan_id=meal_plan_id)
+    db_meal_plan = crud.get_meal_plan_with_items(db, meal_plan_id=meal_plan_id)
     if db_meal_plan is None:
         raise HTTPException(status_code=404, detail="Meal plan not found")
     return db_meal_plan
 
-@app.get("/users/me/meal-plans/", response_model=List[schemas.MealPlan])
+@app.get("/meal-plans/{meal_plan_id}/nutrition", response_model=schemas.MealPlanNutrition)
+def read_meal_plan_nutrition(
+    meal_plan_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Stored per-day, per-slot and plan totals of one of your meal plans or a template, read as one row"""
+    row = crud.get_meal_plan_nutrition(db, meal_plan_id=meal_plan_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+    if row.user_id != current_user.id and row.is_template != "true":
+        raise HTTPException(status_code=403, detail="Not authorized to view this meal plan")
+    # Plans not backfilled yet have no stored totals
+    return row.nutrition or nutrition.meal_plan_nutrition(db, meal_plan_id)
+
+@app.get("/meal-plans/{meal_plan_id}/suggest-swap", response_model=List[schemas.SimilarRecipe])
+def suggest_meal_plan_swap(
+    meal_plan_id: int,
+    slot: str = Query(..., description="Day and meal, e.g. Monday:dinner"),
+    k: int = Query(5, ge=1, le=MAX_BATCH_IDS),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Replacement candidates for the recipe(s) in one slot of a meal plan, skipping recipes already in the plan"""
+    day_of_week, _, meal_type = slot.partition(":")
+    if not day_of_week or not meal_type:
+        raise HTTPException(status_code=422, detail="slot must look like 'Monday:dinner'")
+    db_meal_plan = crud.get_meal_plan(db, meal_plan_id=meal_plan_id)
+    if db_meal_plan is None:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+    if db_meal_plan.user_id != current_user.id and db_meal_plan.is_template != "true":
+        raise HTTPException(status_code=403, detail="Not authorized to view this meal plan")
+
+    slot_recipe_ids = [
+        item.recipe_id for item in db_meal_plan.meal_plan_items
+        if item.day_of_week.lower() == day_of_week.lower() and item.meal_type.lower() == meal_type.lower()
+    ]
+    if not slot_recipe_ids:
+        raise HTTPException(status_code=404, detail="No recipe in this slot")
+
+    recipe_index.ensure_fresh(SessionLocal)
+    plan_recipe_ids = {item.recipe_id for item in db_meal_plan.meal_plan_items}
+    best = {}
+    for recipe_id in slot_recipe_ids:
+        for candidate_id, score in recipe_index.similar(recipe_id, k=k, exclude=plan_recipe_ids):
+            best[candidate_id] = max(score, best.get(candidate_id, score))
+    ranked = sorted(best.items(), key=lambda pair: pair[1], reverse=True)[:k]
+    return scored_recipes(db, ranked)
+
+@app.post("/meal-plans/{meal_plan_id}/clone", response_model=schemas.MealPlanCloneResult, status_code=status.HTTP_201_CREATED)
+def clone_meal_plan(
+    meal_plan_id: int,
+    name: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Copy one of your meal plans or a template, with its items, into a new plan you own"""
+    source = crud.get_meal_plan_access(db, meal_plan_id=meal_plan_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+    if source.user_id != current_user.id and source.is_template != "true":
+        raise HTTPException(status_code=403, detail="Not authorized to clone this meal plan")
+
+    clones, items_per_plan = crud.clone_meal_plan(db, meal_plan_id, [current_user.id], name=name)
+    return {
+        "source_id": meal_plan_id,
+        "items_per_plan": items_per_plan,
+        "clones": [{"user_id": user_id, "meal_plan_id": plan_id} for user_id, plan_id in clones],
+    }
+
+@app.post("/meal-plans/{meal_plan_id}/clone-to-users", response_model=schemas.MealPlanCloneResult, status_code=status.HTTP_201_CREATED)
+def clone_meal_plan_to_users(
+    meal_plan_id: int,
+    clone: schemas.MealPlanCloneToUsers,
+    db: Session = Depends(get_db),
+    admin_user: models.User = Depends(get_admin_user)
+):
+    """Copy a meal plan to many users at once (admins only)"""
+    user_ids = list(dict.fromkeys(clone.user_ids))
+    if not user_ids:
+        raise HTTPException(status_code=422, detail="At least one user id is required")
+    if len(user_ids) > MAX_CLONE_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CLONE_USERS} users can be targeted per request")
+    if crud.get_meal_plan_access(db, meal_plan_id=meal_plan_id) is None:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+
+    clones, items_per_plan = crud.clone_meal_plan(db, meal_plan_id, user_ids, name=clone.name)
+    cloned_user_ids = {user_id for user_id, _ in clones}
+    return {
+        "source_id": meal_plan_id,
+        "items_per_plan": items_per_plan,
+        "clones": [{"user_id": user_id, "meal_plan_id": plan_id} for user_id, plan_id in clones],
+        "missing_users": [user_id for user_id in user_ids if user_id not in cloned_user_ids],
+    }
+
+@app.get("/users/me/meal-plans/", response_model=Union[List[schemas.MealPlan], schemas.NormalizedMealPlans])
 def read_current_user_meal_plans(
     skip: int = 0, 
     limit: int = 100, 
+    format: str = Depends(response_format),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's meal plans"""
     meal_plans = crud.get_user_meal_plans(db, user_id=current_user.id, skip=skip, limit=limit)
+    if format == "normalized":
+        return normalized_meal_plans(db, meal_plans)
     return meal_plans
 
-@app.get("/users/{user_id}/meal-plans/", response_model=List[schemas.MealPlan])
+@app.get("/users/{user_id}/meal-plans/", response_model=Union[List[schemas.MealPlan], schemas.NormalizedMealPlans])
 def read_user_meal_plans(
     user_id: int, 
     skip: int = 0, 
     limit: int = 100, 
+    format: str = Depends(response_format),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -193,6 +716,8 @@ def read_user_meal_plans(
         raise HTTPException(status_code=404, detail="User not found")
     
     meal_plans = crud.get_user_meal_plans(db, user_id=user_id, skip=skip, limit=limit)
+    if format == "normalized":
+        return normalized_meal_plans(db, meal_plans)
     return meal_plans
 
 @app.put("/meal-plans/{meal_plan_id}", response_model=schemas.MealPlan)
@@ -213,6 +738,8 @@ def update_meal_plan(
     db_meal_plan = crud.update_meal_plan(db, meal_plan_id=meal_plan_id, meal_plan=meal_plan)
     if db_meal_plan is None:
         raise HTTPException(status_code=404, detail="Meal plan not found")
+    # Every week this plan is assigned to, possibly for many users, is rewritten in the background
+    jobs.enqueue(db, "refresh_daily_nutrition", {"meal_plan_ids": [meal_plan_id]}, key=f"refresh_daily_nutrition:{meal_plan_id}")
     return db_meal_plan
 
 @app.delete("/meal-plans/{meal_plan_id}", response_model=schemas.MealPlan)
@@ -244,29 +771,65 @@ def create_weekly_assignment(
     """Create or update a weekly assignment"""
     # Ensure the assignment is for the current user
     assignment.user_id = current_user.id
-    
-    # Check if assignment already exists for this week and user
-    existing = crud.get_weekly_assignment_by_week(db, assignment.week_start_date, current_user.id)
-    if existing:
-        # Update existing assignment
-        return crud.update_weekly_assignment(db, existing.id, assignment)
+    # Single upsert on (user_id, week_start_date): no read-then-write race between concurrent saves
     return crud.create_weekly_assignment(db=db, assignment=assignment)
 
-@app.get("/users/me/weekly-assignments/", response_model=List[schemas.WeeklyAssignment])
+@app.post("/weekly-assignments/bulk", response_model=List[schemas.WeeklyAssignmentSummary])
+def create_weekly_assignments_bulk(
+    bulk: schemas.WeeklyAssignmentBulkCreate,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Assign one plan, or a rotation of plans, to many weeks in one statement; existing weeks are replaced"""
+    if bulk.week_start_dates is not None:
+        if bulk.from_date is not None or bulk.to_date is not None:
+            raise HTTPException(status_code=422, detail="Give either week_start_dates or from_date/to_date, not both")
+        weeks = list(dict.fromkeys(bulk.week_start_dates))
+    elif bulk.from_date is not None and bulk.to_date is not None:
+        if bulk.from_date > bulk.to_date:
+            raise HTTPException(status_code=422, detail="'from_date' must not be after 'to_date'")
+        weeks = [bulk.from_date + timedelta(weeks=i) for i in range((bulk.to_date - bulk.from_date).days // 7 + 1)]
+    else:
+        raise HTTPException(status_code=422, detail="Give week_start_dates, or from_date and to_date")
+    if not weeks or not bulk.meal_plan_ids:
+        raise HTTPException(status_code=422, detail="At least one week and one meal plan are required")
+    if len(weeks) > MAX_BULK_WEEKS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_WEEKS} weeks can be assigned per request")
+
+    for meal_plan_id in set(bulk.meal_plan_ids):
+        access = crud.get_meal_plan_access(db, meal_plan_id=meal_plan_id)
+        if access is None:
+            raise HTTPException(status_code=404, detail=f"Meal plan {meal_plan_id} not found")
+        if access.user_id != current_user.id and access.is_template != "true":
+            raise HTTPException(status_code=403, detail=f"Not authorized to assign meal plan {meal_plan_id}")
+
+    rotation = bulk.meal_plan_ids
+    ids = crud.upsert_weekly_assignments(
+        db, current_user.id, [(week, rotation[i % len(rotation)]) for i, week in enumerate(weeks)]
+    )
+    return crud.get_weekly_assignments_by_ids(db, ids)
+
+@app.get("/users/me/weekly-assignments/", response_model=Union[List[schemas.WeeklyAssignment], schemas.NormalizedWeeklyAssignments])
 def read_current_user_weekly_assignments(
+    format: str = Depends(response_format),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get current user's weekly assignments"""
+    if format == "normalized":
+        return normalized_weekly_assignments(db, current_user.id)
     return crud.get_user_weekly_assignments(db, user_id=current_user.id)
 
-@app.get("/users/{user_id}/weekly-assignments/", response_model=List[schemas.WeeklyAssignment])
+@app.get("/users/{user_id}/weekly-assignments/", response_model=Union[List[schemas.WeeklyAssignment], schemas.NormalizedWeeklyAssignments])
 def read_user_weekly_assignments(
     user_id: int, 
+    format: str = Depends(response_format),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Get user's weekly assignments by user ID"""
+    if format == "normalized":
+        return normalized_weekly_assignments(db, user_id)
     return crud.get_user_weekly_assignments(db, user_id=user_id)
 
 @app.delete("/weekly-assignments/{assignment_id}", response_model=schemas.WeeklyAssignment)
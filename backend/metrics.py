@@ -0,0 +1,328 @@
+"""
+Per-request latency and SQL instrumentation, exposed in Prometheus text format
+MetricsMiddleware times every request and SQLAlchemy cursor hooks attribute each
+statement (count, time, rows) to the route that issued it. Statements slower than
+SLOW_QUERY_MS are logged with their parameter shape, never their values.
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("nutri_regimen.slow_query")
+
+# Statements slower than this are logged; 0 disables the slow-query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_MAX_STATEMENT_CHARS = 1000
+
+# Set per worker by serve.py: samples are labelled with the worker id and shared through this directory
+METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+UNMATCHED_ROUTE = "unmatched"
+NO_ROUTE = "none"
+
+
+class RequestStats:
+    """SQL activity of the request currently being served"""
+
+    __slots__ = ("scope", "statements", "sql_seconds", "rows")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+
+    @property
+    def route(self) -> str:
+        return route_label(self.scope)
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def route_label(scope: dict) -> str:
+    """Route template (e.g. /recipes/{recipe_id}) so labels stay low-cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts..., sum, count]
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, state in sorted(self._values.items()):
+                for i, bound in enumerate(self.buckets):
+                    bucket_labels = _format_labels(self.labels, labels, 'le="%g"' % bound)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {state[i]}")
+                inf_labels = _format_labels(self.labels, labels, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{inf_labels} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {state[-2]:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {state[-1]}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route"), LATENCY_BUCKETS
+)
+REQUESTS_TOTAL = Counter("http_requests_total", "Requests served by route and status", ("method", "route", "status"))
+REQUEST_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements issued per request", ("method", "route"), STATEMENT_BUCKETS
+)
+SQL_STATEMENTS_TOTAL = Counter("db_statements_total", "SQL statements executed by route", ("route",))
+SQL_SECONDS_TOTAL = Counter("db_statement_seconds_total", "Time spent executing SQL by route", ("route",))
+SQL_ROWS_TOTAL = Counter(
+    "db_rows_returned_total", "Rows reported by the driver by route (SQLite reports none for SELECT)", ("route",)
+)
+SLOW_QUERIES_TOTAL = Counter("db_slow_statements_total", "Statements slower than SLOW_QUERY_MS by route", ("route",))
+
+_metrics = [
+    REQUEST_LATENCY, REQUESTS_TOTAL, REQUEST_STATEMENTS,
+    SQL_STATEMENTS_TOTAL, SQL_SECONDS_TOTAL, SQL_ROWS_TOTAL, SLOW_QUERIES_TOTAL,
+]
+_collectors: List[Callable[[], List[str]]] = []
+_worker_id: Optional[str] = None
+
+
+def register_collector(collector: Callable[[], List[str]]):
+    """Add a callable returning extra exposition lines (gauges owned by other modules)"""
+    _collectors.append(collector)
+
+
+def render_local() -> List[str]:
+    """Exposition lines for this process, labelled with its worker id under serve.py"""
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    if _worker_id is not None:
+        lines = [_with_worker_label(line) for line in lines]
+    return lines
+
+
+def render() -> str:
+    """This process's metrics, plus the last published samples of its sibling workers"""
+    if _worker_id is None or not METRICS_MULTIPROCESS_DIR:
+        return "\n".join(render_local()) + "\n"
+    sources = [render_local()]
+    own_file = _worker_file(_worker_id)
+    for name in sorted(os.listdir(METRICS_MULTIPROCESS_DIR)):
+        path = os.path.join(METRICS_MULTIPROCESS_DIR, name)
+        if name.endswith(".prom") and path != own_file:
+            try:
+                with open(path) as f:
+                    sources.append(f.read().splitlines())
+            except OSError:
+                continue  # worker exited between listdir and open
+    return "\n".join(merge_exposition(sources)) + "\n"
+
+
+def _with_worker_label(line: str) -> str:
+    if not line or line.startswith("#"):
+        return line
+    label = f'worker="{_worker_id}"'
+    brace, space = line.find("{"), line.find(" ")
+    if brace != -1 and brace < space:
+        return f"{line[:brace + 1]}{label},{line[brace + 1:]}"
+    return f"{line[:space]}{{{label}}}{line[space:]}"
+
+
+def merge_exposition(sources: List[List[str]]) -> List[str]:
+    """Merge several processes' exposition lines so each metric family has one HELP/TYPE header"""
+    families: Dict[str, Tuple[List[str], List[str]]] = {}
+    for lines in sources:
+        current = None
+        for line in lines:
+            if line.startswith(("# HELP ", "# TYPE ")):
+                current = families.setdefault(line.split()[2], ([], []))
+                if line not in current[0]:
+                    current[0].append(line)
+            elif line:
+                if current is None:
+                    current = families.setdefault(re.split(r"[{ ]", line, 1)[0], ([], []))
+                current[1].append(line)
+    merged: List[str] = []
+    for header, samples in families.values():
+        merged.extend(header)
+        merged.extend(samples)
+    return merged
+
+
+def _worker_file(worker_id: str) -> str:
+    return os.path.join(METRICS_MULTIPROCESS_DIR, f"worker-{worker_id}.prom")
+
+
+def start_worker_metrics(worker_id: str):
+    """
+    Label this process's samples with `worker_id` and, when METRICS_MULTIPROCESS_DIR
+    is set, publish them there every METRICS_FLUSH_SECONDS for sibling workers' /metrics.
+    """
+    global _worker_id
+    _worker_id = worker_id
+    if not METRICS_MULTIPROCESS_DIR:
+        return
+
+    def publish_forever():
+        path = _worker_file(worker_id)
+        while True:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write("\n".join(render_local()) + "\n")
+                os.replace(tmp_path, path)
+            except OSError:
+                logger.exception("Could not publish worker metrics to %s", path)
+            time.sleep(METRICS_FLUSH_SECONDS)
+
+    threading.Thread(target=publish_forever, name="metrics-publish", daemon=True).start()
+
+
+def parameter_shape(parameters) -> str:
+    """Describe bound parameters by type only, e.g. {'id_1': int} or 500 x (int, str)"""
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(value).__name__ for value in parameters) + ")"
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append((context, time.perf_counter()))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()[1]
+    # Only statements with a result set "return" rows; DML rowcounts are affected rows
+    rows = max(cursor.rowcount, 0) if cursor.description is not None else 0
+    stats = _current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+        stats.rows += rows
+        route = stats.route
+    else:
+        route = NO_ROUTE
+
+    SQL_STATEMENTS_TOTAL.inc((route,))
+    SQL_SECONDS_TOTAL.inc((route,), elapsed)
+    if rows:
+        SQL_ROWS_TOTAL.inc((route,), rows)
+
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES_TOTAL.inc((route,))
+        logger.warning(
+            "Slow query (%.1f ms) on route %s: %s | params: %s",
+            elapsed * 1000,
+            route,
+            re.sub(r"\s+", " ", statement)[:SLOW_QUERY_MAX_STATEMENT_CHARS],
+            parameter_shape(parameters),
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # after_cursor_execute never runs for a failed statement; drop its start time so
+    # pooled connections do not accumulate entries
+    conn = context.connection
+    starts = conn.info.get("query_start_time") if conn is not None else None
+    if starts and context.execution_context is not None and starts[-1][0] is context.execution_context:
+        starts.pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and per-request SQL totals by route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_request.reset(token)
+            method, route = scope["method"], stats.route
+            REQUEST_LATENCY.observe((method, route), elapsed)
+            REQUESTS_TOTAL.inc((method, route, str(status_code)))
+            REQUEST_STATEMENTS.observe((method, route), stats.statements)
@@ -0,0 +1,91 @@
+"""
+Startup schema upgrades
+`create_all` creates missing tables but never changes existing ones. The upgrades
+here bring an existing database up to what the code relies on; each checks the
+live schema first, so running them on every start is a no-op once applied.
+
+- weekly_assignments gets its (user_id, week_start_date) unique constraint, the
+  ON CONFLICT target of crud.upsert_weekly_assignments. Duplicate weeks are
+  removed first, keeping the most recently updated row of each, with tombstones
+  for delta sync and their daily_nutrition rows rewritten.
+"""
+
+import logging
+from collections import defaultdict
+
+from sqlalchemy import and_, delete, exists, func, inspect, or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, aliased
+
+import daily_nutrition
+import models
+
+logger = logging.getLogger("nutri_regimen.migrations")
+
+WEEKLY_ASSIGNMENT_UNIQUE = "uq_weekly_assignments_user_id_week_start_date"
+WEEKLY_ASSIGNMENT_UNIQUE_COLUMNS = {"user_id", "week_start_date"}
+
+
+def has_weekly_assignment_unique(engine) -> bool:
+    """Whether weekly_assignments has a unique constraint or index on exactly (user_id, week_start_date)"""
+    inspector = inspect(engine)
+    candidates = inspector.get_unique_constraints("weekly_assignments") + [
+        index for index in inspector.get_indexes("weekly_assignments") if index["unique"]
+    ]
+    return any(set(candidate["column_names"]) == WEEKLY_ASSIGNMENT_UNIQUE_COLUMNS for candidate in candidates)
+
+
+def remove_duplicate_weeks(db: Session) -> int:
+    """Delete all but the latest assignment of each (user, week); returns the number deleted (caller commits)"""
+    assignment, newer = models.WeeklyAssignment, aliased(models.WeeklyAssignment)
+    updated_at = func.coalesce(assignment.updated_at, assignment.created_at)
+    newer_updated_at = func.coalesce(newer.updated_at, newer.created_at)
+    superseded = db.query(assignment.id, assignment.user_id, assignment.week_start_date).filter(exists().where(
+        newer.user_id == assignment.user_id,
+        newer.week_start_date == assignment.week_start_date,
+        or_(newer_updated_at > updated_at, and_(newer_updated_at == updated_at, newer.id > assignment.id)),
+    )).all()
+    if not superseded:
+        return 0
+
+    weeks_by_user = defaultdict(set)
+    for row in superseded:
+        db.add(models.Tombstone(entity_type="weekly_assignment", entity_id=row.id, user_id=row.user_id))
+        weeks_by_user[row.user_id].add(row.week_start_date)
+    db.execute(delete(models.WeeklyAssignment).where(models.WeeklyAssignment.id.in_([row.id for row in superseded])))
+    for user_id, weeks in weeks_by_user.items():
+        daily_nutrition.refresh_weeks(db, user_id, weeks)
+    return len(superseded)
+
+
+def ensure_weekly_assignment_unique(engine):
+    """Dedupe weekly_assignments and add its unique constraint when it is missing"""
+    if not inspect(engine).has_table("weekly_assignments") or has_weekly_assignment_unique(engine):
+        return
+    # SQLite cannot add a constraint to an existing table; a unique index is an equivalent ON CONFLICT target
+    if engine.dialect.name == "postgresql":
+        ddl = f"ALTER TABLE weekly_assignments ADD CONSTRAINT {WEEKLY_ASSIGNMENT_UNIQUE} UNIQUE (user_id, week_start_date)"
+    else:
+        ddl = f"CREATE UNIQUE INDEX IF NOT EXISTS {WEEKLY_ASSIGNMENT_UNIQUE} ON weekly_assignments (user_id, week_start_date)"
+    try:
+        with Session(engine) as db:
+            if engine.dialect.name == "postgresql":
+                # Keep new duplicates out until the constraint exists
+                db.execute(text("LOCK TABLE weekly_assignments IN SHARE ROW EXCLUSIVE MODE"))
+            removed = remove_duplicate_weeks(db)
+            db.execute(text(ddl))
+            db.commit()
+    except DBAPIError as e:
+        # Another process starting at the same time may have added it first
+        if has_weekly_assignment_unique(engine):
+            return
+        raise RuntimeError(
+            f"weekly_assignments has no unique constraint on (user_id, week_start_date) and adding "
+            f"{WEEKLY_ASSIGNMENT_UNIQUE} failed: {e}. Weekly assignment saves need it as their ON CONFLICT target."
+        ) from e
+    logger.warning("Added %s to weekly_assignments after removing %d duplicate weeks", WEEKLY_ASSIGNMENT_UNIQUE, removed)
+
+
+def upgrade(engine):
+    """Run every startup upgrade"""
+    ensure_weekly_assignment_unique(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Date, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Date, JSON, Index, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -14,6 +14,7 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=True)  # Optional, can be set later
     full_name = Column(String, nullable=True)  # From Supabase user metadata
     avatar_url = Column(String, nullable=True)  # From Supabase user metadata
+    calendar_token = Column(String, unique=True, index=True, nullable=True)  # Secret in the .ics feed URL
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -36,7 +37,7 @@ class Ingredient(Base):
     sugar_per_100g = Column(Float)
     sodium_per_100g = Column(Float)
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # Delta sync watermark
     
     # Relationship
     recipe_associations = relationship("RecipeIngredient", back_populates="ingredient")
@@ -48,10 +49,18 @@ class Recipe(Base):
     name = Column(String, index=True)
     description = Column(Text)
     instructions = Column(Text)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Nullable for public recipes
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)  # Nullable for public recipes
     is_public = Column(String, default="false")  # Public recipes available to all users
+    # Per-serving nutrition precomputed from the ingredients, indexed for filtering and sorting
+    calories = Column(Float, nullable=True, index=True)
+    protein = Column(Float, nullable=True, index=True)
+    carbs = Column(Float, nullable=True, index=True)
+    fat = Column(Float, nullable=True, index=True)
+    fiber = Column(Float, nullable=True, index=True)
+    protein_density = Column(Float, nullable=True, index=True)  # Grams of protein per 100 kcal
+    main_category = Column(String, nullable=True, index=True)  # Category of the ingredient with the most grams
     created_at = Column(DateTime, default=func.now())
-    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # Delta sync watermark
     
     # Relationships
     creator = relationship("User", back_populates="recipes")
@@ -62,7 +71,7 @@ class RecipeIngredient(Base):
     __tablename__ = "recipe_ingredients"
     
     recipe_id = Column(Integer, ForeignKey("recipes.id"), primary_key=True)
-    ingredient_id = Column(Integer, ForeignKey("ingredients.id"), primary_key=True)
+    ingredient_id = Column(Integer, ForeignKey("ingredients.id"), primary_key=True, index=True)  # PK only covers recipe_id lookups
     quantity = Column(Float)  # Using existing 'quantity' column instead of 'amount'
     unit = Column(String)
     
@@ -72,11 +81,14 @@ class RecipeIngredient(Base):
 
 class MealPlan(Base):
     __tablename__ = "meal_plans"
+    __table_args__ = (Index("ix_meal_plans_user_id_updated_at", "user_id", "updated_at"),)
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Nullable for template meal plans
     is_template = Column(String, default="false")  # Template meal plans available to all users
+    # Denormalized {"totals", "days", "slots"} nutrient sums, rewritten whenever the items change
+    nutrition = Column(JSON(none_as_null=True), nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -88,8 +100,8 @@ class MealPlanItem(Base):
     __tablename__ = "meal_plan_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"))
-    recipe_id = Column(Integer, ForeignKey("recipes.id"))
+    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"), index=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), index=True)
     day_of_week = Column(String)  # Monday, Tuesday, etc.
     meal_type = Column(String)    # breakfast, lunch, dinner
     
@@ -99,14 +111,63 @@ class MealPlanItem(Base):
 
 class WeeklyAssignment(Base):
     __tablename__ = "weekly_assignments"
+    __table_args__ = (
+        # One plan per user and week; target of the upsert in crud.upsert_weekly_assignments
+        UniqueConstraint("user_id", "week_start_date", name="uq_weekly_assignments_user_id_week_start_date"),
+        Index("ix_weekly_assignments_user_id_updated_at", "user_id", "updated_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     week_start_date = Column(Date, index=True)  # Use Date instead of String
-    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"))
-    user_id = Column(Integer, ForeignKey("users.id"))
+    meal_plan_id = Column(Integer, ForeignKey("meal_plans.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))  # Covered by the (user_id, week_start_date) constraint
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     user = relationship("User")
     meal_plan = relationship("MealPlan")
+
+class DailyNutrition(Base):
+    __tablename__ = "daily_nutrition"
+    __table_args__ = (Index("ix_daily_nutrition_meal_plan_id", "meal_plan_id"),)
+
+    # Fact table: one row per user and day of an assigned week, maintained by daily_nutrition.py
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    meal_plan_id = Column(Integer, nullable=True)  # Plan the values came from; no FK, rows are refreshed after the plan is deleted
+    calories = Column(Float, default=0.0)
+    protein = Column(Float, default=0.0)
+    carbs = Column(Float, default=0.0)
+    fat = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class Tombstone(Base):
+    __tablename__ = "tombstones"
+    __table_args__ = (
+        Index("ix_tombstones_entity_type_deleted_at", "entity_type", "deleted_at"),
+        Index("ix_tombstones_user_id_deleted_at", "user_id", "deleted_at"),
+    )
+
+    # Record of a hard-deleted row so delta sync clients can drop it from their caches
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String, nullable=False)  # meal_plan, weekly_assignment, ...
+    entity_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=True)  # Owner, for per-user sync; no FK so it outlives the user
+    deleted_at = Column(DateTime, default=func.now())
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, index=True, nullable=False)  # Name of the registered handler
+    dedupe_key = Column(String, unique=True, nullable=True)  # Held only while pending; cleared when a worker claims the job
+    payload = Column(JSON, default=dict)
+    status = Column(String, default="pending", index=True)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_at = Column(DateTime, index=True)  # UTC; not picked up before this time
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
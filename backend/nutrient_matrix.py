@@ -0,0 +1,140 @@
+"""
+Columnar ingredient nutrient snapshot
+The ingredient catalog is small and rarely written, so each process keeps every
+per-100g nutrient column in one dense float64 array indexed by ingredient id.
+Nutrition for any set of (ingredient_id, grams) lines is then a gather plus a
+dot product instead of attribute access on ORM rows. Snapshots are immutable: a
+rebuild creates a new one with a higher version and swaps the reference, so
+readers holding a snapshot never see a half-built matrix.
+
+Ingredient writes through this process rebuild immediately. Writes from other
+processes are noticed by comparing the ingredient count and max(updated_at),
+checked at most every NUTRIENT_MATRIX_CHECK_SECONDS.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+
+logger = logging.getLogger("nutri_regimen.nutrient_matrix")
+
+COLUMNS = (
+    "calories_per_100g",
+    "protein_per_100g",
+    "carbs_per_100g",
+    "fat_per_100g",
+    "fiber_per_100g",
+    "sugar_per_100g",
+    "sodium_per_100g",
+)
+CHECK_SECONDS = float(os.getenv("NUTRIENT_MATRIX_CHECK_SECONDS", "5"))
+
+
+class NutrientSnapshot:
+    """Read-only (max ingredient id + 1, len(COLUMNS)) array; unknown ids and NULL values read as 0"""
+
+    __slots__ = ("version", "values", "categories", "stamp")
+
+    def __init__(self, version: int, values: np.ndarray, categories: Tuple[Optional[str], ...], stamp: Tuple):
+        self.version = version
+        self.values = values
+        self.categories = categories  # Ingredient category by id
+        self.stamp = stamp  # (ingredient count, max updated_at) the snapshot was built from
+
+    def __len__(self):
+        return len(self.values)
+
+    def gather(self, ingredient_ids, columns: Sequence[str] = COLUMNS) -> np.ndarray:
+        """Per-100g values of `columns` for each id, one row per id"""
+        ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        known = (ingredient_ids >= 0) & (ingredient_ids < len(self.values))
+        rows = self.values[np.where(known, ingredient_ids, 0)][:, [COLUMNS.index(c) for c in columns]]
+        rows[~known] = 0.0
+        return rows
+
+    def category(self, ingredient_id: int) -> Optional[str]:
+        return self.categories[ingredient_id] if 0 <= ingredient_id < len(self.categories) else None
+
+    def totals(self, ingredient_ids, grams, columns: Sequence[str] = COLUMNS) -> np.ndarray:
+        """Summed nutrients of (ingredient_id, grams) lines, one value per column"""
+        return (np.asarray(grams, dtype=np.float64) / 100) @ self.gather(ingredient_ids, columns)
+
+    def grouped_totals(self, groups, n_groups: int, ingredient_ids, grams,
+                       columns: Sequence[str] = COLUMNS) -> np.ndarray:
+        """(n_groups, len(columns)) sums of lines, where `groups` holds each line's group number"""
+        contributions = self.gather(ingredient_ids, columns) * (np.asarray(grams, dtype=np.float64) / 100)[:, None]
+        groups = np.asarray(groups, dtype=np.int64)
+        return np.stack(
+            [np.bincount(groups, weights=contributions[:, j], minlength=n_groups) for j in range(len(columns))],
+            axis=1,
+        )
+
+
+def lines_as_arrays(lines) -> Tuple[np.ndarray, np.ndarray]:
+    """(ingredient_ids, grams) arrays from (ingredient_id, quantity) pairs; NULL quantities count as 0 g"""
+    lines = list(lines)
+    ingredient_ids = np.fromiter((ingredient_id for ingredient_id, _ in lines), dtype=np.int64, count=len(lines))
+    grams = np.fromiter((quantity or 0.0 for _, quantity in lines), dtype=np.float64, count=len(lines))
+    return ingredient_ids, grams
+
+
+class NutrientMatrix:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[NutrientSnapshot] = None
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else 0
+
+    def rebuild(self, db: Session) -> NutrientSnapshot:
+        """Load every ingredient in one query and swap in a new snapshot"""
+        with self._lock:
+            rows = db.execute(select(
+                models.Ingredient.id,
+                models.Ingredient.updated_at,
+                models.Ingredient.category,
+                *[getattr(models.Ingredient, c) for c in COLUMNS],
+            )).all()
+            stamp = (len(rows), max((row.updated_at for row in rows if row.updated_at is not None), default=None))
+            size = max((row.id for row in rows), default=-1) + 1
+            values = np.zeros((size, len(COLUMNS)), dtype=np.float64)
+            categories = [None] * size
+            if rows:
+                # float dtype turns NULL columns into NaN; missing values count as 0
+                data = np.array([row[3:] for row in rows], dtype=np.float64)
+                values[[row.id for row in rows]] = np.nan_to_num(data, nan=0.0)
+                for row in rows:
+                    categories[row.id] = row.category
+            values.setflags(write=False)
+
+            snapshot = NutrientSnapshot(self.version + 1, values, tuple(categories), stamp)
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+        logger.info("Nutrient matrix v%s built with %s ingredients", snapshot.version, len(rows))
+        return snapshot
+
+    def current(self, db: Session, max_age: float = CHECK_SECONDS) -> NutrientSnapshot:
+        """The latest snapshot, rebuilt first if the catalog changed since it was built"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.rebuild(db)
+        if time.monotonic() - self._checked_at >= max_age:
+            self._checked_at = time.monotonic()
+            stamp = tuple(db.execute(select(func.count(models.Ingredient.id), func.max(models.Ingredient.updated_at))).one())
+            if stamp != snapshot.stamp:
+                return self.rebuild(db)
+        return snapshot
+
+
+nutrient_matrix = NutrientMatrix()
@@ -0,0 +1,211 @@
+"""
+Nutrition calculations shared by the API endpoints
+Mirrors the frontend formula: each recipe ingredient contributes
+quantity / 100 * <nutrient>_per_100g. Per-100g values come from the
+in-memory nutrient matrix, so totals are vectorized over (ingredient_id, grams)
+arrays rather than read from Ingredient rows.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import jobs
+import models
+from nutrient_matrix import NutrientSnapshot, lines_as_arrays, nutrient_matrix
+
+# Nutrient key -> Ingredient column holding its per-100g value
+NUTRIENT_COLUMNS = {
+    "calories": "calories_per_100g",
+    "protein": "protein_per_100g",
+    "carbs": "carbs_per_100g",
+    "fat": "fat_per_100g",
+}
+
+
+# MealPlanItem.day_of_week values, in order from an assignment's week_start_date
+WEEK_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# Recipe column -> Ingredient column for the precomputed per-serving recipe nutrition
+RECIPE_NUTRIENT_COLUMNS = dict(NUTRIENT_COLUMNS, fiber="fiber_per_100g")
+
+
+def empty_totals() -> Dict[str, float]:
+    return {nutrient: 0.0 for nutrient in NUTRIENT_COLUMNS}
+
+
+def recipes_totals(db: Session, recipes: Iterable[models.Recipe]) -> Dict[int, Dict[str, float]]:
+    """Nutrient totals for one serving of each recipe (ingredient associations must be loaded)"""
+    recipes = list(recipes)
+    groups, lines = [], []
+    for group, recipe in enumerate(recipes):
+        for association in recipe.ingredient_associations:
+            groups.append(group)
+            lines.append((association.ingredient_id, association.quantity))
+    ingredient_ids, grams = lines_as_arrays(lines)
+    sums = nutrient_matrix.current(db).grouped_totals(groups, len(recipes), ingredient_ids, grams, NUTRIENT_COLUMNS.values())
+    return {
+        recipe.id: dict(zip(NUTRIENT_COLUMNS, sums[group].tolist()))
+        for group, recipe in enumerate(recipes)
+    }
+
+
+def recipe_nutrition_values(snapshot: NutrientSnapshot, lines) -> dict:
+    """Values for the Recipe nutrition columns from its (ingredient_id, quantity) lines"""
+    ingredient_ids, grams = lines_as_arrays(lines)
+    sums = snapshot.totals(ingredient_ids, grams, RECIPE_NUTRIENT_COLUMNS.values()).tolist()
+    values = {nutrient: round(value, 1) for nutrient, value in zip(RECIPE_NUTRIENT_COLUMNS, sums)}
+    calories = values["calories"]
+    values["protein_density"] = round(values["protein"] * 100 / calories, 2) if calories else None
+    values["main_category"] = snapshot.category(int(ingredient_ids[grams.argmax()])) if len(grams) else None
+    return values
+
+
+def add_totals(target: Dict[str, float], source: Dict[str, float]):
+    for nutrient, value in source.items():
+        target[nutrient] += value
+
+
+def summarize_assignments(
+    assignments: Iterable[models.WeeklyAssignment],
+    meal_plans_by_id: Dict[int, models.MealPlan],
+    recipe_totals_by_id: Dict[int, Dict[str, float]],
+) -> dict:
+    """Totals, daily averages and distinct recipes across a set of assigned weeks"""
+    totals = empty_totals()
+    recipe_ids = set()
+    assigned_weeks = 0
+    for assignment in assignments:
+        meal_plan = meal_plans_by_id.get(assignment.meal_plan_id)
+        if meal_plan is None:
+            continue
+        assigned_weeks += 1
+        for item in meal_plan.meal_plan_items:
+            recipe_ids.add(item.recipe_id)
+            if item.recipe_id in recipe_totals_by_id:
+                add_totals(totals, recipe_totals_by_id[item.recipe_id])
+
+    days = assigned_weeks * 7
+    return {
+        "assigned_weeks": assigned_weeks,
+        "unique_recipes": len(recipe_ids),
+        "totals": {nutrient: round(value) for nutrient, value in totals.items()},
+        "daily_averages": {nutrient: round(value / days) if days else 0 for nutrient, value in totals.items()},
+    }
+
+
+def meal_plan_nutrition(db: Session, meal_plan_id: int) -> dict:
+    """
+    Per-slot, per-day and whole-plan totals for a meal plan: one query for its items'
+    (ingredient_id, quantity) lines, summed per slot against the nutrient matrix
+    (pending items must be flushed).
+    """
+    rows = db.query(
+        models.MealPlanItem.day_of_week,
+        models.MealPlanItem.meal_type,
+        models.RecipeIngredient.ingredient_id,
+        models.RecipeIngredient.quantity,
+    ).join(
+        models.RecipeIngredient, models.RecipeIngredient.recipe_id == models.MealPlanItem.recipe_id
+    ).filter(
+        models.MealPlanItem.meal_plan_id == meal_plan_id
+    ).all()
+    return slot_lines_nutrition(nutrient_matrix.current(db), rows)
+
+
+def slot_lines_nutrition(snapshot: NutrientSnapshot, rows) -> dict:
+    """Stored meal plan nutrition from its (day_of_week, meal_type, ingredient_id, quantity) lines"""
+    rows = list(rows)
+    slot_keys = sorted({(day_of_week, meal_type) for day_of_week, meal_type, _, _ in rows})
+    group_of = {key: group for group, key in enumerate(slot_keys)}
+    ingredient_ids, grams = lines_as_arrays((ingredient_id, quantity) for _, _, ingredient_id, quantity in rows)
+    sums = snapshot.grouped_totals(
+        [group_of[(day_of_week, meal_type)] for day_of_week, meal_type, _, _ in rows], len(slot_keys),
+        ingredient_ids, grams, NUTRIENT_COLUMNS.values(),
+    )
+
+    totals, days, slots = empty_totals(), {}, {}
+    for (day_of_week, meal_type), values in zip(slot_keys, sums.tolist()):
+        slot_totals = dict(zip(NUTRIENT_COLUMNS, values))
+        slots[f"{day_of_week}:{meal_type}"] = _rounded(slot_totals)
+        add_totals(days.setdefault(day_of_week, empty_totals()), slot_totals)
+        add_totals(totals, slot_totals)
+    return {
+        "totals": _rounded(totals),
+        "days": {day: _rounded(day_totals) for day, day_totals in days.items()},
+        "slots": slots,
+    }
+
+
+def _rounded(totals: Dict[str, float]) -> Dict[str, float]:
+    return {nutrient: round(value, 1) for nutrient, value in totals.items()}
+
+
+def refresh_meal_plan_nutrition(db: Session, meal_plan_ids: Iterable[int]):
+    """Recompute stored totals for the given plans (caller commits)"""
+    for meal_plan_id in meal_plan_ids:
+        db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).update(
+            {"nutrition": meal_plan_nutrition(db, meal_plan_id)}, synchronize_session=False
+        )
+
+
+def meal_plans_using_ingredient(db: Session, ingredient_id: int) -> List[int]:
+    return [row.meal_plan_id for row in db.query(models.MealPlanItem.meal_plan_id).join(
+        models.RecipeIngredient, models.RecipeIngredient.recipe_id == models.MealPlanItem.recipe_id
+    ).filter(models.RecipeIngredient.ingredient_id == ingredient_id).distinct()]
+
+
+@jobs.job_handler("recompute_meal_plan_nutrition")
+def recompute_meal_plan_nutrition(db: Session, payload: dict):
+    """
+    Refresh stored plan totals after an ingredient edit (payload['ingredient_id']),
+    or backfill every plan without totals when no ingredient is given.
+    """
+    # The edit may have come through another process: pick it up before recomputing
+    nutrient_matrix.current(db, max_age=0)
+    ingredient_id: Optional[int] = payload.get("ingredient_id")
+    if ingredient_id is not None:
+        meal_plan_ids = meal_plans_using_ingredient(db, ingredient_id)
+    else:
+        meal_plan_ids = [row.id for row in db.query(models.MealPlan.id).filter(models.MealPlan.nutrition.is_(None))]
+    for start in range(0, len(meal_plan_ids), 500):
+        refresh_meal_plan_nutrition(db, meal_plan_ids[start:start + 500])
+        db.commit()
+    if ingredient_id is not None and meal_plan_ids:
+        # Daily history copies the plan totals just rewritten
+        jobs.enqueue(db, "refresh_daily_nutrition", {"meal_plan_ids": meal_plan_ids},
+                     key=f"refresh_daily_nutrition:ingredient:{ingredient_id}")
+
+
+def refresh_recipe_nutrition(db: Session, recipe_ids: List[int]):
+    """Recompute the stored nutrition columns of the given recipes (caller commits)"""
+    snapshot = nutrient_matrix.current(db)
+    lines = defaultdict(list)
+    for row in db.query(
+        models.RecipeIngredient.recipe_id, models.RecipeIngredient.ingredient_id, models.RecipeIngredient.quantity
+    ).filter(models.RecipeIngredient.recipe_id.in_(recipe_ids)):
+        lines[row.recipe_id].append((row.ingredient_id, row.quantity))
+    db.execute(update(models.Recipe), [
+        {"id": recipe_id, **recipe_nutrition_values(snapshot, lines[recipe_id])} for recipe_id in recipe_ids
+    ])
+
+
+@jobs.job_handler("recompute_recipe_nutrition")
+def recompute_recipe_nutrition(db: Session, payload: dict):
+    """
+    Refresh stored recipe nutrition after an ingredient edit (payload['ingredient_id']),
+    or backfill every recipe without it when no ingredient is given.
+    """
+    nutrient_matrix.current(db, max_age=0)
+    ingredient_id: Optional[int] = payload.get("ingredient_id")
+    if ingredient_id is not None:
+        recipe_ids = [row.recipe_id for row in db.query(models.RecipeIngredient.recipe_id).filter(
+            models.RecipeIngredient.ingredient_id == ingredient_id
+        )]
+    else:
+        recipe_ids = [row.id for row in db.query(models.Recipe.id).filter(models.Recipe.calories.is_(None))]
+    for start in range(0, len(recipe_ids), 1000):
+        refresh_recipe_nutrition(db, recipe_ids[start:start + 1000])
+        db.commit()
@@ -0,0 +1,274 @@
+"""
+In-memory recipe similarity index
+Each recipe is a sparse, L2-normalized ingredient-weight vector (grams per
+ingredient) plus a normalized macro profile (protein, carbs, fat, fiber). Ingredient
+vectors are stored as per-ingredient posting arrays, so a query only touches recipes
+sharing an ingredient with it; the macro part is one dense matrix-vector product.
+Profiles are gathered from the nutrient matrix snapshot, and the index is rebuilt
+when that snapshot's version moves on. Recipes are added incrementally on writes;
+replaced rows are tombstoned and the arrays are compacted once enough of them pile up.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from nutrient_matrix import NutrientSnapshot, lines_as_arrays, nutrient_matrix
+
+logger = logging.getLogger("nutri_regimen.recipe_index")
+
+PROFILE_COLUMNS = ("protein_per_100g", "carbs_per_100g", "fat_per_100g", "fiber_per_100g")
+# Weight of ingredient overlap vs. macro profile in the combined score
+INGREDIENT_WEIGHT = float(os.getenv("RECIPE_SIMILARITY_INGREDIENT_WEIGHT", "0.6"))
+# Other API processes write recipes too; rebuild in the background when the index is this old
+REFRESH_SECONDS = float(os.getenv("RECIPE_INDEX_REFRESH_SECONDS", "600"))
+COMPACT_DEAD_FRACTION = 0.3
+
+# (ingredient_id, grams)
+IngredientLine = Tuple[int, float]
+
+
+class _Postings:
+    """Growable (row, weight) arrays for one ingredient"""
+
+    __slots__ = ("rows", "weights", "size")
+
+    def __init__(self, capacity: int = 8):
+        self.rows = np.empty(capacity, dtype=np.int32)
+        self.weights = np.empty(capacity, dtype=np.float32)
+        self.size = 0
+
+    def append(self, row: int, weight: float):
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, self.size * 2)
+            self.weights = np.resize(self.weights, self.size * 2)
+        self.rows[self.size] = row
+        self.weights[self.size] = weight
+        self.size += 1
+
+
+class RecipeIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._refreshing = False
+        self._reset(capacity=1024)
+        self.built_at: Optional[float] = None
+        self.matrix_version = 0  # Nutrient matrix version the profiles were computed from
+
+    def _reset(self, capacity: int):
+        self.recipe_ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.ingredient_counts = np.zeros(capacity, dtype=np.int32)  # Distinct ingredients per row
+        self.profiles = np.zeros((capacity, len(PROFILE_COLUMNS)), dtype=np.float32)
+        self.vectors: List[Tuple[np.ndarray, np.ndarray]] = []  # row -> (ingredient ids, weights)
+        self.postings: Dict[int, _Postings] = {}
+        self.row_of: Dict[int, int] = {}
+        self.size = 0
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.row_of)
+
+    # Building and updates
+
+    def _append(self, recipe_id: int, lines: Iterable[IngredientLine], snapshot: NutrientSnapshot):
+        line_ids, grams = lines_as_arrays(lines)
+        profile = snapshot.totals(line_ids, grams, PROFILE_COLUMNS).astype(np.float32)
+        # The same ingredient may be listed twice; merge it into one vector entry
+        ingredient_ids, positions = np.unique(line_ids, return_inverse=True)
+        weights = np.bincount(positions, weights=grams, minlength=len(ingredient_ids)).astype(np.float32)
+        norm = np.linalg.norm(weights)
+        if norm:
+            weights /= norm
+        profile_norm = np.linalg.norm(profile)
+        if profile_norm:
+            profile /= profile_norm
+
+        if recipe_id in self.row_of:
+            self.alive[self.row_of[recipe_id]] = False
+            self.dead += 1
+        if self.size == len(self.recipe_ids):
+            capacity = self.size * 2
+            self.recipe_ids = np.resize(self.recipe_ids, capacity)
+            self.alive = np.concatenate([self.alive, np.zeros(capacity - self.size, dtype=bool)])
+            self.ingredient_counts = np.resize(self.ingredient_counts, capacity)
+            self.profiles = np.concatenate([self.profiles, np.zeros_like(self.profiles)])
+
+        row = self.size
+        self.recipe_ids[row] = recipe_id
+        self.alive[row] = True
+        self.ingredient_counts[row] = len(ingredient_ids)
+        self.profiles[row] = profile
+        self.vectors.append((ingredient_ids, weights))
+        for ingredient_id, weight in zip(ingredient_ids.tolist(), weights.tolist()):
+            postings = self.postings.get(ingredient_id)
+            if postings is None:
+                postings = self.postings[ingredient_id] = _Postings()
+            postings.append(row, weight)
+        self.row_of[recipe_id] = row
+        self.size += 1
+
+    def upsert(self, recipe_id: int, lines: Iterable[IngredientLine], snapshot: NutrientSnapshot):
+        with self._lock:
+            self._append(recipe_id, lines, snapshot)
+            if self.dead > COMPACT_DEAD_FRACTION * max(self.size, 1):
+                self._compact()
+
+    def upsert_recipe(self, db: Session, recipe: models.Recipe):
+        """Index (or re-index) an ORM recipe after it was written"""
+        self.upsert(recipe.id, [(a.ingredient_id, a.quantity) for a in recipe.ingredient_associations],
+                    nutrient_matrix.current(db))
+
+    def remove(self, recipe_id: int):
+        with self._lock:
+            row = self.row_of.pop(recipe_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.dead += 1
+
+    def _compact(self):
+        live = [(int(self.recipe_ids[row]), self.vectors[row], self.profiles[row].copy())
+                for row in range(self.size) if self.alive[row]]
+        self._reset(capacity=max(1024, len(live) * 2))
+        for recipe_id, (ingredient_ids, weights), profile in live:
+            row = self.size
+            self.recipe_ids[row] = recipe_id
+            self.alive[row] = True
+            self.ingredient_counts[row] = len(ingredient_ids)
+            self.profiles[row] = profile
+            self.vectors.append((ingredient_ids, weights))
+            for ingredient_id, weight in zip(ingredient_ids.tolist(), weights.tolist()):
+                self.postings.setdefault(ingredient_id, _Postings()).append(row, weight)
+            self.row_of[recipe_id] = row
+            self.size += 1
+
+    def build(self, db: Session):
+        """Rebuild from recipe_ingredients in one query, then swap in atomically"""
+        snapshot = nutrient_matrix.current(db)
+        rows = db.execute(
+            select(
+                models.RecipeIngredient.recipe_id,
+                models.RecipeIngredient.ingredient_id,
+                models.RecipeIngredient.quantity,
+            ).order_by(models.RecipeIngredient.recipe_id)
+        ).all()
+
+        fresh = RecipeIndex()
+        current_id, lines = None, []
+        for recipe_id, ingredient_id, quantity in rows:
+            if recipe_id != current_id and lines:
+                fresh._append(current_id, lines, snapshot)
+                lines = []
+            current_id = recipe_id
+            lines.append((ingredient_id, quantity))
+        if lines:
+            fresh._append(current_id, lines, snapshot)
+
+        with self._lock:
+            self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ("_lock", "_refreshing")})
+            self.built_at = time.monotonic()
+            self.matrix_version = snapshot.version
+        logger.info("Recipe index built with %s recipes", len(self))
+
+    def ensure_fresh(self, session_factory):
+        """Build synchronously on first use; afterwards refresh stale indexes in the background"""
+        if self.built_at is None:
+            with self._lock:
+                if self.built_at is None:
+                    with session_factory() as db:
+                        self.build(db)
+            return
+        stale = time.monotonic() - self.built_at >= REFRESH_SECONDS or self.matrix_version != nutrient_matrix.version
+        if not stale or self._refreshing:
+            return
+        self._refreshing = True
+
+        def refresh():
+            try:
+                with session_factory() as db:
+                    self.build(db)
+            except Exception:
+                logger.exception("Recipe index refresh failed")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=refresh, name="recipe-index-refresh", daemon=True).start()
+
+    # Queries
+
+    def similar(self, recipe_id: int, k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Top-k (recipe_id, score) by combined ingredient and macro-profile cosine similarity"""
+        with self._lock:
+            row = self.row_of.get(recipe_id)
+            if row is None:
+                return []
+            n = self.size
+            ingredient_scores = np.zeros(n, dtype=np.float32)
+            ingredient_ids, weights = self.vectors[row]
+            for ingredient_id, weight in zip(ingredient_ids.tolist(), weights.tolist()):
+                postings = self.postings[ingredient_id]
+                # Rows are unique within one posting list, so fancy-index += is exact
+                ingredient_scores[postings.rows[:postings.size]] += weight * postings.weights[:postings.size]
+            profile_scores = self.profiles[:n] @ self.profiles[row]
+
+            scores = INGREDIENT_WEIGHT * ingredient_scores + (1 - INGREDIENT_WEIGHT) * profile_scores
+            scores[~self.alive[:n]] = -np.inf
+            scores[row] = -np.inf
+            for excluded_id in exclude:
+                excluded_row = self.row_of.get(excluded_id)
+                if excluded_row is not None:
+                    scores[excluded_row] = -np.inf
+
+            k = min(k, n)
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self.recipe_ids[i]), float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def match(self, ingredient_ids: Iterable[int], k: int = 20,
+              max_missing: Optional[int] = None) -> List[Tuple[int, int, int, List[int]]]:
+        """
+        Recipes needing the fewest ingredients beyond a pantry, as (recipe_id, matched, total,
+        missing ingredient ids). Ties go to the better-covered recipe, then the lower id.
+        """
+        pantry = set(ingredient_ids)
+        with self._lock:
+            n = self.size
+            # Each posting list is the set of rows using that ingredient; counting the
+            # concatenated lists gives every recipe's overlap with the pantry at once
+            lists = [postings.rows[:postings.size] for ingredient_id in pantry
+                     if (postings := self.postings.get(ingredient_id)) is not None]
+            if not lists or k <= 0:
+                return []
+            matched = np.bincount(np.concatenate(lists), minlength=n)[:n]
+            totals = self.ingredient_counts[:n]
+            missing = totals - matched
+            candidates = np.flatnonzero((matched > 0) & self.alive[:n])
+            if max_missing is not None:
+                candidates = candidates[missing[candidates] <= max_missing]
+            if not len(candidates):
+                return []
+
+            # Coverage is in (0, 1], so this orders by missing count, then by coverage
+            keys = missing[candidates] - matched[candidates] / totals[candidates] / 2
+            if len(candidates) > k:
+                # Keep everything tied with the k-th key so the id tie-break below is exact
+                cutoff = np.partition(keys, k - 1)[k - 1]
+                candidates, keys = candidates[keys <= cutoff], keys[keys <= cutoff]
+            top = candidates[np.lexsort((self.recipe_ids[candidates], keys))][:k]
+            return [
+                (int(self.recipe_ids[row]), int(matched[row]), int(totals[row]),
+                 [i for i in self.vectors[row][0].tolist() if i not in pantry])
+                for row in top
+            ]
+
+
+recipe_index = RecipeIndex()
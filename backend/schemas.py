@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime, date
 
 # User schemas
@@ -27,6 +27,10 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class CalendarFeed(BaseModel):
+    token: str
+    path: str  # Relative URL of the .ics feed; anyone holding it can read the user's plan
+
 # Ingredient schemas
 class IngredientBase(BaseModel):
     name: str
@@ -93,7 +97,32 @@ class RecipeUpdate(BaseModel):
     is_public: Optional[str] = None
     ingredients: Optional[List[RecipeIngredientCreate]] = None
 
-class Recipe(RecipeBase):
+class RecipeNutrition(BaseModel):
+    # Per serving, precomputed from the ingredients; null until computed
+    calories: Optional[float] = None
+    protein: Optional[float] = None
+    carbs: Optional[float] = None
+    fat: Optional[float] = None
+    fiber: Optional[float] = None
+    protein_density: Optional[float] = None  # Grams of protein per 100 kcal
+    main_category: Optional[str] = None
+
+class RecipeFilter(BaseModel):
+    min_calories: Optional[float] = None
+    max_calories: Optional[float] = None
+    min_protein: Optional[float] = None
+    max_protein: Optional[float] = None
+    min_carbs: Optional[float] = None
+    max_carbs: Optional[float] = None
+    min_fat: Optional[float] = None
+    max_fat: Optional[float] = None
+    min_fiber: Optional[float] = None
+    max_fiber: Optional[float] = None
+    category: Optional[str] = None  # Category of the main ingredient
+    user_id: Optional[int] = None
+    is_public: Optional[bool] = None
+
+class Recipe(RecipeBase, RecipeNutrition):
     id: int
     user_id: Optional[int] = None  # Nullable for public recipes
     created_at: Optional[datetime] = None
@@ -120,6 +149,18 @@ class MealPlanItem(MealPlanItemBase):
     class Config:
         from_attributes = True
 
+# Nutrition schemas
+class NutritionValues(BaseModel):
+    calories: float = 0
+    protein: float = 0
+    carbs: float = 0
+    fat: float = 0
+
+class MealPlanNutrition(BaseModel):
+    totals: NutritionValues
+    days: Dict[str, NutritionValues] = {}   # "Monday" -> totals
+    slots: Dict[str, NutritionValues] = {}  # "Monday:dinner" -> totals
+
 # Meal Plan schemas
 class MealPlanBase(BaseModel):
     name: str
@@ -137,11 +178,26 @@ class MealPlan(MealPlanBase):
     user_id: Optional[int] = None  # Nullable for template meal plans
     created_at: datetime
     updated_at: datetime
+    nutrition: Optional[MealPlanNutrition] = None
     meal_plan_items: List[MealPlanItem] = []
     
     class Config:
         from_attributes = True
 
+class MealPlanCloneToUsers(BaseModel):
+    user_ids: List[int]
+    name: Optional[str] = None  # Defaults to the source plan's name
+
+class MealPlanCloneTarget(BaseModel):
+    user_id: int
+    meal_plan_id: int
+
+class MealPlanCloneResult(BaseModel):
+    source_id: int
+    items_per_plan: int
+    clones: List[MealPlanCloneTarget]
+    missing_users: List[int] = []
+
 # Weekly Assignment schemas
 class WeeklyAssignmentBase(BaseModel):
     week_start_date: date  # Use date type instead of string
@@ -150,6 +206,12 @@ class WeeklyAssignmentBase(BaseModel):
 class WeeklyAssignmentCreate(WeeklyAssignmentBase):
     user_id: Optional[int] = None
 
+class WeeklyAssignmentBulkCreate(BaseModel):
+    meal_plan_ids: List[int]  # Rotated week by week: week i gets meal_plan_ids[i % len(meal_plan_ids)]
+    week_start_dates: Optional[List[date]] = None  # Explicit weeks...
+    from_date: Optional[date] = None  # ...or every 7 days from this week start
+    to_date: Optional[date] = None    # through this date (inclusive)
+
 class WeeklyAssignment(WeeklyAssignmentBase):
     id: int
     user_id: int
@@ -160,6 +222,141 @@ class WeeklyAssignment(WeeklyAssignmentBase):
     class Config:
         from_attributes = True
 
+# Batch fetch schemas
+class IngredientBatch(BaseModel):
+    items: List[Ingredient]
+    missing: List[int] = []
+
+class RecipeBatch(BaseModel):
+    items: List[Recipe]
+    missing: List[int] = []
+
+class SimilarRecipe(BaseModel):
+    score: float  # Combined ingredient-overlap and macro-profile cosine similarity, 0..1
+    recipe: Recipe
+
+class PantryMatch(BaseModel):
+    ingredient_ids: List[int]  # What the user has
+    limit: int = 20
+    max_missing: Optional[int] = None  # Drop recipes needing more than this many other ingredients
+
+class RecipeMatch(BaseModel):
+    matched: int  # Recipe ingredients found in the pantry
+    missing: int
+    coverage: float  # matched / ingredients in the recipe
+    missing_ingredient_ids: List[int]
+    recipe: Recipe
+
+class MealPlanBatch(BaseModel):
+    items: List[MealPlan]
+    missing: List[int] = []
+    forbidden: List[int] = []  # Exist but belong to another user and are not templates
+
+# Bootstrap schemas: plans and assignments reference recipes by id instead of embedding them
+class MealPlanItemSummary(MealPlanItemBase):
+    id: int
+    meal_plan_id: int
+
+    class Config:
+        from_attributes = True
+
+class MealPlanSummary(MealPlanBase):
+    id: int
+    user_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    nutrition: Optional[MealPlanNutrition] = None
+    meal_plan_items: List[MealPlanItemSummary] = []
+
+    class Config:
+        from_attributes = True
+
+class WeeklyAssignmentSummary(WeeklyAssignmentBase):
+    id: int
+    user_id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class BootstrapStats(BaseModel):
+    assigned_weeks: int
+    unique_recipes: int
+    totals: NutritionValues
+    daily_averages: NutritionValues
+
+class UserBootstrap(BaseModel):
+    from_date: date
+    to_date: date
+    meal_plans: List[MealPlanSummary]
+    weekly_assignments: List[WeeklyAssignmentSummary]
+    recipes: List[Recipe]
+    stats: BootstrapStats
+
+class NutritionHistoryBucket(BaseModel):
+    start: date  # Monday of the week, or first of the month
+    days: int  # Days in the bucket covered by an assigned plan
+    totals: NutritionValues
+    daily_averages: NutritionValues  # Totals / days
+
+class NutritionHistory(BaseModel):
+    from_date: date
+    to_date: date
+    bucket: str
+    buckets: List[NutritionHistoryBucket]  # Buckets without any assigned day are omitted
+
+# Normalized schemas (?format=normalized): every entity once, keyed by id; items reference ids
+class RecipeIngredientSummary(RecipeIngredientBase):
+    class Config:
+        from_attributes = True
+
+class RecipeSummary(RecipeBase, RecipeNutrition):
+    id: int
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    ingredient_associations: List[RecipeIngredientSummary] = []
+
+    class Config:
+        from_attributes = True
+
+class NormalizedMealPlans(BaseModel):
+    result: List[int]  # Meal plan ids in response order
+    meal_plans: Dict[int, MealPlanSummary]
+    recipes: Dict[int, RecipeSummary]
+    ingredients: Dict[int, Ingredient]
+
+class NormalizedWeeklyAssignments(BaseModel):
+    result: List[int]  # Weekly assignment ids in response order
+    weekly_assignments: Dict[int, WeeklyAssignmentSummary]
+    meal_plans: Dict[int, MealPlanSummary]
+    recipes: Dict[int, RecipeSummary]
+    ingredients: Dict[int, Ingredient]
+
+# Delta sync schemas: pass `watermark` back as ?since= on the next sync
+class IngredientChanges(BaseModel):
+    items: List[Ingredient]
+    deleted: List[int] = []
+    watermark: str
+    has_more: bool = False  # Page was cut at `limit`; call again with the new watermark
+    reset: bool = False  # `since` was older than tombstone retention: drop the cache, this is a full sync
+
+class RecipeChanges(BaseModel):
+    items: List[RecipeSummary]  # Ingredients by id; sync them via /ingredients/changes
+    deleted: List[int] = []
+    watermark: str
+    has_more: bool = False
+    reset: bool = False
+
+class UserChanges(BaseModel):
+    meal_plans: List[MealPlanSummary]
+    weekly_assignments: List[WeeklyAssignmentSummary]
+    deleted_meal_plans: List[int] = []
+    deleted_weekly_assignments: List[int] = []
+    watermark: str
+    reset: bool = False
+
 # Extended User schema with meal plans
 class UserWithMealPlans(User):
     meal_plans: List[MealPlan] = []
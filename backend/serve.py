@@ -0,0 +1,271 @@
+"""
+Production entry point: a prefork master running N uvicorn workers
+The app is imported once in the master, before forking, so workers start fast
+and share its memory pages. Each worker then builds its own database engine and
+pool, sized so that all workers together stay within DB_CONNECTION_BUDGET, and
+serves requests from a listening socket shared by all workers. Pools are sized
+for --max-workers, so adding workers with SIGTTIN never takes the total past
+the budget. Admission concurrency limits and queues are split across --workers;
+each worker added with SIGTTIN admits one more share. Per-client rate limits and
+read-your-writes state are not split: see the README.
+
+Signals sent to the master:
+    SIGTERM / SIGINT   graceful shutdown: workers finish in-flight requests first
+    SIGHUP             rolling restart: each worker is replaced one at a time
+    SIGTTIN / SIGTTOU  add (up to --max-workers) / remove a worker
+
+Usage:
+    python serve.py --workers 4 --port 8000
+    DB_CONNECTION_BUDGET=40 python serve.py --workers 4 --max-workers 8
+
+Code changes need a full restart; SIGHUP re-forks from the already loaded app.
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import shutil
+import tempfile
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import uvicorn
+
+# Total connections all workers may hold to the primary (and to each replica); unset keeps SQLAlchemy defaults
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0")) or None
+# Fraction of a worker's share kept open in the pool; the rest is overflow
+POOL_STEADY_FRACTION = 0.75
+RESTART_DELAY_SECONDS = 1.0
+MIN_RESPAWN_INTERVAL_SECONDS = 1.0
+
+
+def pool_settings(budget, workers: int):
+    """
+    Split a connection budget across workers as (pool_size, max_overflow). One extra
+    share is held back because a rolling restart briefly runs old and new worker together.
+    """
+    if not budget:
+        return None, None
+    per_worker = max(2, budget // (workers + 1))
+    pool_size = max(1, round(per_worker * POOL_STEADY_FRACTION))
+    return pool_size, per_worker - pool_size
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    def __init__(self, app, sock: socket.socket, args):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.target_workers = args.workers
+        self.workers = {}  # pid -> worker slot
+        self.retiring = set()  # pids replaced by a rolling restart
+        self.last_spawn = {}  # slot -> monotonic time
+        self.pending_signals = []
+        self.stopping = False
+
+    # Worker side
+
+    def run_worker(self, slot: int):
+        # Drop the master's handlers; uvicorn installs its own SIGTERM/SIGINT handling
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+
+        import admission
+        import database
+        import logs
+        import metrics
+
+        # Every worker gets the same share whatever the current worker count
+        pool_size, max_overflow = pool_settings(DB_CONNECTION_BUDGET, self.args.max_workers)
+        database.configure(pool_size=pool_size, max_overflow=max_overflow)
+        # Admission limits describe the whole server; each worker admits its share of them
+        admission.configure(self.args.workers)
+        metrics.start_worker_metrics(str(slot))
+
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            log_level=self.args.log_level,
+            proxy_headers=self.args.proxy_headers,
+            forwarded_allow_ips=self.args.forwarded_allow_ips,
+            timeout_keep_alive=self.args.keep_alive,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            limit_max_requests=self.args.max_requests or None,
+        )
+        try:
+            uvicorn.Server(config).run(sockets=[self.sock])
+        finally:
+            logs.stop_logging()  # Workers leave through os._exit, which skips atexit
+
+    # Master side
+
+    def spawn(self, slot: int):
+        # Crash-looping workers are respawned at most once per interval
+        wait = MIN_RESPAWN_INTERVAL_SECONDS - (time.monotonic() - self.last_spawn.get(slot, 0))
+        if wait > 0:
+            time.sleep(wait)
+        self.last_spawn[slot] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                self.run_worker(slot)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        self.workers[pid] = slot
+        print(f"🚀 Worker {slot} started (pid {pid})", flush=True)
+
+    def free_slots(self):
+        used = {slot for pid, slot in self.workers.items() if pid not in self.retiring}
+        return [slot for slot in range(self.target_workers) if slot not in used]
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is None:
+                continue
+            if slot >= self.target_workers:
+                # Removed slot: drop its published metrics
+                try:
+                    os.remove(os.path.join(os.environ["METRICS_MULTIPROCESS_DIR"], f"worker-{slot}.prom"))
+                except OSError:
+                    pass
+            elif pid not in self.retiring and not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                print(f"⚠️  Worker {slot} (pid {pid}) exited with {code}", flush=True)
+            self.retiring.discard(pid)
+
+    def rolling_restart(self):
+        print("🔄 Rolling restart", flush=True)
+        for pid, slot in list(self.workers.items()):
+            if pid in self.retiring:
+                continue
+            # Start the replacement first so the slot never goes unserved
+            self.retiring.add(pid)
+            self.spawn(slot)
+            time.sleep(RESTART_DELAY_SECONDS)
+            self.kill(pid, signal.SIGTERM)
+
+    def kill(self, pid: int, sig: int):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def shutdown(self):
+        self.stopping = True
+        print("🛑 Shutting down workers...", flush=True)
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            self.kill(pid, signal.SIGKILL)
+        self.reap()
+
+    def handle_signal(self, sig, frame):
+        self.pending_signals.append(sig)
+
+    def run(self):
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGCHLD):
+            signal.signal(sig, self.handle_signal)
+        print(f"✅ Master {os.getpid()} listening on {self.args.host}:{self.args.port} with {self.target_workers} worker(s)", flush=True)
+
+        while True:
+            self.reap()
+            while self.pending_signals:
+                sig = self.pending_signals.pop(0)
+                if sig in (signal.SIGTERM, signal.SIGINT):
+                    self.shutdown()
+                    return
+                if sig == signal.SIGHUP:
+                    self.rolling_restart()
+                elif sig == signal.SIGTTIN:
+                    if self.target_workers < self.args.max_workers:
+                        self.target_workers += 1
+                    else:
+                        print(f"⚠️  Already at --max-workers ({self.args.max_workers}); pools are sized for it", flush=True)
+                elif sig == signal.SIGTTOU and self.target_workers > 1:
+                    self.target_workers -= 1
+                    surplus = [pid for pid, slot in self.workers.items() if slot >= self.target_workers]
+                    for pid in surplus:
+                        self.retiring.add(pid)
+                        self.kill(pid, signal.SIGTERM)
+            for slot in self.free_slots():
+                self.spawn(slot)
+            try:
+                time.sleep(0.5)
+            except InterruptedError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Nutri-Regimen API with N prefork workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("MAX_WORKERS", "0")),
+                        help="Most workers SIGTTIN may reach; DB_CONNECTION_BUDGET is split for this many (default --workers)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="Seconds workers get to finish in-flight requests")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--max-requests", type=int, default=0, help="Recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--proxy-headers", action="store_true")
+    parser.add_argument("--forwarded-allow-ips", default="127.0.0.1")
+    args = parser.parse_args()
+    args.max_workers = max(args.max_workers, args.workers)
+
+    # Workers publish their metrics here so /metrics on any worker covers all of them
+    metrics_dir = None
+    if not os.getenv("METRICS_MULTIPROCESS_DIR"):
+        metrics_dir = os.environ["METRICS_MULTIPROCESS_DIR"] = tempfile.mkdtemp(prefix="nutri-metrics-")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+
+    # Preload: import the app (and create tables) once, before forking
+    import main as api
+    import database
+    database.engine.dispose()
+
+    pool_size, max_overflow = pool_settings(DB_CONNECTION_BUDGET, args.max_workers)
+    if pool_size:
+        print(f"📦 DB_CONNECTION_BUDGET={DB_CONNECTION_BUDGET}: pool_size={pool_size}, max_overflow={max_overflow} per worker "
+              f"(sized for {args.max_workers} workers)", flush=True)
+
+    try:
+        Master(api.app, sock, args).run()
+    finally:
+        sock.close()
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Delta sync
+Clients send back the `watermark` from their previous sync as `?since=` and get
+the rows created or updated after it, plus tombstones for rows deleted since. A
+watermark is "<updated_at>" or "<updated_at>|<id>" (mid-way through a paged
+catalog). Watermarks trail the database clock by SYNC_SETTLE_SECONDS so rows
+written by transactions still in flight, or not yet replayed on a read replica,
+are picked up by the next sync instead of being skipped.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import DateTime, and_, func, or_, select, type_coerce
+from sqlalchemy.orm import Query, Session
+
+import jobs
+import models
+from database import REPLICA_MAX_LAG_SECONDS
+
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", str(REPLICA_MAX_LAG_SECONDS + 5)))
+# Tombstones older than this are pruned; clients with older watermarks must resync from scratch
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+MAX_CHANGES_PAGE = 1000
+
+
+class Watermark(NamedTuple):
+    updated_at: datetime
+    id: Optional[int] = None  # Last id returned at `updated_at` when a page was cut short
+
+    def __str__(self):
+        stamp = self.updated_at.isoformat()
+        return stamp if self.id is None else f"{stamp}|{self.id}"
+
+
+def parse_watermark(since: Optional[str]) -> Optional[Watermark]:
+    """Parse `?since=`; raises ValueError on malformed input"""
+    if not since:
+        return None
+    stamp, _, last_id = since.partition("|")
+    updated_at = datetime.fromisoformat(stamp)
+    if updated_at.tzinfo is not None:
+        raise ValueError("since must be a watermark returned by a previous sync")
+    return Watermark(updated_at, int(last_id) if last_id else None)
+
+
+def database_now(db: Session) -> datetime:
+    """Current time on the database clock, comparable with server-side updated_at defaults"""
+    now = db.scalar(select(type_coerce(func.now(), DateTime)))
+    # PostgreSQL returns timestamptz; stored timestamps are naive in the session time zone
+    return now.replace(tzinfo=None) if now.tzinfo is not None else now
+
+
+def sync_window(db: Session, since: Optional[str]) -> Tuple[Optional[Watermark], datetime, bool]:
+    """(start watermark, cutoff, reset); reset means the client must drop its cache and take everything"""
+    start = parse_watermark(since)
+    now = database_now(db)
+    # Deletes older than the retention window are gone, so an incremental sync would be incomplete.
+    # Mid-page watermarks carry a row's timestamp, not a sync time, and are never reset.
+    if start is not None and start.id is None and start.updated_at < now - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return None, now - timedelta(seconds=SYNC_SETTLE_SECONDS), True
+    return start, now - timedelta(seconds=SYNC_SETTLE_SECONDS), False
+
+
+def changed_since(query: Query, model, start: Optional[Watermark], cutoff: datetime) -> Query:
+    """Rows of `model` changed after `start` and no later than `cutoff`, in (updated_at, id) order"""
+    query = query.filter(model.updated_at <= cutoff)
+    if start is not None:
+        if start.id is None:
+            query = query.filter(model.updated_at > start.updated_at)
+        else:
+            query = query.filter(or_(
+                model.updated_at > start.updated_at,
+                and_(model.updated_at == start.updated_at, model.id > start.id),
+            ))
+    return query.order_by(model.updated_at, model.id)
+
+
+def page_changes(query: Query, model, start: Optional[Watermark], cutoff: datetime, limit: int):
+    """One page of changes plus the watermark to continue from and whether more remain"""
+    rows = changed_since(query, model, start, cutoff).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, Watermark(rows[-1].updated_at, rows[-1].id), True
+    return rows, Watermark(cutoff), False
+
+
+def deleted_ids(db: Session, entity_type: str, start: Optional[Watermark], cutoff: datetime,
+                user_id: Optional[int] = None) -> List[int]:
+    if start is None:
+        return []  # Full syncs only return live rows
+    query = db.query(models.Tombstone.entity_id).filter(
+        models.Tombstone.entity_type == entity_type,
+        models.Tombstone.deleted_at > start.updated_at,
+        models.Tombstone.deleted_at <= cutoff,
+    )
+    if user_id is not None:
+        query = query.filter(models.Tombstone.user_id == user_id)
+    return [row.entity_id for row in query.order_by(models.Tombstone.deleted_at)]
+
+
+@jobs.job_handler("prune_tombstones")
+def prune_tombstones(db: Session, payload: dict):
+    """Delete tombstones older than the retention window"""
+    cutoff = database_now(db) - timedelta(days=payload.get("days", TOMBSTONE_RETENTION_DAYS))
+    db.query(models.Tombstone).filter(models.Tombstone.deleted_at < cutoff).delete(synchronize_session=False)
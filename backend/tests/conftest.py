@@ -0,0 +1,203 @@
+"""
+Shared database fixtures
+The seeded schema (tables plus generate_data.py rows) is built once into a
+template, and tests get cheap copies of it:
+- PostgreSQL, when TEST_DATABASE_URL points at a server (e.g. postgresql://localhost/postgres):
+  a template database cloned with CREATE DATABASE ... TEMPLATE
+- SQLite otherwise: a template file copied per test
+
+Fixtures:
+    db           Session on a fresh copy, dropped after the test
+    rollback_db  Session on one copy per worker; the test runs inside a transaction
+                 that is rolled back, so commits in crud functions never leak (cheapest)
+    db_engine    Engine on a fresh copy, for tests that manage their own sessions
+
+Templates are named after a hash of the schema and the generator, so they are
+reused across runs until models.py or generate_data.py change. Every pytest-xdist
+worker clones its own databases and template builds are serialized with a file
+lock, so `python -m pytest -n auto tests` runs in parallel across cores.
+"""
+
+import os
+import sys
+import atexit
+import fcntl
+import hashlib
+import itertools
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# crud/models import database.py, which refuses to load without DATABASE_URL.
+# The fixtures bind their own engines, so any placeholder URL is fine here.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+import models
+from generate_data import generate
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+TEST_SEED_USERS = int(os.getenv("TEST_SEED_USERS", "20"))
+TEST_SEED = 42
+TEMPLATE_DIR = os.getenv("TEST_TEMPLATE_DIR", os.path.join(tempfile.gettempdir(), "nutri-test-templates"))
+WORKER = os.getenv("PYTEST_XDIST_WORKER", "main")
+
+_clone_ids = itertools.count()
+_templates = {}
+
+
+def using_postgres() -> bool:
+    return TEST_DATABASE_URL.startswith("postgresql")
+
+
+def template_key(users: int) -> str:
+    """Changes whenever the schema, the generator or the seed parameters do"""
+    digest = hashlib.sha1(f"{users}:{TEST_SEED}".encode())
+    for table in models.Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table)).encode())
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            digest.update(str(CreateIndex(index)).encode())
+    with open(os.path.join(BACKEND_DIR, "generate_data.py"), "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+@contextmanager
+def file_lock(name: str):
+    os.makedirs(TEMPLATE_DIR, exist_ok=True)
+    with open(os.path.join(TEMPLATE_DIR, f"{name}.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def seed(engine, users: int):
+    models.Base.metadata.create_all(bind=engine)
+    generate(engine, users=users, public_recipes=max(10, users // 10), seed=TEST_SEED)
+
+
+class SqliteTemplate:
+    def __init__(self, users: int):
+        self.name = f"nutri_template_{template_key(users)}"
+        self.path = os.path.join(TEMPLATE_DIR, f"{self.name}.db")
+        self.workdir = tempfile.mkdtemp(prefix=f"nutri-test-{WORKER}-")
+        atexit.register(shutil.rmtree, self.workdir, True)
+        with file_lock(self.name):
+            if not os.path.exists(self.path):
+                building = f"{self.path}.{os.getpid()}.tmp"
+                engine = create_engine(f"sqlite:///{building}", poolclass=NullPool)
+                seed(engine, users)
+                with engine.begin() as conn:
+                    conn.execute(text("ANALYZE"))
+                engine.dispose()
+                os.replace(building, self.path)
+
+    def clone(self, name: str) -> str:
+        path = os.path.join(self.workdir, f"{name}.db")
+        shutil.copyfile(self.path, path)
+        return f"sqlite:///{path}"
+
+    def drop(self, url: str):
+        os.remove(make_url(url).database)
+
+
+class PostgresTemplate:
+    def __init__(self, users: int):
+        self.name = f"nutri_template_{template_key(users)}"
+        # CREATE/DROP DATABASE cannot run inside a transaction
+        self.admin = create_engine(TEST_DATABASE_URL, isolation_level="AUTOCOMMIT", poolclass=NullPool)
+        with file_lock(self.name), self.admin.connect() as conn:
+            exists = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": self.name}).first()
+            if not exists:
+                # Build under a temporary name so an interrupted build is never used as a template
+                building = f"{self.name}_build"
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{building}"'))
+                conn.execute(text(f'CREATE DATABASE "{building}"'))
+                engine = create_engine(self.url_for(building), poolclass=NullPool)
+                seed(engine, users)
+                with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as seeded:
+                    seeded.execute(text("ANALYZE"))
+                engine.dispose()
+                conn.execute(text(f'ALTER DATABASE "{building}" RENAME TO "{self.name}"'))
+
+    def url_for(self, database: str) -> str:
+        return make_url(TEST_DATABASE_URL).set(database=database).render_as_string(hide_password=False)
+
+    def clone(self, name: str) -> str:
+        with self.admin.connect() as conn:
+            conn.execute(text(f'CREATE DATABASE "{name}" TEMPLATE "{self.name}"'))
+        return self.url_for(name)
+
+    def drop(self, url: str):
+        with self.admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{make_url(url).database}"'))
+
+
+def database_template(users: int = TEST_SEED_USERS):
+    """Seeded template with `users` generated users, built at most once per schema"""
+    if users not in _templates:
+        _templates[users] = PostgresTemplate(users) if using_postgres() else SqliteTemplate(users)
+    return _templates[users]
+
+
+@contextmanager
+def cloned_engine(template):
+    """Engine on a private copy of `template`, dropped on exit"""
+    url = template.clone(f"nutri_test_{WORKER}_{os.getpid()}_{next(_clone_ids)}")
+    engine = create_engine(url, poolclass=NullPool)
+    if engine.dialect.name == "sqlite":
+        # Let SQLAlchemy, not pysqlite, emit BEGIN so SAVEPOINTs inside rollback_db work
+        @event.listens_for(engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def begin(conn):
+            conn.exec_driver_sql("BEGIN")
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+        template.drop(url)
+
+
+@pytest.fixture
+def db_engine():
+    with cloned_engine(database_template()) as engine:
+        yield engine
+
+
+@pytest.fixture
+def db(db_engine):
+    with Session(db_engine) as session:
+        yield session
+
+
+@pytest.fixture(scope="session")
+def shared_engine():
+    with cloned_engine(database_template()) as engine:
+        yield engine
+
+
+@pytest.fixture
+def rollback_db(shared_engine):
+    with shared_engine.connect() as connection:
+        transaction = connection.begin()
+        # commit() inside the code under test only releases a SAVEPOINT
+        session = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            yield session
+        finally:
+            session.close()
+            transaction.rollback()
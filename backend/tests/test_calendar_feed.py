@@ -0,0 +1,39 @@
+"""
+Calendar feed validators in crud.get_calendar_feed_version
+Events show each item's recipe name and calories, so editing a recipe of an
+assigned plan must change the version even when no assignment or plan changed.
+"""
+
+from datetime import datetime, timedelta
+
+import crud
+import models
+
+
+def test_recipe_edit_changes_feed_version(rollback_db):
+    db = rollback_db
+    assignment = db.query(models.WeeklyAssignment).join(
+        models.MealPlanItem, models.MealPlanItem.meal_plan_id == models.WeeklyAssignment.meal_plan_id
+    ).first()
+    recipe = db.query(models.Recipe).join(models.MealPlanItem).filter(
+        models.MealPlanItem.meal_plan_id == assignment.meal_plan_id
+    ).first()
+    week = assignment.week_start_date
+    count, last_modified = crud.get_calendar_feed_version(db, assignment.user_id, week, week)
+
+    recipe.name = "Renamed recipe"
+    recipe.updated_at = last_modified + timedelta(minutes=1)
+    db.flush()
+    assert crud.get_calendar_feed_version(db, assignment.user_id, week, week) == (count, recipe.updated_at)
+
+
+def test_recipes_outside_window_do_not_change_feed_version(rollback_db):
+    db = rollback_db
+    assignment = db.query(models.WeeklyAssignment).first()
+    week = assignment.week_start_date
+    before = crud.get_calendar_feed_version(db, assignment.user_id, week, week)
+
+    unassigned = db.query(models.Recipe).filter(~models.Recipe.meal_plan_items.any()).first()
+    unassigned.updated_at = datetime.utcnow() + timedelta(days=1)
+    db.flush()
+    assert crud.get_calendar_feed_version(db, assignment.user_id, week, week) == before
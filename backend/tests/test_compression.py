@@ -0,0 +1,61 @@
+"""
+Vary headers from compression.CompressionMiddleware
+Whether a body is compressed depends on the request's Accept-Encoding, so every
+compressible response must say so, not only the compressed ones.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import COMPRESSION_MIN_BYTES, CompressionMiddleware
+
+app = FastAPI()
+
+
+@app.get("/large")
+def large():
+    return {"text": "a" * COMPRESSION_MIN_BYTES}
+
+
+@app.get("/small")
+def small():
+    return {"text": "a"}
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse(iter([b"a" * COMPRESSION_MIN_BYTES, b"b"]), media_type="text/plain")
+
+
+@app.get("/origin")
+def origin():
+    return PlainTextResponse("a" * COMPRESSION_MIN_BYTES, headers={"Vary": "Origin"})
+
+
+@app.get("/image")
+def image():
+    return PlainTextResponse("a" * COMPRESSION_MIN_BYTES, media_type="image/png")
+
+
+app.add_middleware(CompressionMiddleware)
+client = TestClient(app)
+
+
+@pytest.mark.parametrize("path, vary", [
+    ("/large", "Accept-Encoding"),
+    ("/small", "Accept-Encoding"),
+    ("/stream", "Accept-Encoding"),
+    ("/origin", "Origin, Accept-Encoding"),
+    ("/image", None),
+])
+@pytest.mark.parametrize("accept_encoding", ["gzip", "identity"])
+def test_vary_does_not_depend_on_the_chosen_encoding(path, vary, accept_encoding):
+    response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+    assert response.headers.get("vary") == vary
+
+
+def test_only_large_bodies_are_compressed():
+    assert client.get("/large", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
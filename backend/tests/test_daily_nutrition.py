@@ -0,0 +1,116 @@
+"""
+daily_nutrition fact rows and the history built from them
+Each test works on a fresh user with known plans, so the expected rows follow
+from the plans' stored per-day totals.
+"""
+
+import uuid
+from datetime import date, timedelta
+
+import pytest
+
+import crud
+import daily_nutrition
+import models
+import nutrition
+import schemas
+
+WEEK = date(2031, 3, 24)  # A Monday; the following week spans the March/April boundary
+
+
+@pytest.fixture
+def user_id(rollback_db):
+    user = crud.create_user(rollback_db, schemas.UserCreate(email=f"history-{uuid.uuid4()}@example.com"), uuid.uuid4())
+    return user.id
+
+
+@pytest.fixture
+def recipe_ids(rollback_db):
+    return [row.id for row in rollback_db.query(models.Recipe.id).filter(models.Recipe.calories > 0).order_by(models.Recipe.id).limit(2)]
+
+
+def make_plan(db, user_id, slots):
+    """Plan with one dinner per (day_of_week, recipe_id) pair"""
+    items = [schemas.MealPlanItemCreate(recipe_id=recipe_id, day_of_week=day, meal_type="dinner") for day, recipe_id in slots]
+    return crud.create_meal_plan(db, schemas.MealPlanCreate(name="History test", meal_plan_items=items), user_id)
+
+
+def facts(db, user_id):
+    """date -> (meal_plan_id, calories) of the user's rows"""
+    rows = db.query(models.DailyNutrition).filter(models.DailyNutrition.user_id == user_id)
+    return {row.date: (row.meal_plan_id, row.calories) for row in rows}
+
+
+def expected(plan, week, days=range(7)):
+    totals = plan.nutrition["days"]
+    return {
+        week + timedelta(days=offset): (plan.id, totals.get(nutrition.WEEK_DAYS[offset], {}).get("calories", 0.0))
+        for offset in days
+    }
+
+
+def test_seeded_template_has_a_row_per_assigned_day(rollback_db):
+    assignments = rollback_db.query(models.WeeklyAssignment).count()
+    assert assignments > 0
+    assert rollback_db.query(models.DailyNutrition).count() == assignments * 7
+
+
+def test_assignment_writes_its_week(rollback_db, user_id, recipe_ids):
+    plan = make_plan(rollback_db, user_id, [("Monday", recipe_ids[0]), ("Tuesday", recipe_ids[1])])
+    crud.upsert_weekly_assignments(rollback_db, user_id, [(WEEK, plan.id)])
+    assert facts(rollback_db, user_id) == expected(plan, WEEK)
+    assert facts(rollback_db, user_id)[WEEK][1] > 0
+
+
+def test_overlapping_weeks_go_to_the_later_start(rollback_db, user_id, recipe_ids):
+    first = make_plan(rollback_db, user_id, [("Monday", recipe_ids[0]), ("Friday", recipe_ids[1])])
+    second = make_plan(rollback_db, user_id, [("Tuesday", recipe_ids[1])])
+    shifted = WEEK + timedelta(days=3)
+    crud.upsert_weekly_assignments(rollback_db, user_id, [(WEEK, first.id)])
+    crud.upsert_weekly_assignments(rollback_db, user_id, [(shifted, second.id)])
+    assert facts(rollback_db, user_id) == {**expected(first, WEEK, range(3)), **expected(second, shifted)}
+
+    # Unassigning the later week hands its overlap back to the earlier one
+    later = crud.get_weekly_assignment_by_week(rollback_db, shifted, user_id)
+    crud.delete_weekly_assignment(rollback_db, later.id)
+    assert facts(rollback_db, user_id) == expected(first, WEEK)
+
+
+def test_plan_edit_rewrites_every_assigned_week(rollback_db, user_id, recipe_ids):
+    plan = make_plan(rollback_db, user_id, [("Monday", recipe_ids[0])])
+    crud.upsert_weekly_assignments(rollback_db, user_id, [(WEEK, plan.id), (WEEK + timedelta(weeks=1), plan.id)])
+
+    edited = schemas.MealPlanCreate(name="Edited", meal_plan_items=[
+        schemas.MealPlanItemCreate(recipe_id=recipe_ids[1], day_of_week="Sunday", meal_type="lunch"),
+    ])
+    plan = crud.update_meal_plan(rollback_db, plan.id, edited)
+    daily_nutrition.refresh_plans(rollback_db, [plan.id])
+    assert facts(rollback_db, user_id) == {**expected(plan, WEEK), **expected(plan, WEEK + timedelta(weeks=1))}
+    assert facts(rollback_db, user_id)[WEEK][1] == 0.0
+
+
+def test_plan_delete_drops_its_rows(rollback_db, user_id, recipe_ids):
+    kept = make_plan(rollback_db, user_id, [("Monday", recipe_ids[0])])
+    dropped = make_plan(rollback_db, user_id, [("Monday", recipe_ids[1])])
+    crud.upsert_weekly_assignments(rollback_db, user_id, [(WEEK, kept.id), (WEEK + timedelta(weeks=1), dropped.id)])
+    # Remove the assignment without refreshing, leaving rows that only the plan delete cleans up
+    rollback_db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.meal_plan_id == dropped.id).delete()
+
+    crud.delete_meal_plan(rollback_db, dropped.id)
+    assert facts(rollback_db, user_id) == expected(kept, WEEK)
+
+
+@pytest.mark.parametrize("bucket, starts, days", [
+    ("week", [WEEK, WEEK + timedelta(weeks=1)], [7, 7]),
+    ("month", [date(2031, 3, 1), date(2031, 4, 1)], [8, 6]),
+])
+def test_history_buckets(rollback_db, user_id, recipe_ids, bucket, starts, days):
+    plan = make_plan(rollback_db, user_id, [("Monday", recipe_ids[0]), ("Wednesday", recipe_ids[1])])
+    crud.upsert_weekly_assignments(rollback_db, user_id, [(WEEK, plan.id), (WEEK + timedelta(weeks=1), plan.id)])
+    rows = crud.get_daily_nutrition_history(rollback_db, user_id, date(2031, 3, 1), date(2031, 4, 30), bucket)
+
+    assert [row.start for row in rows] == starts
+    assert [row.days for row in rows] == days
+    by_day = facts(rollback_db, user_id)
+    for row, start, end in zip(rows, starts, starts[1:] + [date(2031, 5, 1)]):
+        assert row.calories == pytest.approx(sum(calories for day, (_, calories) in by_day.items() if start <= day < end))
@@ -0,0 +1,30 @@
+"""
+Sanity checks for the conftest.py database fixtures
+Every test must start from the seeded template no matter what earlier tests (or
+other workers) wrote, including through crud functions that commit.
+"""
+
+import uuid
+
+import pytest
+
+import crud
+import models
+import schemas
+from conftest import TEST_SEED_USERS
+
+
+@pytest.fixture(params=["db", "rollback_db"])
+def session(request):
+    return request.getfixturevalue(request.param)
+
+
+def test_starts_from_seeded_template(session):
+    assert session.query(models.User).count() == TEST_SEED_USERS
+    assert session.query(models.Ingredient).count() > 0
+
+
+@pytest.mark.parametrize("attempt", range(2))
+def test_committed_writes_do_not_leak(session, attempt):
+    crud.create_user(session, schemas.UserCreate(email=f"fixture-{uuid.uuid4()}@example.com"), uuid.uuid4())
+    assert session.query(models.User).count() == TEST_SEED_USERS + 1
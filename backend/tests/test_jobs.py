@@ -0,0 +1,46 @@
+"""
+Job dedupe keys in jobs.py
+A key collapses repeated enqueues only while the job is still pending: once a
+worker claims it, work committed afterwards needs a run of its own.
+"""
+
+import jobs
+import models
+
+KIND = "test_noop"
+
+
+@jobs.job_handler(KIND)
+def noop(db, payload):
+    if payload.get("enqueue_during_run"):
+        # An edit committed while this job runs
+        jobs.enqueue(db, KIND, {"n": 2}, key="test:1")
+
+
+def test_pending_job_is_reused(db):
+    first = jobs.enqueue(db, KIND, {"n": 1}, key="test:1")
+    assert jobs.enqueue(db, KIND, {"n": 2}, key="test:1").id == first.id
+    assert db.query(models.Job).filter(models.Job.kind == KIND).count() == 1
+
+
+def test_enqueue_while_running_creates_new_job(db):
+    first = jobs.enqueue(db, KIND, {"n": 1}, key="test:1")
+    claimed = jobs.claim_next(db)
+    assert claimed.id == first.id and claimed.status == "running" and claimed.dedupe_key is None
+
+    second = jobs.enqueue(db, KIND, {"n": 2}, key="test:1")
+    assert second.id != first.id and second.status == "pending"
+    # Later enqueues collapse into the new pending job
+    assert jobs.enqueue(db, KIND, {"n": 3}, key="test:1").id == second.id
+
+    jobs.run_job(db, claimed)
+    db.refresh(second)
+    assert claimed.status == "done" and second.status == "pending" and second.dedupe_key == "test:1"
+
+
+def test_enqueue_from_inside_running_job_is_not_dropped(db):
+    jobs.enqueue(db, KIND, {"n": 1, "enqueue_during_run": True}, key="test:1")
+    job = jobs.claim_next(db)
+    jobs.run_job(db, job)
+    pending = db.query(models.Job).filter(models.Job.kind == KIND, models.Job.status == "pending").all()
+    assert [(job.payload, job.dedupe_key) for job in pending] == [({"n": 2}, "test:1")]
@@ -0,0 +1,74 @@
+"""
+Startup schema upgrades in migrations.py
+Each test rebuilds weekly_assignments the way older releases created it, without
+the (user_id, week_start_date) unique constraint, on a private clone.
+"""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import Column, MetaData, Table, text
+from sqlalchemy.orm import Session
+
+import crud
+import migrations
+import models
+
+WEEK = date(2031, 3, 24)
+
+
+@pytest.fixture
+def legacy_engine(db_engine):
+    """Clone whose weekly_assignments has the current columns but no unique constraint"""
+    legacy = Table("weekly_assignments", MetaData(), *[
+        Column(column.name, column.type, primary_key=column.primary_key) for column in models.WeeklyAssignment.__table__.columns
+    ])
+    with db_engine.begin() as conn:
+        conn.execute(text("DROP TABLE weekly_assignments"))
+        legacy.create(conn)
+    assert not migrations.has_weekly_assignment_unique(db_engine)
+    return db_engine
+
+
+def add_assignments(engine, rows):
+    with Session(engine) as db:
+        for id, user_id, meal_plan_id, updated_at in rows:
+            db.add(models.WeeklyAssignment(
+                id=id, user_id=user_id, week_start_date=WEEK, meal_plan_id=meal_plan_id, updated_at=updated_at
+            ))
+        db.commit()
+
+
+def test_duplicates_are_removed_and_constraint_added(legacy_engine):
+    with Session(legacy_engine) as db:
+        user_id, plan_ids = 1, [plan.id for plan in db.query(models.MealPlan.id).order_by(models.MealPlan.id).limit(3)]
+    add_assignments(legacy_engine, [
+        (9001, user_id, plan_ids[0], datetime(2031, 1, 1)),
+        (9002, user_id, plan_ids[1], datetime(2031, 1, 3)),  # Latest edit wins
+        (9003, user_id, plan_ids[2], datetime(2031, 1, 2)),
+    ])
+
+    migrations.upgrade(legacy_engine)
+    assert migrations.has_weekly_assignment_unique(legacy_engine)
+    with Session(legacy_engine) as db:
+        week = db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.week_start_date == WEEK).all()
+        assert [(a.id, a.meal_plan_id) for a in week] == [(9002, plan_ids[1])]
+        tombstones = db.query(models.Tombstone.entity_id).filter(models.Tombstone.entity_type == "weekly_assignment")
+        assert {row.entity_id for row in tombstones} >= {9001, 9003}
+        history = db.query(models.DailyNutrition).filter(
+            models.DailyNutrition.user_id == user_id, models.DailyNutrition.date == WEEK
+        ).one()
+        assert history.meal_plan_id == plan_ids[1]
+
+        # The upsert has its ON CONFLICT target again
+        crud.upsert_weekly_assignments(db, user_id, [(WEEK, plan_ids[0])])
+        assert db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.week_start_date == WEEK).one().meal_plan_id == plan_ids[0]
+
+
+def test_upgrade_is_a_no_op_once_applied(db_engine):
+    assert migrations.has_weekly_assignment_unique(db_engine)
+    with Session(db_engine) as db:
+        before = db.query(models.WeeklyAssignment).count()
+    migrations.upgrade(db_engine)
+    with Session(db_engine) as db:
+        assert db.query(models.WeeklyAssignment).count() == before
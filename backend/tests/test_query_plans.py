@@ -0,0 +1,211 @@
+"""
+EXPLAIN regression checks for the queries crud.py issues
+Each case calls one crud function against a seeded PostgreSQL database, captures
+every SELECT it sends and runs EXPLAIN (FORMAT JSON) on it. A case fails when
+- a plan sequentially scans a large table the case is not expected to scan,
+- a statement's estimated total cost exceeds its baseline by more than
+  EXPLAIN_COST_TOLERANCE (default 1.5x),
+- the number of statements changed (a new N+1 or a dropped eager load), or
+- the case has no baseline yet (record one with EXPLAIN_UPDATE_BASELINE=1).
+
+Usage:
+    TEST_DATABASE_URL=postgresql://localhost/postgres python -m pytest tests/test_query_plans.py
+    EXPLAIN_UPDATE_BASELINE=1 TEST_DATABASE_URL=... python -m pytest tests/test_query_plans.py
+
+The cases run on a clone of the seeded template database from conftest.py, so
+the server's own databases are never touched. Skipped unless TEST_DATABASE_URL
+points at PostgreSQL.
+"""
+
+import os
+import json
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import models
+import schemas
+import sync
+from conftest import TEST_SEED, cloned_engine, database_template, using_postgres
+
+UPDATE_BASELINE = os.getenv("EXPLAIN_UPDATE_BASELINE", "").lower() in ("1", "true", "yes")
+COST_TOLERANCE = float(os.getenv("EXPLAIN_COST_TOLERANCE", "1.5"))
+# Tables with at least this many rows must be reached through an index
+LARGE_TABLE_ROWS = int(os.getenv("EXPLAIN_LARGE_TABLE_ROWS", "1000"))
+SEED_USERS = int(os.getenv("EXPLAIN_SEED_USERS", "2000"))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plans_baseline.json")
+
+pytestmark = pytest.mark.skipif(not using_postgres(), reason="TEST_DATABASE_URL must point to a PostgreSQL server")
+
+
+# Case name -> (callable(db, samples), tables it may sequentially scan)
+CASES = {
+    # Lists: a bare LIMIT over the table is expected to scan it
+    "get_users": (lambda db, s: crud.get_users(db, limit=100), {"users"}),
+    "get_ingredients": (lambda db, s: crud.get_ingredients(db, limit=100), {"ingredients"}),
+    "get_recipes": (lambda db, s: crud.get_recipes(db, limit=100), {"recipes"}),
+    "get_meal_plans": (lambda db, s: crud.get_meal_plans(db, limit=100), {"meal_plans"}),
+    # Nutrition filters and sorts must stay on the recipes indexes
+    "get_recipes_high_protein_low_calorie": (
+        lambda db, s: crud.get_recipes(
+            db, limit=100, filters=schemas.RecipeFilter(max_calories=500, min_protein=30), sort="protein_density", descending=True
+        ),
+        set(),
+    ),
+    "get_recipes_by_category": (
+        lambda db, s: crud.get_recipes(db, limit=100, filters=schemas.RecipeFilter(category="Protein"), sort="calories"),
+        set(),
+    ),
+    "get_recipes_by_owner": (
+        lambda db, s: crud.get_recipes(db, limit=100, filters=schemas.RecipeFilter(user_id=s["user_id"]), sort="protein", descending=True),
+        set(),
+    ),
+    # By id
+    "get_user": (lambda db, s: crud.get_user(db, s["user_id"]), set()),
+    "get_ingredient": (lambda db, s: crud.get_ingredient(db, s["ingredient_id"]), set()),
+    "get_recipe": (lambda db, s: crud.get_recipe(db, s["recipe_id"]), set()),
+    "get_meal_plan": (lambda db, s: crud.get_meal_plan(db, s["meal_plan_id"]), set()),
+    "get_recipes_by_ids": (lambda db, s: crud.get_recipes_by_ids(db, s["recipe_ids"]), set()),
+    "get_meal_plans_by_ids": (lambda db, s: crud.get_meal_plans_by_ids(db, [s["meal_plan_id"]]), set()),
+    # Ownership checks
+    "get_meal_plan_access": (lambda db, s: crud.get_meal_plan_access(db, s["meal_plan_id"]), set()),
+    "get_weekly_assignment_by_week": (
+        lambda db, s: crud.get_weekly_assignment_by_week(db, s["week_start_date"], s["user_id"]), set()
+    ),
+    # By user
+    "get_user_meal_plans": (lambda db, s: crud.get_user_meal_plans(db, s["user_id"]), set()),
+    "get_user_weekly_assignments": (lambda db, s: crud.get_user_weekly_assignments(db, s["user_id"]), set()),
+    "get_user_weekly_assignments_in_range": (
+        lambda db, s: crud.get_user_weekly_assignments_in_range(
+            db, s["user_id"], s["week_start_date"], s["week_start_date"] + timedelta(weeks=4)
+        ),
+        set(),
+    ),
+    "get_user_bootstrap": (
+        lambda db, s: crud.get_user_bootstrap(db, s["user_id"], s["week_start_date"], s["week_start_date"] + timedelta(weeks=4)),
+        set(),
+    ),
+    "get_user_weekly_assignments_graph": (lambda db, s: crud.get_user_weekly_assignments_graph(db, s["user_id"]), set()),
+    "get_daily_nutrition_history": (
+        lambda db, s: crud.get_daily_nutrition_history(db, s["user_id"], s["week_start_date"], s["week_start_date"] + timedelta(weeks=52), "month"),
+        set(),
+    ),
+    # Delta sync
+    "get_recipe_changes": (lambda db, s: crud.get_recipe_changes(db, s["since"], s["cutoff"], 500), set()),
+    "get_user_changes": (lambda db, s: crud.get_user_changes(db, s["user_id"], s["since"], s["cutoff"]), set()),
+}
+
+
+@contextmanager
+def captured_selects(engine):
+    """Collect (statement, parameters) for every SELECT sent through `engine`"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def explain(engine, statement, parameters) -> dict:
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+@pytest.fixture(scope="module")
+def explain_engine():
+    # Larger than the default fixture data so the planner prefers indexes where they exist
+    with cloned_engine(database_template(SEED_USERS)) as engine:
+        yield engine
+
+
+@pytest.fixture(scope="module")
+def large_tables(explain_engine):
+    with explain_engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND relnamespace = 'public'::regnamespace "
+            "AND reltuples >= :rows"
+        ), {"rows": LARGE_TABLE_ROWS})
+        return {row.relname for row in rows}
+
+
+@pytest.fixture(scope="module")
+def samples(explain_engine):
+    """Ids of a typical user and their data; generated users are long-tailed, so pick one with assignments"""
+    with sessionmaker(bind=explain_engine)() as db:
+        user = db.query(models.User).join(models.WeeklyAssignment).order_by(models.User.id).first()
+        assignment = db.query(models.WeeklyAssignment).filter(models.WeeklyAssignment.user_id == user.id).first()
+        latest = db.query(func.max(models.Recipe.updated_at)).scalar()
+        return {
+            "user_id": user.id,
+            "meal_plan_id": assignment.meal_plan_id,
+            "week_start_date": assignment.week_start_date,
+            "recipe_id": db.query(models.Recipe.id).order_by(models.Recipe.id).first().id,
+            "recipe_ids": [row.id for row in db.query(models.Recipe.id).order_by(models.Recipe.id).limit(21)],
+            "ingredient_id": db.query(models.Ingredient.id).order_by(models.Ingredient.id).first().id,
+            # An incremental sync covering the last week of writes
+            "since": sync.Watermark(latest - timedelta(days=7)),
+            "cutoff": latest,
+        }
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            data = json.load(f)
+    else:
+        data = {}
+    data.setdefault("plans", {})
+    yield data
+    if UPDATE_BASELINE:
+        data.update({"seed": TEST_SEED, "users": SEED_USERS, "recorded_on": date.today().isoformat()})
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_query_plan(case, explain_engine, large_tables, samples, baseline):
+    run, seq_scan_allowed = CASES[case]
+    with captured_selects(explain_engine) as statements, sessionmaker(bind=explain_engine)() as db:
+        run(db, samples)
+    assert statements, f"{case} issued no SELECT"
+
+    problems, costs = [], []
+    for number, (statement, parameters) in enumerate(statements):
+        plan = explain(explain_engine, statement, parameters)
+        costs.append(plan["Total Cost"])
+        for node in plan_nodes(plan):
+            table = node.get("Relation Name")
+            if node["Node Type"] == "Seq Scan" and table in large_tables and table not in seq_scan_allowed:
+                problems.append(f"statement {number}: Seq Scan on {table}\n{statement}")
+
+    if UPDATE_BASELINE:
+        baseline["plans"][case] = [round(cost, 2) for cost in costs]
+    elif case not in baseline["plans"]:
+        problems.append("no baseline recorded; rerun with EXPLAIN_UPDATE_BASELINE=1 and commit query_plans_baseline.json")
+    else:
+        expected = baseline["plans"][case]
+        if len(expected) != len(costs):
+            problems.append(f"issued {len(costs)} statements, baseline has {len(expected)}")
+        for number, (cost, expected_cost) in enumerate(zip(costs, expected)):
+            if cost > expected_cost * COST_TOLERANCE:
+                problems.append(f"statement {number}: estimated cost {cost:.2f} > {COST_TOLERANCE}x baseline {expected_cost:.2f}")
+
+    assert not problems, f"{case}:\n" + "\n".join(problems)
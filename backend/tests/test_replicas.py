@@ -0,0 +1,189 @@
+"""
+Read replica routing in database.get_db
+The primary and the replicas are separate clones of the seeded template, so a
+write on the primary is invisible to the "replicas" the way it would be on a
+replica that has not replayed it yet. Lag is simulated by overriding
+Replica.replication_lag or Replica.replay_status, which only PostgreSQL replicas
+can report.
+"""
+
+import os
+import time
+import uuid
+from contextlib import ExitStack
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+import crud
+import database
+import models
+import schemas
+from conftest import cloned_engine, database_template
+
+WRITER = {"Authorization": "Bearer writer"}
+READER = {"Authorization": "Bearer reader"}
+
+
+def url_of(engine) -> str:
+    return engine.url.render_as_string(hide_password=False)
+
+
+def unreachable_url(engine) -> str:
+    missing = "/nonexistent/replica.db" if engine.dialect.name == "sqlite" else f"nutri_missing_{os.getpid()}"
+    return engine.url.set(database=missing).render_as_string(hide_password=False)
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/source")
+    def source(db: Session = Depends(database.get_db)):
+        return {"replica": db.info.get("replica"), "users": db.query(models.User).count()}
+
+    @app.post("/users")
+    def create_user(db: Session = Depends(database.get_db)):
+        crud.create_user(db, schemas.UserCreate(email=f"replica-{uuid.uuid4()}@example.com"), uuid.uuid4())
+        return {"ok": True}
+
+    app.add_middleware(database.ReadYourWritesMiddleware)
+    return app
+
+
+def new_client() -> TestClient:
+    """A separate client with its own cookie jar, served by a separate app as another worker would be"""
+    return TestClient(make_app(), raise_server_exceptions=False)
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    """Install a router over replica clones; returns a function taking the replica URLs to route to"""
+    stack = ExitStack()
+    template = database_template()
+    primary = stack.enter_context(cloned_engine(template))
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=primary))
+
+    def install(urls):
+        router = database.ReplicaRouter(urls)
+        # Tests probe replicas explicitly instead of waiting for the checker thread
+        monkeypatch.setattr(router, "_ensure_checker", lambda: None)
+        monkeypatch.setattr(database, "replica_router", router)
+        # Replica engines pool connections; close them before the clones are dropped
+        stack.callback(lambda: [replica.engine.dispose() for replica in router.replicas])
+        return router, new_client()
+
+    def replica_url():
+        return url_of(stack.enter_context(cloned_engine(template)))
+
+    with stack:
+        yield install, replica_url, primary
+
+
+def sources(client, count, headers=READER):
+    return [client.get("/source", headers=headers).json()["replica"] for _ in range(count)]
+
+
+def test_gets_round_robin_across_healthy_replicas(cluster):
+    install, replica_url, _ = cluster
+    router, client = install([replica_url(), replica_url()])
+    assert sources(client, 4) == ["replica0", "replica1", "replica0", "replica1"]
+
+
+def test_writes_go_to_primary(cluster):
+    install, replica_url, _ = cluster
+    router, client = install([replica_url()])
+    before = client.get("/source", headers=READER).json()["users"]
+    assert client.post("/users", headers=WRITER).status_code == 200
+    # Another client still reads the replica, which has not seen the write
+    assert new_client().get("/source", headers=READER).json() == {"replica": "replica0", "users": before}
+
+
+def test_unreachable_replica_leaves_rotation(cluster):
+    install, replica_url, primary = cluster
+    router, client = install([replica_url(), unreachable_url(primary)])
+    for replica in router.replicas:
+        replica.check()
+    assert [replica.healthy for replica in router.replicas] == [True, False]
+    assert sources(client, 3) == ["replica0"] * 3
+
+
+def test_replica_failing_mid_request_leaves_rotation(cluster):
+    install, replica_url, primary = cluster
+    router, client = install([unreachable_url(primary), replica_url()])
+    # Not probed yet, so the first GET is routed to the dead replica
+    assert client.get("/source", headers=READER).status_code == 500
+    assert not router.replicas[0].healthy
+    assert sources(client, 3) == ["replica1"] * 3
+
+
+def test_lagging_replica_leaves_rotation_until_it_catches_up(cluster, monkeypatch):
+    install, replica_url, _ = cluster
+    router, client = install([replica_url(), replica_url()])
+    lagging = router.replicas[1]
+    monkeypatch.setattr(lagging, "replication_lag", lambda conn: database.REPLICA_MAX_LAG_SECONDS + 1)
+    lagging.check()
+    assert not lagging.healthy and "lag" in lagging.last_error
+    assert sources(client, 3) == ["replica0"] * 3
+
+    monkeypatch.setattr(lagging, "replication_lag", lambda conn: 0.0)
+    lagging.check()
+    assert set(sources(client, 4)) == {"replica0", "replica1"}
+
+
+def test_idle_primary_does_not_count_as_lag(cluster, monkeypatch):
+    install, replica_url, _ = cluster
+    router, client = install([replica_url()])
+    replica = router.replicas[0]
+    # No writes for ten minutes: the last replayed transaction is old, but nothing is left to replay
+    monkeypatch.setattr(replica, "replay_status", lambda conn: (True, 600.0))
+    replica.check()
+    assert replica.healthy
+    assert sources(client, 2) == ["replica0"] * 2
+
+    monkeypatch.setattr(replica, "replay_status", lambda conn: (False, 600.0))
+    replica.check()
+    assert not replica.healthy and "lag" in replica.last_error
+
+
+def test_no_healthy_replica_falls_back_to_primary(cluster):
+    install, _, primary = cluster
+    router, client = install([unreachable_url(primary)])
+    router.replicas[0].check()
+    assert sources(client, 2) == [None, None]
+
+
+def test_writer_reads_from_primary_for_read_your_writes_window(cluster, monkeypatch):
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 0.5)
+    install, replica_url, _ = cluster
+    router, client = install([replica_url()])
+    before = client.get("/source", headers=WRITER).json()
+    assert before["replica"] == "replica0"
+
+    assert client.post("/users", headers=WRITER).status_code == 200
+    assert client.get("/source", headers=WRITER).json() == {"replica": None, "users": before["users"] + 1}
+    assert sources(new_client(), 1, READER) == ["replica0"]
+
+    time.sleep(0.6)
+    assert sources(client, 1, WRITER) == ["replica0"]
+
+
+def test_read_your_writes_holds_across_workers(cluster):
+    install, replica_url, _ = cluster
+    router, client = install([replica_url()])
+    assert client.post("/users", headers=WRITER).status_code == 200
+
+    # The pin travels in the client's cookie, not in the worker that took the write
+    other_worker = new_client()
+    other_worker.cookies = client.cookies
+    assert sources(other_worker, 2, WRITER) == [None, None]
+
+
+def test_forged_primary_pin_is_ignored(cluster):
+    install, replica_url, _ = cluster
+    router, client = install([replica_url()])
+    client.cookies.set(database.PRIMARY_UNTIL_COOKIE, str(time.time() + 3600))
+    assert sources(client, 1) == ["replica0"]
+    client.cookies.set(database.PRIMARY_UNTIL_COOKIE, "not-a-time")
+    assert sources(client, 1) == ["replica0"]
@@ -0,0 +1,62 @@
+import { describe, it, expect, beforeEach, vi } from 'vitest';
+import { screen, within } from '@testing-library/react';
+import { render } from '../utils/testUtils';
+import MealPlanGrid from '../../components/MealPlanGrid';
+import { daysOfWeek, mealTypes } from '../../hooks/useMealPlan';
+import type { MealPlanNutrition } from '../../types';
+
+const storedNutrition: MealPlanNutrition = {
+  totals: { calories: 1500, protein: 90, carbs: 150, fat: 50 },
+  days: {
+    Monday: { calories: 1000, protein: 60, carbs: 100, fat: 30 },
+    Tuesday: { calories: 500, protein: 30, carbs: 50, fat: 20 },
+  },
+  slots: {},
+};
+
+describe('MealPlanGrid Component', () => {
+  const calculateDayNutrition = vi.fn(() => ({ calories: 100, protein: 10, carbs: 10, fat: 1 }));
+
+  const renderGrid = (nutrition: MealPlanNutrition | null) =>
+    render(
+      <MealPlanGrid
+        recipes={[]}
+        selectedRecipe={null}
+        setSelectedRecipe={vi.fn()}
+        daysOfWeek={daysOfWeek}
+        mealTypes={mealTypes}
+        getRecipeForSlot={() => null}
+        assignRecipeToSlot={vi.fn()}
+        storedNutrition={nutrition}
+        calculateDayNutrition={calculateDayNutrition}
+        mealPlan={[]}
+        savedMealPlans={[]}
+      />
+    );
+
+  // Day names also head the slot grid; the nutrition summary comes last
+  const summaryRow = (label: string) => {
+    const cells = screen.getAllByText(label);
+    return cells[cells.length - 1].closest('tr')!;
+  };
+
+  beforeEach(() => {
+    vi.clearAllMocks();
+  });
+
+  it('renders the stored totals of a saved plan without recomputing them', () => {
+    renderGrid(storedNutrition);
+
+    expect(calculateDayNutrition).not.toHaveBeenCalled();
+    expect(within(summaryRow('Monday')).getByText('1000')).toBeInTheDocument();
+    expect(within(summaryRow('Wednesday')).getAllByText('0')).toHaveLength(4);
+    expect(within(summaryRow('Week')).getByText('1500')).toBeInTheDocument();
+  });
+
+  it('computes totals on the client for unsaved changes', () => {
+    renderGrid(null);
+
+    expect(calculateDayNutrition).toHaveBeenCalledTimes(daysOfWeek.length);
+    expect(within(summaryRow('Week')).getByText('700')).toBeInTheDocument();
+  });
+});
@@ -74,10 +74,10 @@ export async function apiFetch<T>(url: string, options?: RequestInit): Promise<T
   }
 }
 
-// Add a health check function
+// Add a health check function (readiness: 503 while the backend cannot reach its database)
 export async function checkApiHealth(): Promise<boolean> {
   try {
-    const response = await fetch(`${API_BASE_URL}/`, {
+    const response = await fetch(`${API_BASE_URL}/readyz`, {
       method: 'GET',
       credentials: 'include',
     });
@@ -1,5 +1,5 @@
 import React from 'react';
-import type { Recipe, MealSlot, SavedMealPlan } from '../types';
+import type { Recipe, MealSlot, SavedMealPlan, MealPlanNutrition, NutritionTotals } from '../types';
 
 interface Props {
   recipes: Recipe[];
@@ -9,7 +9,8 @@ interface Props {
   mealTypes: readonly string[];
   getRecipeForSlot: (day: string, meal: string) => Recipe | null;
   assignRecipeToSlot: (day: string, meal: string, recipe: Recipe | null) => void;
-  calculateDayNutrition: (day: string) => { calories: number; protein: number; carbs: number; fat: number };
+  storedNutrition: MealPlanNutrition | null; // Totals stored on the loaded plan; null while it has unsaved changes
+  calculateDayNutrition: (day: string) => NutritionTotals; // Fallback for unsaved grids
   mealPlan: MealSlot[];
   savedMealPlans: SavedMealPlan[];
 }
@@ -22,10 +23,26 @@ const MealPlanGrid: React.FC<Props> = ({
   mealTypes,
   getRecipeForSlot,
   assignRecipeToSlot,
+  storedNutrition,
   calculateDayNutrition,
   mealPlan,
   savedMealPlans,
 }) => {
+  const emptyTotals: NutritionTotals = { calories: 0, protein: 0, carbs: 0, fat: 0 };
+  // Days without items are absent from the stored totals
+  const dayNutrition = daysOfWeek.map(day =>
+    storedNutrition ? storedNutrition.days[day] ?? emptyTotals : calculateDayNutrition(day)
+  );
+  const weekNutrition: NutritionTotals = storedNutrition?.totals ?? dayNutrition.reduce(
+    (total, day) => ({
+      calories: total.calories + day.calories,
+      protein: total.protein + day.protein,
+      carbs: total.carbs + day.carbs,
+      fat: total.fat + day.fat,
+    }),
+    emptyTotals
+  );
+
   return (
     <>
       <div className="grid grid-cols-1 xl:grid-cols-4 gap-4">
@@ -140,8 +157,8 @@ const MealPlanGrid: React.FC<Props> = ({
                     </tr>
                   </thead>
                   <tbody>
-                    {daysOfWeek.map(day => {
-                      const nutrition = calculateDayNutrition(day);
+                    {daysOfWeek.map((day, i) => {
+                      const nutrition = dayNutrition[i];
                       return (
                         <tr key={day}>
                           <td className="font-medium">{day}</td>
@@ -153,6 +170,15 @@ const MealPlanGrid: React.FC<Props> = ({
                       );
                     })}
                   </tbody>
+                  <tfoot>
+                    <tr>
+                      <th>Week</th>
+                      <th>{Math.round(weekNutrition.calories)}</th>
+                      <th>{Math.round(weekNutrition.protein)}</th>
+                      <th>{Math.round(weekNutrition.carbs)}</th>
+                      <th>{Math.round(weekNutrition.fat)}</th>
+                    </tr>
+                  </tfoot>
                 </table>
               </div>
             </div>
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { apiFetch } from '../apiClient';
-import type { Recipe, MealSlot, SavedMealPlan } from '../types';
+import type { Recipe, MealSlot, SavedMealPlan, MealPlanNutrition } from '../types';
 
 export const daysOfWeek = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
 export const mealTypes = ['breakfast', 'lunch', 'dinner'] as const;
@@ -10,6 +10,8 @@ export function useMealPlan() {
   const [mealPlan, setMealPlan] = useState<MealSlot[]>([]);
   const [savedMealPlans, setSavedMealPlans] = useState<SavedMealPlan[]>([]);
   const [currentMealPlan, setCurrentMealPlan] = useState<SavedMealPlan | null>(null);
+  // True once the grid differs from currentMealPlan; its stored totals no longer apply
+  const [hasUnsavedChanges, setHasUnsavedChanges] = useState<boolean>(false);
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
 
@@ -91,6 +93,7 @@ export function useMealPlan() {
       }
 
       setCurrentMealPlan(savedPlan);
+      setHasUnsavedChanges(false);
       await fetchSavedMealPlans();
     } catch (err) {
       setError(err instanceof Error ? err.message : 'An error occurred');
@@ -99,6 +102,16 @@ export function useMealPlan() {
     }
   };
 
+  // One-row read of the plan's stored totals; the listed copy may predate an ingredient edit
+  const refreshStoredNutrition = async (mealPlanId: number) => {
+    try {
+      const nutrition = await apiFetch<MealPlanNutrition>(`/meal-plans/${mealPlanId}/nutrition`);
+      setCurrentMealPlan(prev => (prev && prev.id === mealPlanId ? { ...prev, nutrition } : prev));
+    } catch (err) {
+      console.error('Error fetching meal plan nutrition:', err);
+    }
+  };
+
   const loadMealPlan = (savedPlan: SavedMealPlan) => {
     const clearedPlan = mealPlan.map(slot => ({ ...slot, recipe: null }));
     const loadedPlan = clearedPlan.map(slot => {
@@ -110,6 +123,8 @@ export function useMealPlan() {
 
     setMealPlan(loadedPlan);
     setCurrentMealPlan(savedPlan);
+    setHasUnsavedChanges(false);
+    refreshStoredNutrition(savedPlan.id);
   };
 
   const deleteSavedMealPlan = async (mealPlanId: number) => {
@@ -130,6 +145,7 @@ export function useMealPlan() {
         slot.day === day && slot.meal === meal ? { ...slot, recipe } : slot
       )
     );
+    setHasUnsavedChanges(true);
   };
 
   const getRecipeForSlot = (day: string, meal: string): Recipe | null => {
@@ -137,6 +153,11 @@ export function useMealPlan() {
     return slot?.recipe || null;
   };
 
+  // Stored totals of the loaded plan, or null while the grid has unsaved changes
+  const storedNutrition: MealPlanNutrition | null =
+    hasUnsavedChanges ? null : currentMealPlan?.nutrition ?? null;
+
+  // Client-side totals for a grid that has not been saved yet
   const calculateDayNutrition = (day: string) => {
     const dayMeals = mealPlan.filter(slot => slot.day === day && slot.recipe);
     return dayMeals.reduce(
@@ -168,6 +189,7 @@ export function useMealPlan() {
   const clearMealPlan = () => {
     setMealPlan(prev => prev.map(slot => ({ ...slot, recipe: null })));
     setCurrentMealPlan(null);
+    setHasUnsavedChanges(false);
   };
 
   return {
@@ -187,6 +209,7 @@ export function useMealPlan() {
     deleteSavedMealPlan,
     assignRecipeToSlot,
     getRecipeForSlot,
+    storedNutrition,
     calculateDayNutrition,
     clearMealPlan,
   };
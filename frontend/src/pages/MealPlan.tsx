@@ -20,6 +20,7 @@ const MealPlan = () => {
     deleteSavedMealPlan,
     assignRecipeToSlot,
     getRecipeForSlot,
+    storedNutrition,
     calculateDayNutrition,
     clearMealPlan,
   } = useMealPlan();
@@ -130,6 +131,7 @@ const MealPlan = () => {
           mealTypes={mealTypes}
           getRecipeForSlot={getRecipeForSlot}
           assignRecipeToSlot={assignRecipeToSlot}
+          storedNutrition={storedNutrition}
           calculateDayNutrition={calculateDayNutrition}
           mealPlan={mealPlan}
           savedMealPlans={savedMealPlans}
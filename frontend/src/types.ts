@@ -27,6 +27,14 @@ export interface Recipe {
   instructions: string;
   user_id: number;
   ingredient_associations: RecipeIngredient[];
+  // Per-serving nutrition precomputed by the API (null until computed)
+  calories?: number | null;
+  protein?: number | null;
+  carbs?: number | null;
+  fat?: number | null;
+  fiber?: number | null;
+  protein_density?: number | null;
+  main_category?: string | null;
 }
 
 export interface MealSlot {
@@ -44,12 +52,26 @@ export interface MealPlanItem {
   recipe: Recipe;
 }
 
+export interface NutritionTotals {
+  calories: number;
+  protein: number;
+  carbs: number;
+  fat: number;
+}
+
+export interface MealPlanNutrition {
+  totals: NutritionTotals;
+  days: Record<string, NutritionTotals>;
+  slots: Record<string, NutritionTotals>; // "Monday:dinner"
+}
+
 export interface SavedMealPlan {
   id: number;
   name: string;
   user_id: number;
   created_at: string;
   updated_at: string;
+  nutrition?: MealPlanNutrition | null; // Stored totals of the saved items
   meal_plan_items: MealPlanItem[];
 }
 